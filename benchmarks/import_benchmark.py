@@ -0,0 +1,79 @@
+"""
+Compare the time to import one class from a generated models.py with the time
+to import it from a generated package, and the time until the first query can
+be run (which configures every imported mapper).
+
+    (venv) $ python benchmarks/import_benchmark.py --table-count 500
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from synthetic_schema import SyntheticModelWriter, create_sqlite_schema, get_table_name
+
+
+import_script = """\
+import time
+t0 = time.perf_counter()
+import {module_name} as models
+cls = models.{class_name}
+t1 = time.perf_counter()
+import sqlalchemy.orm
+sqlalchemy.orm.configure_mappers()
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t0)
+"""
+
+
+def get_args():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--table-count', type=int, default=500)
+    arg_parser.add_argument('--columns-per-table', type=int, default=10)
+    arg_parser.add_argument('--fk-density', type=float, default=0.5)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+
+    args = arg_parser.parse_args()
+    return args
+
+
+def time_import(work_dir, module_name, class_name, repeat):
+    import_seconds = []
+    configured_seconds = []
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, '-c', import_script.format(module_name=module_name, class_name=class_name)],
+            cwd=work_dir,
+            env=dict(os.environ, PYTHONDONTWRITEBYTECODE=''))
+        t_import, t_configured = (float(t) for t in output.split())
+        import_seconds.append(t_import)
+        configured_seconds.append(t_configured)
+    return statistics.median(import_seconds), statistics.median(configured_seconds)
+
+
+def main():
+    args = get_args()
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_uri = create_sqlite_schema(
+            os.path.join(work_dir, 'synthetic.db'),
+            table_count=args.table_count,
+            columns_per_table=args.columns_per_table,
+            fk_density=args.fk_density)
+        model_writer = SyntheticModelWriter(db_uri)
+        model_writer.write_models(os.path.join(work_dir, 'monolithic_models.py'))
+        model_writer.write_models_package(os.path.join(work_dir, 'table_models'), split='table')
+        model_writer.write_models_package(os.path.join(work_dir, 'component_models'), split='component')
+
+        # the last table is the least likely to be referred to by other tables
+        class_name = get_table_name(args.table_count - 1).capitalize()
+        print('{} tables, importing {}, median of {} runs'.format(args.table_count, class_name, args.repeat))
+        print('{:<20} {:>12} {:>20}'.format('', 'import (s)', 'first query (s)'))
+        for module_name in ('monolithic_models', 'table_models', 'component_models'):
+            import_seconds, configured_seconds = time_import(work_dir, module_name, class_name, args.repeat)
+            print('{:<20} {:>12.4f} {:>20.4f}'.format(module_name, import_seconds, configured_seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Count the SQL statements emitted by a typical traversal of generated models,
+listing every project with its investigators, samples and sample attributes,
+for each loader strategy configuration.
+
+    (venv) $ python benchmarks/loader_strategy_benchmark.py --project-count 100
+"""
+import argparse
+import importlib
+import os
+import sqlite3
+import sys
+import tempfile
+
+import sqlalchemy as sa
+
+from orminator.loader_strategies import LoaderStrategyConfig
+from synthetic_schema import SyntheticModelWriter
+
+
+schema_ddl = """\
+CREATE TABLE project (project_id INTEGER PRIMARY KEY, project_name VARCHAR(50));
+CREATE TABLE investigator (investigator_id INTEGER PRIMARY KEY, investigator_name VARCHAR(50));
+CREATE TABLE project_to_investigator (
+  project_to_investigator_id INTEGER PRIMARY KEY,
+  project_id INTEGER REFERENCES project (project_id),
+  investigator_id INTEGER REFERENCES investigator (investigator_id));
+CREATE TABLE sample (
+  sample_id INTEGER PRIMARY KEY,
+  project_id INTEGER REFERENCES project (project_id),
+  sample_name VARCHAR(50));
+CREATE TABLE sample_attr (
+  sample_attr_id INTEGER PRIMARY KEY,
+  sample_id INTEGER REFERENCES sample (sample_id),
+  value TEXT);
+"""
+
+
+def get_args():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--project-count', type=int, default=100)
+    arg_parser.add_argument('--samples-per-project', type=int, default=5)
+    arg_parser.add_argument('--attrs-per-sample', type=int, default=3)
+
+    args = arg_parser.parse_args()
+    return args
+
+
+def create_database(db_fp, project_count, samples_per_project, attrs_per_sample):
+    connection = sqlite3.connect(db_fp)
+    connection.executescript(schema_ddl)
+    for p in range(project_count):
+        connection.execute('INSERT INTO project VALUES (?, ?)', (p, 'project {}'.format(p)))
+        connection.execute('INSERT INTO investigator VALUES (?, ?)', (p, 'investigator {}'.format(p)))
+        connection.execute('INSERT INTO project_to_investigator VALUES (?, ?, ?)', (p, p, p))
+        for s in range(samples_per_project):
+            sample_id = p * samples_per_project + s
+            connection.execute('INSERT INTO sample VALUES (?, ?, ?)', (sample_id, p, 'sample {}'.format(s)))
+            for a in range(attrs_per_sample):
+                connection.execute(
+                    'INSERT INTO sample_attr VALUES (?, ?, ?)',
+                    (sample_id * attrs_per_sample + a, sample_id, 'attr {}'.format(a)))
+    connection.commit()
+    connection.close()
+    return 'sqlite:///{}'.format(db_fp)
+
+
+def traverse(session, models):
+    lines = []
+    for project in session.query(models.Project).all():
+        lines.append(project.project_name)
+        lines.extend(i.investigator_name for i in project.investigator_list)
+        for sample in project.sample_list:
+            lines.append(sample.sample_name)
+            lines.extend(a.value for a in sample.sample_attr_list)
+    return lines
+
+
+def count_statements(engine, models):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sa.event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        with sa.orm.Session(bind=engine) as session:
+            line_count = len(traverse(session, models))
+    finally:
+        sa.event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return len(statements), line_count
+
+
+def main():
+    args = get_args()
+    configurations = (
+        ('default (lazy select)', LoaderStrategyConfig()),
+        ('selectin and joined', LoaderStrategyConfig(
+            one_to_many='selectin', many_to_many='selectin', many_to_one='joined')),
+        ('strict', LoaderStrategyConfig(strict=True)),
+    )
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_uri = create_database(
+            os.path.join(work_dir, 'loader.db'),
+            args.project_count,
+            args.samples_per_project,
+            args.attrs_per_sample)
+        engine = sa.create_engine(db_uri)
+        sys.path.insert(0, work_dir)
+
+        for i, (name, loader_strategies) in enumerate(configurations):
+            module_name = 'loader_models_{}'.format(i)
+            SyntheticModelWriter(db_uri, loader_strategies=loader_strategies).write_models(
+                os.path.join(work_dir, module_name + '.py'))
+            models = importlib.import_module(module_name)
+            try:
+                statement_count, line_count = count_statements(engine, models)
+                print('{:<25} {:>6} statements for {} lines'.format(name, statement_count, line_count))
+            except sa.exc.InvalidRequestError as e:
+                print('{:<25} raised {}'.format(name, e))
+
+
+if __name__ == '__main__':
+    main()
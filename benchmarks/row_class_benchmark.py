@@ -0,0 +1,86 @@
+"""
+Compare the throughput of loading rows as ORM objects with loading the same
+rows as read-only row classes (write_models --row-classes).
+
+    (venv) $ python benchmarks/row_class_benchmark.py --row-count 200000
+"""
+import argparse
+import importlib
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import sqlalchemy as sa
+
+from synthetic_schema import SyntheticModelWriter
+
+
+def get_args():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--row-count', type=int, default=200000)
+    arg_parser.add_argument('--repeat', type=int, default=3)
+
+    args = arg_parser.parse_args()
+    return args
+
+
+def create_database(work_dir, row_count):
+    db_fp = os.path.join(work_dir, 'rows.db')
+    connection = sqlite3.connect(db_fp)
+    connection.execute(
+        'CREATE TABLE sample (sample_id INTEGER PRIMARY KEY, file VARCHAR(255), type VARCHAR(32), size INTEGER)')
+    connection.executemany(
+        'INSERT INTO sample VALUES (?, ?, ?, ?)',
+        ((i, '/data/sample/{}.fa'.format(i), 'fasta', i * 10) for i in range(row_count)))
+    connection.commit()
+    connection.close()
+    return 'sqlite:///{}'.format(db_fp)
+
+
+def best_seconds(f, repeat):
+    seconds = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        f()
+        seconds.append(time.perf_counter() - t0)
+    return min(seconds)
+
+
+def main():
+    args = get_args()
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_uri = create_database(work_dir, args.row_count)
+        SyntheticModelWriter(db_uri, row_classes=True).write_models(os.path.join(work_dir, 'row_models.py'))
+        sys.path.insert(0, work_dir)
+        models = importlib.import_module('row_models')
+
+        engine = sa.create_engine(db_uri)
+
+        def load_orm():
+            with sa.orm.Session(bind=engine) as session:
+                return [sample.file_ for sample in session.query(models.Sample)]
+
+        def load_rows_with_session():
+            with sa.orm.Session(bind=engine) as session:
+                return [sample.file_ for sample in models.SampleRow.get_all(session)]
+
+        def load_rows_with_connection():
+            with engine.connect() as connection:
+                return [sample.file_ for sample in models.SampleRow.get_all(connection)]
+
+        print('{:<28} {:>12} {:>10}'.format('method', 'rows/s', 'speedup'))
+        orm_seconds = None
+        for name, f in (
+                ('ORM objects', load_orm),
+                ('row class, session', load_rows_with_session),
+                ('row class, connection', load_rows_with_connection)):
+            seconds = best_seconds(f, args.repeat)
+            if orm_seconds is None:
+                orm_seconds = seconds
+            print('{:<28} {:>12.0f} {:>9.1f}x'.format(name, args.row_count / seconds, orm_seconds / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Compare peak memory (RSS) and throughput of reading every row of a large table
+with .all(), with stream_results and with keyset_results. Each method runs in
+its own process so peak RSS is not shared between them.
+
+    (venv) $ python benchmarks/streaming_benchmark.py --row-count 500000
+"""
+import argparse
+import importlib
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import sqlalchemy as sa
+
+from orminator import keyset_results, stream_results
+from synthetic_schema import SyntheticModelWriter
+
+
+methods = ('all', 'stream_results', 'keyset_results')
+
+
+def get_args():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--row-count', type=int, default=500000)
+    arg_parser.add_argument('--chunk-size', type=int, default=5000)
+    # used when this script runs itself for one method
+    arg_parser.add_argument('--work-dir', default=None)
+    arg_parser.add_argument('--method', choices=methods, default=None)
+
+    args = arg_parser.parse_args()
+    return args
+
+
+def create_database(work_dir, row_count):
+    db_fp = os.path.join(work_dir, 'streaming.db')
+    connection = sqlite3.connect(db_fp)
+    connection.execute('CREATE TABLE sample (sample_id INTEGER PRIMARY KEY, file VARCHAR(255), value TEXT)')
+    connection.executemany(
+        'INSERT INTO sample VALUES (?, ?, ?)',
+        ((i, '/data/sample/{}.fa'.format(i), 'value {}'.format(i) * 4) for i in range(row_count)))
+    connection.commit()
+    connection.close()
+    db_uri = 'sqlite:///{}'.format(db_fp)
+    SyntheticModelWriter(db_uri).write_models(os.path.join(work_dir, 'streaming_models.py'))
+    return db_uri
+
+
+def run_method(work_dir, method, chunk_size):
+    """Read every row with one method and print rows, seconds and peak RSS in MB."""
+    sys.path.insert(0, work_dir)
+    models = importlib.import_module('streaming_models')
+    engine = sa.create_engine('sqlite:///{}'.format(os.path.join(work_dir, 'streaming.db')))
+    with sa.orm.Session(bind=engine) as session:
+        t0 = time.perf_counter()
+        if method == 'all':
+            rows = session.query(models.Sample).all()
+        elif method == 'stream_results':
+            rows = stream_results(session, session.query(models.Sample), chunk_size=chunk_size)
+        else:
+            rows = keyset_results(session, models.Sample, chunk_size=chunk_size)
+        row_count = 0
+        for sample in rows:
+            len(sample.file_)
+            row_count += 1
+        seconds = time.perf_counter() - t0
+    # ru_maxrss is kilobytes on Linux
+    print(row_count, seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+
+
+def main():
+    args = get_args()
+    if args.method:
+        run_method(args.work_dir, args.method, args.chunk_size)
+        return
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        create_database(work_dir, args.row_count)
+        print('{:<16} {:>10} {:>12} {:>14}'.format('method', 'rows', 'rows/s', 'peak RSS (MB)'))
+        for method in methods:
+            output = subprocess.check_output([
+                sys.executable, __file__,
+                '--work-dir', work_dir,
+                '--method', method,
+                '--chunk-size', str(args.chunk_size)])
+            row_count, seconds, peak_rss = output.split()
+            print('{:<16} {:>10} {:>12.0f} {:>14.1f}'.format(
+                method, row_count.decode(), int(row_count) / float(seconds), float(peak_rss)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Build synthetic SQLite schemas for the benchmarks.
+
+Tables are named table_0000, table_0001, ... Each table has an integer primary
+key, data columns, and on average fk_density foreign keys to earlier tables.
+Association tables named table_xxxx_to_table_yyyy link pairs of tables that are
+not otherwise related.
+"""
+import random
+import re
+import sqlite3
+
+import sqlalchemy as sa
+
+from orminator import ModelWriter
+
+
+data_column_types = ('VARCHAR(32)', 'VARCHAR(255)', 'TEXT', 'DATETIME', 'FLOAT', 'INTEGER')
+
+
+def get_table_name(i):
+    return 'table_{:04d}'.format(i)
+
+
+def get_schema_ddl(table_count=100, columns_per_table=8, fk_density=1.0, association_table_count=0, seed=0):
+    """Return a list of CREATE TABLE statements."""
+    rng = random.Random(seed)
+    ddl = []
+    related_pairs = set()
+    for i in range(table_count):
+        table_name = get_table_name(i)
+        columns = ['{}_id INTEGER PRIMARY KEY'.format(table_name)]
+        foreign_keys = []
+
+        # the number of foreign keys averages fk_density
+        fk_count = int(fk_density) + (1 if rng.random() < fk_density - int(fk_density) else 0)
+        referred_table_indices = sorted(set(rng.randrange(i) for _ in range(fk_count))) if i > 0 else []
+        for j in referred_table_indices:
+            referred_table_name = get_table_name(j)
+            columns.append('{}_id INTEGER'.format(referred_table_name))
+            foreign_keys.append(
+                'FOREIGN KEY ({0}_id) REFERENCES {0} ({0}_id)'.format(referred_table_name))
+            related_pairs.add((j, i))
+
+        for k in range(max(0, columns_per_table - len(columns))):
+            columns.append('column_{} {}'.format(k, rng.choice(data_column_types)))
+
+        ddl.append('CREATE TABLE {} (\n  {}\n)'.format(table_name, ',\n  '.join(columns + foreign_keys)))
+
+    association_pairs = set()
+    for _ in range(association_table_count * 10):
+        if len(association_pairs) >= association_table_count or table_count < 2:
+            break
+        pair = tuple(sorted(rng.sample(range(table_count), 2)))
+        if pair not in related_pairs and pair not in association_pairs:
+            association_pairs.add(pair)
+
+    for i, j in sorted(association_pairs):
+        left_table_name, right_table_name = get_table_name(i), get_table_name(j)
+        table_name = '{}_to_{}'.format(left_table_name, right_table_name)
+        ddl.append(
+            'CREATE TABLE {0} (\n'
+            '  {0}_id INTEGER PRIMARY KEY,\n'
+            '  {1}_id INTEGER,\n'
+            '  {2}_id INTEGER,\n'
+            '  FOREIGN KEY ({1}_id) REFERENCES {1} ({1}_id),\n'
+            '  FOREIGN KEY ({2}_id) REFERENCES {2} ({2}_id)\n'
+            ')'.format(table_name, left_table_name, right_table_name))
+
+    return ddl
+
+
+def create_sqlite_schema(db_fp, **kwargs):
+    """Create a synthetic schema in a new SQLite database and return its URI."""
+    connection = sqlite3.connect(db_fp)
+    try:
+        for statement in get_schema_ddl(**kwargs):
+            connection.execute(statement)
+        connection.commit()
+    finally:
+        connection.close()
+    return 'sqlite:///{}'.format(db_fp)
+
+
+_create_table_re = re.compile(r'CREATE TABLE (\w+)')
+
+
+def create_schema(db_uri, **kwargs):
+    """
+    Create a synthetic schema in an existing database, for example a local
+    MySQL database, and return the names of the tables created.
+    """
+    ddl = get_schema_ddl(**kwargs)
+    engine = sa.create_engine(db_uri)
+    try:
+        with engine.begin() as connection:
+            for statement in ddl:
+                connection.execute(sa.text(statement))
+    finally:
+        engine.dispose()
+    return [_create_table_re.match(statement).group(1) for statement in ddl]
+
+
+def drop_schema(db_uri, table_names):
+    """Drop the tables created by create_schema, referring tables first."""
+    engine = sa.create_engine(db_uri)
+    try:
+        with engine.begin() as connection:
+            for table_name in reversed(table_names):
+                connection.execute(sa.text('DROP TABLE IF EXISTS {}'.format(table_name)))
+    finally:
+        engine.dispose()
+
+
+class SyntheticModelWriter(ModelWriter):
+    """
+    SQLite reports plain INTEGER types which ModelWriter does not translate,
+    so the generated code would not import.
+    """
+    type_translations = {
+        **ModelWriter.type_translations,
+        re.compile(r'INTEGER'): r'sa.Integer'
+    }
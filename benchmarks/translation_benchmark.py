@@ -0,0 +1,87 @@
+"""
+Measure the per-column cost of translating column types and names on a
+synthetic catalog of 100,000 columns.
+
+    (venv) $ python benchmarks/translation_benchmark.py
+"""
+import argparse
+import random
+import time
+
+from orminator import ModelWriter
+
+
+def get_args():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('-n', '--column-count', type=int, default=100000)
+    arg_parser.add_argument('-s', '--seed', type=int, default=0)
+
+    args = arg_parser.parse_args()
+    return args
+
+
+def get_synthetic_columns(column_count, seed):
+    """Return (column name, column type) for column_count columns with realistic repetition."""
+    rng = random.Random(seed)
+    column_types = [
+        lambda: 'INTEGER({})'.format(rng.choice((4, 11))),
+        lambda: 'INTEGER({}) UNSIGNED'.format(rng.choice((10, 11))),
+        lambda: 'BIGINT(20) UNSIGNED',
+        lambda: 'VARCHAR({})'.format(rng.choice((32, 50, 100, 255, 1024))),
+        lambda: 'TEXT',
+        lambda: 'MEDIUMTEXT',
+        lambda: 'DOUBLE',
+        lambda: 'DOUBLE UNSIGNED',
+        lambda: 'DATETIME',
+        lambda: 'TINYINT(1)',
+        lambda: "ENUM('{}','{}')".format(rng.choice('ab'), rng.choice('cd')),
+        lambda: 'BLOB',
+    ]
+    column_names = ['class', 'type', 'file', 'name', 'value', 'sample_id', 'project_id']
+    return [
+        (rng.choice(column_names), rng.choice(column_types)())
+        for _
+        in range(column_count)]
+
+
+def translate_by_loop(translations, s):
+    """The translation used before Translator: try every pattern in turn."""
+    for pattern, translation in translations.items():
+        if pattern.fullmatch(s):
+            return pattern.sub(string=s, repl=translation)
+    return s
+
+
+def time_per_column(translate_name, translate_type, columns):
+    t0 = time.perf_counter()
+    for column_name, column_type in columns:
+        translate_name(column_name)
+        translate_type(column_type)
+    return (time.perf_counter() - t0) / len(columns)
+
+
+def main():
+    args = get_args()
+    columns = get_synthetic_columns(args.column_count, args.seed)
+
+    model_writer = ModelWriter.__new__(ModelWriter)
+
+    loop_seconds = time_per_column(
+        lambda s: translate_by_loop(ModelWriter.name_translations, s),
+        lambda s: translate_by_loop(ModelWriter.type_translations, s),
+        columns)
+    translator_seconds = time_per_column(
+        model_writer.translate_column_name_to_py,
+        model_writer.translate_column_type_to_sa,
+        columns)
+
+    print('columns               : {}'.format(len(columns)))
+    print('distinct column types : {}'.format(len({t for _, t in columns})))
+    print('pattern loop          : {:.3f} us/column'.format(loop_seconds * 1e6))
+    print('Translator            : {:.3f} us/column'.format(translator_seconds * 1e6))
+    print('speedup               : {:.1f}x'.format(loop_seconds / translator_seconds))
+    print('type cache            : {}'.format(model_writer.get_type_translator().cache_info()))
+
+
+if __name__ == '__main__':
+    main()
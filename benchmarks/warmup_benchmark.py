@@ -0,0 +1,102 @@
+"""
+Measure the time to the first query in a fresh process with and without
+orminator.warmup:
+
+    cold        import the models and run the first query
+    configure   warm_up() without an engine before the first query
+    warm_up     warm_up() with the engine and the manifest before the first query
+    background  warm_up(background=True) and run the first query at once
+
+startup is the time to import the models and (except for background) warm up,
+first query is the latency of the first request after startup.
+
+    (venv) $ python benchmarks/warmup_benchmark.py --table-count 500
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from synthetic_schema import SyntheticModelWriter, create_sqlite_schema, get_table_name
+
+
+process_script = """\
+import time
+t0 = time.perf_counter()
+import sqlalchemy as sa
+import models
+from orminator.warmup import warm_up
+
+engine = sa.create_engine({db_uri!r}, query_cache_size=10000)
+if {method!r} == 'configure':
+    warm_up(models)
+elif {method!r} == 'warm_up':
+    warm_up(models, engine=engine, manifest_fp='models.json')
+elif {method!r} == 'background':
+    warm_up(models, engine=engine, manifest_fp='models.json', background=True)
+t1 = time.perf_counter()
+
+with sa.orm.Session(engine) as session:
+    for i in ({table_indices}):
+        session.get(getattr(models, 'Table_{{:04d}}'.format(i)), -2)
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t1)
+"""
+
+
+def get_args():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--table-count', type=int, default=500)
+    arg_parser.add_argument('--columns-per-table', type=int, default=10)
+    arg_parser.add_argument('--fk-density', type=float, default=0.5)
+    arg_parser.add_argument('--repeat', type=int, default=3)
+
+    args = arg_parser.parse_args()
+    return args
+
+
+def time_process(work_dir, db_uri, method, table_indices, repeat):
+    startup_seconds = []
+    first_query_seconds = []
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [
+                sys.executable,
+                '-c',
+                process_script.format(db_uri=db_uri, method=method, table_indices=table_indices)],
+            cwd=work_dir)
+        t_startup, t_first_query = (float(t) for t in output.split())
+        startup_seconds.append(t_startup)
+        first_query_seconds.append(t_first_query)
+    return statistics.median(startup_seconds), statistics.median(first_query_seconds)
+
+
+def main():
+    args = get_args()
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_uri = create_sqlite_schema(
+            os.path.join(work_dir, 'synthetic.db'),
+            table_count=args.table_count,
+            columns_per_table=args.columns_per_table,
+            fk_density=args.fk_density)
+        SyntheticModelWriter(db_uri).write_models(
+            os.path.join(work_dir, 'models.py'),
+            manifest_fp=os.path.join(work_dir, 'models.json'))
+
+        # a first request touching a few classes
+        table_indices = ', '.join(str(i) for i in range(0, args.table_count, max(1, args.table_count // 5)))
+        print('{} tables, first query loads {}, median of {} runs'.format(
+            args.table_count,
+            ', '.join(get_table_name(int(i)) for i in table_indices.split(', ')),
+            args.repeat))
+        print('{:<12} {:>12} {:>18}'.format('', 'startup (s)', 'first query (s)'))
+        for method in ('cold', 'configure', 'warm_up', 'background'):
+            startup_seconds, first_query_seconds = time_process(
+                work_dir, db_uri, method, table_indices, args.repeat)
+            print('{:<12} {:>12.4f} {:>18.4f}'.format(method, startup_seconds, first_query_seconds))
+
+
+if __name__ == '__main__':
+    main()
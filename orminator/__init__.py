@@ -1,19 +1,47 @@
 from collections import defaultdict
-from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+import filecmp
+import hashlib
 import io
+import json
+import keyword
+import logging
 import os
 import re
+import shutil
 
-from sqlalchemy.orm import sessionmaker
 import sqlalchemy as sa
 
+from orminator.bulk import bulk_insert, bulk_link, bulk_upsert
+from orminator.catalog import CatalogSnapshot
+from orminator.engines import EngineRegistry, engine_registry, get_engine
+from orminator.fk_graph import ForeignKeyGraph
+from orminator.loader_strategies import LoaderStrategyConfig, get_table_row_counts
+from orminator.profiling import Profiler
+from orminator.reflection_cache import ReflectionCache, get_table_fingerprints
+from orminator.routing import ReplicaRouter, RoutingSession
+from orminator.scope import TableScope
+from orminator.streaming import keyset_chunks, keyset_results, process_in_chunks, stream_chunks, stream_results
+from orminator.translation import Translator
+
+
+logger = logging.getLogger(__name__)
+
+# used in place of a Profiler phase when there is no Profiler
+_no_profiler_phase = nullcontext()
 
 @contextmanager
-def session_manager_from_db_uri(db_uri, echo=False):
+def session_manager_from_db_uri(db_uri, echo=False, **engine_options):
     """Provide a transactional scope around a series of operations."""
     # connect to database on server
     # e.g. mysql+pymysql://imicrobe:<password>@localhost/muscope2
-    session_class = sessionmaker(bind=sa.create_engine(db_uri, echo=echo))
+    # the engine and its connection pool are shared with every other
+    # session manager using the same URI and options, echo is only passed
+    # when it is set so session_manager(db_uri) shares the same engine
+    if echo:
+        engine_options['echo'] = echo
+    session_class = engine_registry.get_session_class(db_uri, **engine_options)
     session = session_class()
     try:
         yield session
@@ -28,6 +56,9 @@ def session_manager_from_db_uri(db_uri, echo=False):
 @contextmanager
 def session_manager(session_class):
     """Provide a transactional scope around a series of operations."""
+    if isinstance(session_class, str):
+        # session_class is a database URI
+        session_class = engine_registry.get_session_class(session_class)
     session = session_class()
     try:
         yield session
@@ -40,13 +71,120 @@ def session_manager(session_class):
 
 
 class ModelWriter():
-    def __init__(self, db_uri):
+    _name_translator = None
+    _type_translator = None
+
+    def __init__(
+            self,
+            db_uri,
+            cache_dir=None,
+            workers=1,
+            loader_strategies=None,
+            row_classes=False,
+            lookup_methods=False,
+            profiler=None,
+            scope=None,
+            schema=None,
+            engine=None,
+            catalog=None):
+        """
+        schema is read instead of the database named in db_uri. An engine or a
+        catalog already read from the database can be given to share them
+        between ModelWriters. workers is the number of threads and connections
+        reading the catalog, code is always generated in the calling thread.
+        """
+        self.workers = workers
+        self.schema = schema
+        # count and time queries and code generation by phase
+        self.profiler = profiler
+        # write get_by_<column> methods for indexed columns
+        self.lookup_methods = lookup_methods
+        # also write a read-only row class for each table
+        self.row_classes = row_classes
         # connect to database on server
         # e.g. mysql+pymysql://imicrobe:<password>@localhost/imicrobe
-        self.engine = sa.create_engine(db_uri)
-        # reflect tables
-        self.meta = sa.MetaData()
-        self.meta.reflect(bind=self.engine)
+        if engine is not None:
+            self.engine = engine
+        elif workers > 1 and sa.engine.url.make_url(db_uri).get_backend_name() != 'sqlite':
+            # one connection for each worker thread
+            self.engine = sa.create_engine(db_uri, pool_size=workers, max_overflow=0)
+        else:
+            self.engine = sa.create_engine(db_uri)
+        if self.profiler is not None:
+            self.profiler.instrument(self.engine)
+
+        with self.profile('reflect'):
+            if scope is None:
+                only = None
+            else:
+                # find the tables in scope from the foreign key edges alone
+                # and read the full catalog for those tables only
+                only = scope.get_table_names(self.engine, schema=schema)
+                logger.info('%d table(s) in scope', len(only))
+            # read the whole catalog in a few queries and build the
+            # MetaData from that rather than reflecting table by table
+            if catalog is not None:
+                self.catalog = catalog if only is None else catalog.get_subset(only)
+            elif cache_dir is None:
+                self.catalog = CatalogSnapshot.from_engine(self.engine, schema=schema, only=only, workers=workers)
+            else:
+                # only read the catalog for tables that changed since the last run
+                self.catalog = ReflectionCache(cache_dir).get_catalog(
+                    self.engine, schema=schema, only=only, workers=workers)
+            self.meta = self.catalog.to_metadata()
+            # forward and reverse foreign key adjacency for every table, foreign
+            # keys to tables that are not generated are left out
+            self.fk_graph = ForeignKeyGraph.from_catalog(self.catalog, skip_missing=True)
+
+            # choose lazy= for each relationship, row counts are only
+            # needed to limit the size of eagerly loaded collections
+            if loader_strategies is None:
+                self.loader_strategies = LoaderStrategyConfig()
+            else:
+                self.loader_strategies = loader_strategies
+            if self.loader_strategies.max_eager_collection_size is None:
+                self.row_counts = None
+            else:
+                self.row_counts = get_table_row_counts(self.engine, schema=schema)
+        logger.info('read the catalog for %d table(s)', len(self.meta.tables))
+
+    @classmethod
+    async def from_async_engine(cls, async_engine, workers=1, scope=None, schema=None, cache_dir=None, **kwargs):
+        """
+        Return a ModelWriter for the database of an AsyncEngine, for example one
+        for 'sqlite+aiosqlite:///imicrobe.db', reading the catalog with up to
+        workers concurrent connections on the event loop. If cache_dir is given
+        only the tables changed since the cached catalog was read are read again.
+        Other arguments are the same as for ModelWriter.
+        """
+        from sqlalchemy.util import greenlet_spawn
+
+        # the sync engine of an AsyncEngine can be used inside greenlet_spawn
+        if scope is None:
+            only = None
+        else:
+            only = await greenlet_spawn(scope.get_table_names, async_engine.sync_engine, schema=schema)
+            logger.info('%d table(s) in scope', len(only))
+        if cache_dir is None:
+            catalog = await CatalogSnapshot.from_async_engine(async_engine, schema=schema, only=only, workers=workers)
+        else:
+            catalog = await ReflectionCache(cache_dir).get_catalog_from_async_engine(
+                async_engine, schema=schema, only=only, workers=workers)
+        return await greenlet_spawn(
+            cls,
+            async_engine.url.render_as_string(hide_password=False),
+            engine=async_engine.sync_engine,
+            workers=workers,
+            catalog=catalog,
+            schema=schema,
+            **kwargs)
+
+    def profile(self, phase, table_name=None):
+        """Return a context manager timing phase if there is a profiler."""
+        if self.profiler is None:
+            return _no_profiler_phase
+        else:
+            return self.profiler.phase(phase, table_name)
 
     def import_model_base(self):
         return """\
@@ -57,6 +195,88 @@ from sqlalchemy.orm import backref
 
 Model = declarative_base()
 
+"""
+
+    def get_lookup_base_code(self):
+        return """\
+_lookup_statements = {}
+
+
+def get_lookup_statement(model, attribute_name, many=False):
+    \"\"\"
+    Return SELECT model WHERE attribute_name = :value, or attribute_name IN :values
+    if many is True. Each statement is built once and reused so it is not
+    compiled again for every lookup.
+    \"\"\"
+    key = (model, attribute_name, many)
+    try:
+        return _lookup_statements[key]
+    except KeyError:
+        attribute = getattr(model, attribute_name)
+        if many:
+            criterion = attribute.in_(sa.bindparam('values', expanding=True))
+        else:
+            criterion = attribute == sa.bindparam('value')
+        statement = _lookup_statements[key] = sa.select(model).where(criterion)
+        return statement
+
+
+def lookup(session, model, attribute_name, value):
+    return session.execute(
+        get_lookup_statement(model, attribute_name),
+        {'value': value}).scalars().unique().all()
+
+
+def lookup_many(session, model, attribute_name, values, batch_size=500):
+    \"\"\"Look up values with one IN query for every batch_size values.\"\"\"
+    values = list(values)
+    objects = []
+    for i in range(0, len(values), batch_size):
+        objects.extend(session.execute(
+            get_lookup_statement(model, attribute_name, many=True),
+            {'values': values[i:i + batch_size]}).scalars().unique())
+    return objects
+
+"""
+
+    def get_row_base_code(self):
+        return """\
+from collections import namedtuple
+
+
+class ReadOnlyRow():
+    \"\"\"
+    Base for the read-only row classes. Rows are read with Core SELECTs and
+    built as named tuples, without the identity map or attribute instrumentation
+    of the ORM classes. connection can be a Connection or a Session.
+    \"\"\"
+    __slots__ = ()
+    __table__ = None
+    _columns = ()
+
+    @classmethod
+    def select(cls, *criteria):
+        statement = sa.select(*cls._columns)
+        if len(criteria) > 0:
+            statement = statement.where(*criteria)
+        return statement
+
+    @classmethod
+    def get_all(cls, connection, *criteria):
+        return list(map(cls._make, connection.execute(cls.select(*criteria))))
+
+    @classmethod
+    def get_one_or_none(cls, connection, *criteria):
+        row = connection.execute(cls.select(*criteria)).one_or_none()
+        return None if row is None else cls._make(row)
+
+    @classmethod
+    def iter_rows(cls, connection, *criteria, chunk_size=1000):
+        statement = cls.select(*criteria).execution_options(stream_results=True)
+        for rows in connection.execute(statement).partitions(chunk_size):
+            for row in rows:
+                yield cls._make(row)
+
 """
 
     def get_model_parent_class_name(self):
@@ -65,31 +285,34 @@ Model = declarative_base()
     def get_additional_imports(self):
         return ''
 
+    # translations are tried in insertion order and the first pattern that
+    # matches the whole column name or type is used, subclasses can extend
+    # these dictionaries, for example with {**ModelWriter.type_translations, ...}
     name_translations = {
         re.compile(r'class'): 'class_',
         re.compile(r'type'): 'type_',
         re.compile(r'file'): 'file_'
     }
 
+    def get_name_translator(self):
+        if self._name_translator is None:
+            self._name_translator = Translator(self.name_translations)
+        return self._name_translator
+
     def translate_column_name_to_py(self, column_name):
-        for pattern, translation in self.name_translations.items():
-            if pattern.fullmatch(column_name):
-                return pattern.sub(string=column_name, repl=translation)
-            else:
-                pass
         # if no translation was made return the input unchanged
-        return column_name
+        return self.get_name_translator().translate(column_name)
 
     type_translations = {
         re.compile(r'BIGINT\(\d+\) UNSIGNED'): r'mysql.BIGINT(unsigned=True)',
         re.compile(r'DATE'): r'sa.Date',
         re.compile(r'DATETIME'): r'sa.DateTime',
-        re.compile(r'DOUBLE'): r'sa.Float',
         re.compile(r'DOUBLE UNSIGNED'): r'sa.Float',
+        re.compile(r'DOUBLE'): r'sa.Float',
         re.compile(r'ENUM\((.+)\)'): r'mysql.ENUM(\1)',
         re.compile(r'FLOAT'): r'sa.Float',
-        re.compile(r'INTEGER\(\d+\)'): r'mysql.INTEGER()',
         re.compile(r'INTEGER\(\d+\) UNSIGNED'): r'mysql.INTEGER(unsigned=True)',
+        re.compile(r'INTEGER\(\d+\)'): r'mysql.INTEGER()',
         re.compile(r'LONGTEXT'): r'mysql.LONGTEXT()',
         re.compile(r'MEDIUMTEXT'): r'mysql.MEDIUMTEXT()',
         re.compile(r'TEXT'): r'sa.Text',
@@ -99,17 +322,129 @@ Model = declarative_base()
         re.compile(r'VARCHAR\((\d+)\)'): r'sa.String(length=\1)'
     }
 
+    def get_type_translator(self):
+        if self._type_translator is None:
+            self._type_translator = Translator(self.type_translations)
+        return self._type_translator
+
     def translate_column_type_to_sa(self, column_type):
-        for pattern, translation in self.type_translations.items():
-            if pattern.fullmatch(column_type):
-                return pattern.sub(string=column_type, repl=translation)
-            else:
-                pass
         # if no translation was made return the input unchanged
-        return column_type
+        return self.get_type_translator().translate(column_type)
+
+    def get_lookup_columns(self, table):
+        """
+        Return a list of (column name, unique) for the columns an index can be
+        used to look up: single column primary keys and the first column of
+        every index and unique constraint. unique is True if a value matches at
+        most one row. Columns are in the same order as the generated class.
+        """
+        pk_column_names = self.catalog.get_pk_constraint(table.name)['constrained_columns']
+        column_name_to_unique = {}
+        if len(pk_column_names) == 1:
+            column_name_to_unique[pk_column_names[0]] = True
+
+        indexed_column_names = [
+            (index['column_names'], index['unique'])
+            for index
+            in self.catalog.get_indexes(table.name)]
+        indexed_column_names.extend(
+            (unique_constraint['column_names'], True)
+            for unique_constraint
+            in self.catalog.get_unique_constraints(table.name))
+        for column_names, unique in indexed_column_names:
+            if len(column_names) == 0 or column_names[0] is None:
+                # expression index
+                pass
+            else:
+                column_name_to_unique[column_names[0]] = (
+                    column_name_to_unique.get(column_names[0], False) or (bool(unique) and len(column_names) == 1))
+
+        column_names = list(pk_column_names) + [
+            column_data['name']
+            for column_data
+            in self.catalog.get_columns(table.name)
+            if column_data['name'] not in pk_column_names]
+        return [(c, column_name_to_unique[c]) for c in column_names if c in column_name_to_unique]
+
+    unique_lookup_methods_code_template = """\
+    @classmethod
+    def get_by_{method_suffix}(cls, session, value):
+        \"\"\"Return the {class_name} with {column_name} equal to value or None.\"\"\"
+        objects = lookup(session, cls, '{attribute_name}', value)
+        return objects[0] if objects else None
+
+    @classmethod
+    def get_many_by_{method_suffix}(cls, session, values, batch_size=500):
+        \"\"\"Return a list of the {class_name} objects with {column_name} in values.\"\"\"
+        return lookup_many(session, cls, '{attribute_name}', values, batch_size=batch_size)
+
+"""
+
+    lookup_methods_code_template = """\
+    @classmethod
+    def get_by_{method_suffix}(cls, session, value):
+        \"\"\"Return a list of the {class_name} objects with {column_name} equal to value.\"\"\"
+        return lookup(session, cls, '{attribute_name}', value)
+
+    @classmethod
+    def get_many_by_{method_suffix}(cls, session, values, batch_size=500):
+        \"\"\"Return a list of the {class_name} objects with {column_name} in values.\"\"\"
+        return lookup_many(session, cls, '{attribute_name}', values, batch_size=batch_size)
+
+"""
+
+    def write_lookup_methods(self, table, table_code):
+        """
+        Write get_by_<column> and get_many_by_<column> classmethods for each
+        column returned by get_lookup_columns.
+        """
+        for column_name, unique in self.get_lookup_columns(table):
+            if unique:
+                template = self.unique_lookup_methods_code_template
+            else:
+                template = self.lookup_methods_code_template
+            table_code.write(template.format(
+                method_suffix=re.sub(r'\W', '_', column_name),
+                class_name=table.name.capitalize(),
+                column_name=column_name,
+                attribute_name=self.translate_column_name_to_py(column_name)))
 
     def write_additional_methods(self, table, table_code):
-        return
+        if self.lookup_methods:
+            self.write_lookup_methods(table, table_code)
+
+    def get_row_class_name(self, table):
+        return '{}Row'.format(table.name.capitalize())
+
+    def get_core_table_name(self, table):
+        return '{}_table'.format(table.name)
+
+    def write_row_class(self, table, table_code):
+        """
+        Write the Core Table and a read-only row class for table to table_code.
+        The row class has the same attribute names as the ORM class.
+        """
+        pk_column_names = self.catalog.get_pk_constraint(table.name)['constrained_columns']
+        # the same column order as the ORM class
+        column_names = list(pk_column_names) + [
+            column_data['name']
+            for column_data
+            in self.catalog.get_columns(table.name)
+            if column_data['name'] not in pk_column_names]
+
+        row_class_name = self.get_row_class_name(table)
+        core_table_name = self.get_core_table_name(table)
+        table_code.write('\n{} = {}.__table__\n\n\n'.format(core_table_name, table.name.capitalize()))
+        table_code.write("class {}(ReadOnlyRow, namedtuple('{}', [{}])):\n".format(
+            row_class_name,
+            row_class_name,
+            ', '.join("'{}'".format(self.translate_column_name_to_py(c)) for c in column_names)))
+        table_code.write('    __slots__ = ()\n')
+        table_code.write('    __table__ = {}\n'.format(core_table_name))
+        table_code.write('    _columns = tuple({}.c[c] for c in ({}{}))\n\n'.format(
+            core_table_name,
+            ', '.join("'{}'".format(c) for c in column_names),
+            ',' if len(column_names) == 1 else ''))
 
     """
     foreign_key_constraints looks like this:
@@ -143,7 +478,7 @@ Model = declarative_base()
     """
     _association_table_re = re.compile(r'(?P<left_table>.+)_to_(?P<right_table>.+)')
     def get_relations(self, table):
-        insp = sa.engine.reflection.Inspector.from_engine(self.engine)
+        fk_graph = self.fk_graph
 
         # if 'table' has a foreign key to a 'table_x' and 'table_x'
         # does not have a foreign key to 'table' then there is a
@@ -155,31 +490,25 @@ Model = declarative_base()
         # and has the right name then represents a many-to-many relation
         many_to_many_relations = set()
 
-        for fk_constraint in insp.get_foreign_keys(table.name):
+        # is 'table' a many-to-many association table?
+        # if so it should have a name like referred_table_to_another_table
+        # or another_table_to_referred_table
+        association_table_name_match = self._association_table_re.search(table.name)
+
+        for fk_constraint in fk_graph.get_foreign_keys(table.name):
             referred_table = self.meta.tables[fk_constraint['referred_table']]
-            referred_table_fk_constraints = insp.get_foreign_keys(referred_table.name)
-            referred_table_references_to_table = [
-                r_
-                for r_
-                in referred_table_fk_constraints
-                if r_['referred_table'] == table.name]
-
-            if len(referred_table_references_to_table) > 0:
+
+            if fk_graph.refers_to(referred_table.name, table.name):
                 # 'referred_table' also references 'table'
                 # is this a relation?
-                print('table "{}" and table "{}" reference each other'.format(
-                    table.name, referred_table.name))
+                logger.debug('table "%s" and table "%s" reference each other', table.name, referred_table.name)
             else:
                 # 'table' references 'referred_table' but 'referred_table' does
                 # not reference 'table'
-
-                # is 'table' a many-to-many association table?
-                # if so it should have a name like referred_table_to_another_table
-                # or another_table_to_referred_table
-                association_table_name_match = self._association_table_re.search(table.name)
-                if association_table_name_match:
-                    print('table "{}" seems to be a many-to-many relation table'.format(
-                        table.name))
+                if (association_table_name_match
+                        and association_table_name_match.group('left_table') in self.meta.tables
+                        and association_table_name_match.group('right_table') in self.meta.tables):
+                    logger.debug('table "%s" seems to be a many-to-many relation table', table.name)
                     left_table = self.meta.tables[association_table_name_match.group('left_table')]
                     right_table = self.meta.tables[association_table_name_match.group('right_table')]
                     many_to_many_relations.add((left_table, right_table))
@@ -191,21 +520,49 @@ Model = declarative_base()
                         'fk_constraint': fk_constraint})
         return one_to_many_relations, many_to_many_relations
 
-    def write_models(self, output_fp):
-        # print(meta.tables)
-
-        # build a dictionary of table_name to io.StringIO
-        # so we can edit the classes repeatedly before writing them to a file
-        def string_io_factory():
-            return io.StringIO()
-        table_to_table_code = defaultdict(string_io_factory)
+    def get_loader_strategy(self, relation_kind, table, attribute_name, table_one, table_many):
+        """
+        Return the lazy= argument for relationship attribute_name on the class for table.
+        For many-to-many relationships table_many is the association table.
+        """
+        return self.loader_strategies.get_strategy(
+            relation_kind,
+            table.name,
+            attribute_name,
+            row_counts=self.row_counts,
+            one_table_name=table_one.name,
+            many_table_name=table_many.name)
 
-        insp = sa.engine.reflection.Inspector.from_engine(self.engine)
-        for table in self.meta.sorted_tables:
-            print(table)
+    def get_written_foreign_keys(self, table):
+        """
+        Return the foreign keys of table referring to generated tables in this
+        schema. Each generated package has its own MetaData so a foreign key to
+        a table in another schema could not be resolved and is left out.
+        """
+        written_foreign_keys = []
+        for fk_constraint in self.catalog.get_foreign_keys(table.name):
+            if fk_constraint['referred_schema'] is not None:
+                logger.info(
+                    'leaving out foreign key %s(%s) -> %s.%s(%s) to another schema',
+                    table.name,
+                    ', '.join(fk_constraint['constrained_columns']),
+                    fk_constraint['referred_schema'],
+                    fk_constraint['referred_table'],
+                    ', '.join(fk_constraint['referred_columns']))
+            elif fk_constraint['referred_table'] in self.meta.tables:
+                written_foreign_keys.append(fk_constraint)
+            else:
+                pass
+        return written_foreign_keys
 
-            table_code = table_to_table_code[table]
+    def write_table_class(self, table, table_code):
+        """
+        Write the class definition and columns for table to table_code.
+        """
+        insp = self.catalog
+        logger.debug('writing the class for table "%s"', table.name)
 
+        with self.profile('render', table.name):
             # class Table_name(Model):
             table_code.write("class {}({}):\n".format(
                 table.name.capitalize(),
@@ -215,7 +572,7 @@ Model = declarative_base()
 
             # write foreign key constraints using explicit ForeignKeyConstraints
             foreign_key_constraints = []
-            for fk_constraint in insp.get_foreign_keys(table_name=table.name):
+            for fk_constraint in self.get_written_foreign_keys(table):
                 constrained_columns_code = ','.join(["'{}'".format(c) for c in fk_constraint['constrained_columns']])
                 referred_columns_code = ','.join(["'{}.{}'".format(fk_constraint['referred_table'], r) for r in fk_constraint['referred_columns']])
 
@@ -225,6 +582,26 @@ Model = declarative_base()
 
                 foreign_key_constraints.append("        sa.ForeignKeyConstraint({})".format(','.join(all_arguments)))
 
+            # write indexes and unique constraints so the fast access paths are visible
+            for unique_constraint in insp.get_unique_constraints(table.name):
+                all_arguments = ["'{}'".format(c) for c in unique_constraint['column_names']]
+                if unique_constraint.get('name') is not None:
+                    all_arguments.append("name='{}'".format(unique_constraint['name']))
+                foreign_key_constraints.append("        sa.UniqueConstraint({})".format(','.join(all_arguments)))
+
+            for index in insp.get_indexes(table.name):
+                if index['name'] is None or None in index['column_names']:
+                    # skip unnamed and expression indexes
+                    pass
+                elif 'duplicates_constraint' in index:
+                    # written as a UniqueConstraint
+                    pass
+                else:
+                    all_arguments = ["'{}'".format(index['name'])] + ["'{}'".format(c) for c in index['column_names']]
+                    if index['unique']:
+                        all_arguments.append('unique=True')
+                    foreign_key_constraints.append("        sa.Index({})".format(','.join(all_arguments)))
+
             if len(foreign_key_constraints) == 0:
                 pass
             else:
@@ -237,8 +614,10 @@ Model = declarative_base()
                     pass
                 table_code.write('\n    )\n\n')
 
+        with self.profile('pks', table.name):
             # handle primary key columns
-            for pk_column in (table.c[c_] for c_ in insp.get_pk_constraint(table_name=table.name)['constrained_columns']):
+            pk_constraint = insp.get_pk_constraint(table_name=table.name)
+            for pk_column in (table.c[c_] for c_ in pk_constraint['constrained_columns']):
                 table_code.write(
                     "    {} = sa.Column('{}', {}, primary_key=True)\n".format(
                         self.translate_column_name_to_py(pk_column.name),
@@ -247,10 +626,10 @@ Model = declarative_base()
 
             table_code.write('\n')
 
+        with self.profile('columns', table.name):
             # handle the data columns including foreign key columns
-            pk_constraint = insp.get_pk_constraint(table.name)
-            print('pk_constraint for table {}:\n{}'.format(table.name, pk_constraint))
-            print('column_data for table {}:\n{}'.format(table.name, insp.get_columns(table.name)))
+            logger.debug('pk_constraint for table %s:\n%s', table.name, pk_constraint)
+            logger.debug('column_data for table %s:\n%s', table.name, insp.get_columns(table.name))
             for column_data in insp.get_columns(table.name):
                 if column_data['name'] in pk_constraint['constrained_columns']:
                     pass
@@ -274,19 +653,20 @@ Model = declarative_base()
                         table_code.write(", default={}".format(column_data['default']))
                     table_code.write(")  # column.type was '{}'\n".format(column_data['type']))
 
-            table_code.write("\n")
+        table_code.write("\n")
 
-        # code for one-to-many relations
-        one_side_one_to_many_relation_code_template = """\
+    # code for one-to-many relations
+    one_side_one_to_many_relation_code_template = """\
     {many_table}_list = sa.orm.relationship(
         "{many_class}",
-        backref="{one_table}",
+        backref=backref("{one_table}", lazy="{many_to_one_lazy}"),
         cascade="all, delete-orphan",
-        passive_deletes=True)
+        passive_deletes=True,
+        lazy="{one_to_many_lazy}")
         #back_populates="{one_table}")
 
 """
-        many_side_one_to_many_relation_cascade_delete_code_template = """\
+    many_side_one_to_many_relation_cascade_delete_code_template = """\
     #{one_table} = sa.orm.relationship(
         #"{one_class}")
         #backref=backref("{many_table}", passive_deletes=True))
@@ -294,101 +674,808 @@ Model = declarative_base()
 
 """
 
-        many_side_one_to_many_relation_code_template = """\
+    many_side_one_to_many_relation_code_template = """\
     #{one_table} = sa.orm.relationship(
         #"{one_class}",
         #back_populates="{many_table}_list")
 
 """
-        # code for many-to-many relations
-        relationship_code = """\
+    # code for many-to-many relations
+    many_to_many_relation_code_template = """\
     {table_2}_list = sa.orm.relationship(
         "{class_2}",
         secondary="{relation_table}",
-        back_populates="{table_1}_list")
+        back_populates="{table_1}_list",
+        lazy="{lazy}")
 
 """
-        insp = sa.engine.reflection.Inspector.from_engine(self.engine)
-        for table in self.meta.sorted_tables:
-            one_to_many_relations, many_to_many_relations = self.get_relations(table)
-            for one_to_many_relation in one_to_many_relations:
-                table_one = one_to_many_relation['one']
-                table_many = one_to_many_relation['many']
 
-                # find the fk constraint on the many table referring to the one table
-                print('looking for fk constraint on table {}'.format(table_many.name))
-                table_many_fk_constraints = insp.get_foreign_keys(table_name=table_many.name)
-                many_to_one_fk_constraint = None
-                print('looking for foreign key constraint from table_many:"{}" to table_one:"{}"'.format(table_many, table_one))
-                for table_many_fk_constraint in table_many_fk_constraints:
-                    print(table_many_fk_constraint)
-                    if table_one.name in table_many_fk_constraint['referred_table']:
-                        many_to_one_fk_constraint = table_many_fk_constraint
-                        print('found foreign key constraint {}'.format(table_many_fk_constraint))
-                        break
-                # did we find it?
-                if many_to_one_fk_constraint is None:
-                    raise Exception('dammit!')
-                elif 'ondelete' in many_to_one_fk_constraint['options']:
-                    table_many_code = table_to_table_code[table_many]
-                    table_many_code.write(
-                        many_side_one_to_many_relation_cascade_delete_code_template.format(
-                            one_table=table_one,
-                            one_class=table_one.name.capitalize(),
-                            many_table=table_many.name))
-                else:
-                    table_many_code = table_to_table_code[table_many]
-                    table_many_code.write(
-                        many_side_one_to_many_relation_code_template.format(
-                            one_table=table_one,
-                            one_class=table_one.name.capitalize(),
-                            many_table=table_many.name))
+    def write_relationships(self, table, get_code):
+        """
+        Write the relationships found from the foreign keys of table to the code
+        of the tables at either end. get_code(table) returns the io.StringIO for
+        a table, or None if the code for that table is not wanted.
+        """
+        one_to_many_relations, many_to_many_relations = self.get_relations(table)
+        for one_to_many_relation in one_to_many_relations:
+            table_one = one_to_many_relation['one']
+            table_many = one_to_many_relation['many']
+
+            # find the fk constraint on the many table referring to the one table
+            logger.debug('looking for foreign key constraint from table_many:"%s" to table_one:"%s"', table_many, table_one)
+            many_to_one_fk_constraint = None
+            for table_many_fk_constraint in self.fk_graph.get_foreign_keys_between(table_many.name, table_one.name):
+                many_to_one_fk_constraint = table_many_fk_constraint
+                logger.debug('found foreign key constraint %s', table_many_fk_constraint)
+                break
+            # did we find it?
+            table_many_code = get_code(table_many)
+            if many_to_one_fk_constraint is None:
+                raise Exception('dammit!')
+            elif table_many_code is None:
+                pass
+            elif 'ondelete' in many_to_one_fk_constraint['options']:
+                table_many_code.write(
+                    self.many_side_one_to_many_relation_cascade_delete_code_template.format(
+                        one_table=table_one,
+                        one_class=table_one.name.capitalize(),
+                        many_table=table_many.name))
+            else:
+                table_many_code.write(
+                    self.many_side_one_to_many_relation_code_template.format(
+                        one_table=table_one,
+                        one_class=table_one.name.capitalize(),
+                        many_table=table_many.name))
 
-                print('  table "{}" has a one-to-many relationship with table "{}"'.format(
-                    table_one, table_many))
+            logger.debug('  table "%s" has a one-to-many relationship with table "%s"', table_one, table_many)
 
-                table_one_code = table_to_table_code[table_one]
+            table_one_code = get_code(table_one)
+            if table_one_code is not None:
                 table_one_code.write(
-                    one_side_one_to_many_relation_code_template.format(
+                    self.one_side_one_to_many_relation_code_template.format(
                         many_table=table_many.name,
                         many_class=table_many.name.capitalize(),
-                        one_table=table_one.name))
-
-                #table_many_code = table_to_table_code[table_many]
-                #table_many_code.write(
-                #    many_side_one_to_many_relation_code_template.format(
-                #        one_table=table_one,
-                #        one_class=table_one.name.capitalize(),
-                #        many_table=table_many.name))
+                        one_table=table_one.name,
+                        one_to_many_lazy=self.get_loader_strategy(
+                            'one_to_many', table_one, '{}_list'.format(table_many.name), table_one, table_many),
+                        many_to_one_lazy=self.get_loader_strategy(
+                            'many_to_one', table_many, table_one.name, table_one, table_many)))
 
-            for (table_a, table_b) in many_to_many_relations:
-                print('  writing code for many-to-many relation between tables "{}" and "{}"'.format(
-                    table_a, table_b))
-                table_a_code = table_to_table_code[table_a]
+        for (table_a, table_b) in many_to_many_relations:
+            logger.debug('  writing code for many-to-many relation between tables "%s" and "%s"', table_a, table_b)
+            table_a_code = get_code(table_a)
+            if table_a_code is not None:
                 table_a_code.write(
-                    relationship_code.format(
+                    self.many_to_many_relation_code_template.format(
                         table_1=table_a.name,
                         class_2=table_b.name.capitalize(),
                         relation_table=table.name,
-                        table_2=table_b.name))
+                        table_2=table_b.name,
+                        lazy=self.get_loader_strategy(
+                            'many_to_many', table_a, '{}_list'.format(table_b.name), table_a, table)))
 
-                table_b_code = table_to_table_code[table_b]
+            table_b_code = get_code(table_b)
+            if table_b_code is not None:
                 table_b_code.write(
-                    relationship_code.format(
+                    self.many_to_many_relation_code_template.format(
                         table_1=table_b.name,
                         class_2=table_a.name.capitalize(),
                         relation_table=table.name,
-                        table_2=table_a.name))
+                        table_2=table_a.name,
+                        lazy=self.get_loader_strategy(
+                            'many_to_many', table_b, '{}_list'.format(table_a.name), table_b, table)))
+
+    def get_table_code(self, tables=None):
+        """
+        Return a dictionary of table to io.StringIO holding the generated class
+        for each table in tables, or for every table if tables is None.
+        """
+        if tables is None:
+            tables = self.meta.sorted_tables
+        else:
+            requested_tables = set(tables)
+            tables = [table for table in self.meta.sorted_tables if table in requested_tables]
+
+        # build a dictionary of table_name to io.StringIO
+        # so we can edit the classes repeatedly before writing them to a file
+        table_to_table_code = {table: io.StringIO() for table in tables}
+
+        for table in tables:
+            self.write_table_class(table, table_to_table_code[table])
+
+        # relationship code for tables not in tables is not written
+        for table in self.meta.sorted_tables:
+            with self.profile('relations', table.name):
+                self.write_relationships(table, table_to_table_code.get)
 
         for table, table_code in table_to_table_code.items():
+            with self.profile('render', table.name):
+                self.write_additional_methods(table, table_code)
+                if self.row_classes:
+                    self.write_row_class(table, table_code)
+
+        return table_to_table_code
+
+    _table_name_to_sort_index = None
+
+    def get_relationship_source_tables(self, table):
+        """
+        Return the tables, in the order get_table_code visits them, whose foreign
+        keys can add relationships to the class for table: table itself, the
+        tables related to it by foreign keys and its association tables.
+        """
+        if self._table_name_to_sort_index is None:
+            # meta.sorted_tables sorts the tables again each time
+            self._table_name_to_sort_index = {t.name: i for i, t in enumerate(self.meta.sorted_tables)}
+        source_table_names = self.get_related_table_names(table.name)
+        source_table_names.add(table.name)
+        return sorted(
+            (self.meta.tables[n] for n in source_table_names if n in self.meta.tables),
+            key=lambda t: self._table_name_to_sort_index[t.name])
+
+    def iter_table_code(self, tables=None):
+        """
+        Yield (table, code) for each table in tables, or for every table, in
+        order of table name. The code is the same as from get_table_code but
+        each class is complete when it is yielded: its relationships are found
+        from the tables in its foreign key neighbourhood alone. Only the class
+        being generated is held in memory.
+        """
+        if tables is None:
+            tables = self.meta.sorted_tables
+        for table in sorted(tables, key=lambda t: t.name):
+            yield table, self.get_complete_table_code(table)
+
+    def get_complete_table_code(self, table):
+        """Return the code for table's class with its relationships and additional methods."""
+        table_code = io.StringIO()
+        self.write_table_class(table, table_code)
+
+        def get_code(relationship_table):
+            return table_code if relationship_table is table else None
+
+        for source_table in self.get_relationship_source_tables(table):
+            with self.profile('relations', source_table.name):
+                self.write_relationships(source_table, get_code)
+
+        with self.profile('render', table.name):
             self.write_additional_methods(table, table_code)
+            if self.row_classes:
+                self.write_row_class(table, table_code)
+        return table_code.getvalue()
+
+    def get_header_code(self):
+        header_code = self.import_model_base()
+        if self.lookup_methods:
+            header_code += self.get_lookup_base_code()
+        if self.row_classes:
+            header_code += self.get_row_base_code()
+        return header_code + self.get_additional_imports()
+
+    def get_relationship_names(self):
+        """
+        Return a dictionary of table name to the sorted names of the relationship
+        attributes get_table_code writes on its class, including backrefs.
+        """
+        table_name_to_relationship_names = {table.name: set() for table in self.meta.sorted_tables}
+        for table in self.meta.sorted_tables:
+            one_to_many_relations, many_to_many_relations = self.get_relations(table)
+            for one_to_many_relation in one_to_many_relations:
+                table_one = one_to_many_relation['one']
+                table_many = one_to_many_relation['many']
+                table_name_to_relationship_names[table_one.name].add('{}_list'.format(table_many.name))
+                table_name_to_relationship_names[table_many.name].add(table_one.name)
+            for (table_a, table_b) in many_to_many_relations:
+                table_name_to_relationship_names[table_a.name].add('{}_list'.format(table_b.name))
+                table_name_to_relationship_names[table_b.name].add('{}_list'.format(table_a.name))
+        return {
+            table_name: sorted(relationship_names)
+            for table_name, relationship_names
+            in table_name_to_relationship_names.items()}
+
+    manifest_format_version = 1
+
+    def get_manifest(self, models_sha1):
+        """
+        Return a description of the generated classes that orminator.warmup
+        checks against the imported models: the hash of the models code and the
+        table, primary key, column and relationship attribute names of every class.
+        """
+        table_name_to_relationship_names = self.get_relationship_names()
+        classes = {}
+        for table in self.meta.sorted_tables:
+            pk_column_names = self.catalog.get_pk_constraint(table.name)['constrained_columns']
+            classes[table.name.capitalize()] = {
+                'table': table.name,
+                'primary_key': [self.translate_column_name_to_py(c) for c in pk_column_names],
+                'columns': [
+                    self.translate_column_name_to_py(column_data['name'])
+                    for column_data
+                    in self.catalog.get_columns(table.name)],
+                'relationships': table_name_to_relationship_names[table.name]
+            }
+        return {
+            'format_version': self.manifest_format_version,
+            'models_sha1': models_sha1,
+            'classes': classes
+        }
+
+    def write_manifest(self, manifest_fp, models_sha1, check=False):
+        """
+        Write the manifest for the models code with hash models_sha1 to
+        manifest_fp and return True if the file changed. If check is True
+        nothing is written.
+        """
+        manifest_code = json.dumps(self.get_manifest(models_sha1), indent=2, sort_keys=True) + '\n'
+        stale, _ = self.write_code(manifest_fp, [manifest_code], check=check)
+        return stale
+
+    def write_code(self, output_fp, code_chunks, check=False):
+        """
+        Write the strings from code_chunks to a temporary file next to output_fp
+        and rename it to output_fp if the content is new, so output_fp is never
+        left partly written and is not touched if nothing changed. Return True
+        if output_fp was out of date and the sha1 hex digest of the code.
+
+        If check is True output_fp is not replaced.
+        """
+        output_dir, output_file_name = os.path.split(os.path.abspath(output_fp))
+        temp_fp = os.path.join(output_dir, '.{}.{}.tmp'.format(output_file_name, os.getpid()))
+        code_sha1 = hashlib.sha1()
+        try:
+            with open(temp_fp, 'wt') as temp_file:
+                for code_chunk in code_chunks:
+                    temp_file.write(code_chunk)
+                    code_sha1.update(code_chunk.encode('utf-8'))
+
+            if os.path.exists(output_fp):
+                stale = not filecmp.cmp(temp_fp, output_fp, shallow=False)
+            else:
+                stale = True
+
+            if check or not stale:
+                pass
+            else:
+                if os.path.exists(output_fp):
+                    shutil.copymode(output_fp, temp_fp)
+                os.replace(temp_fp, output_fp)
+        finally:
+            if os.path.exists(temp_fp):
+                os.remove(temp_fp)
+        return stale, code_sha1.hexdigest()
+
+    def iter_models_code(self):
+        """Yield the header and then the code for each class as soon as it is complete."""
+        yield self.get_header_code()
+        ##flask: test_models.write("from app import db\n\n")
+        for _, table_code in self.iter_table_code():
+            yield table_code
+            yield '\n'
+
+    def write_models(self, output_fp, incremental=False, check=False, manifest_fp=None):
+        """
+        Write the generated classes to output_fp and return True if the file changed.
+        Classes are written as they are generated, through a temporary file that
+        replaces output_fp when it is complete.
+
+        If incremental is True each class is preceded by a comment holding a hash of
+        its table's definition and foreign key neighbourhood. On the next incremental
+        run only classes with a different hash are generated again and spliced into
+        the existing file.
+
+        If manifest_fp is given a JSON manifest of the classes is also written
+        there for orminator.warmup.
+
+        If check is True nothing is written and the return value is True if the
+        file (or the manifest) is out of date.
+        """
+        if incremental:
+            code_chunks = [self.get_incremental_models_code(output_fp)]
+        else:
+            code_chunks = self.iter_models_code()
+
+        with self.profile('render'):
+            stale, models_sha1 = self.write_code(output_fp, code_chunks, check=check)
+        logger.info('%s is %s', output_fp, 'out of date' if stale else 'up to date')
+
+        if manifest_fp is not None:
+            with self.profile('render'):
+                manifest_stale = self.write_manifest(manifest_fp, models_sha1, check=check)
+            logger.info('%s is %s', manifest_fp, 'out of date' if manifest_stale else 'up to date')
+            stale = stale or manifest_stale
+        return stale
+
+    _incremental_header_re = re.compile(r'# orminator header=(?P<hash>\w+)\n')
+    _incremental_table_re = re.compile(r'^# orminator table=(?P<table>\S+) hash=(?P<hash>\w+)\n', re.MULTILINE)
+
+    def read_incremental_models(self, output_fp):
+        """
+        Return the header hash and a dictionary of table name to (hash, class code)
+        from a file written by an incremental run, or (None, {}) if there is no
+        such file.
+        """
+        if not os.path.exists(output_fp):
+            return None, {}
+        with open(output_fp, 'rt') as existing_models:
+            existing_models_code = existing_models.read()
+
+        header_match = self._incremental_header_re.match(existing_models_code)
+        if header_match is None:
+            return None, {}
+
+        table_name_to_hash_and_code = {}
+        table_matches = list(self._incremental_table_re.finditer(existing_models_code))
+        for i, table_match in enumerate(table_matches):
+            if i + 1 < len(table_matches):
+                code_end = table_matches[i + 1].start()
+            else:
+                code_end = len(existing_models_code)
+            table_name_to_hash_and_code[table_match.group('table')] = (
+                table_match.group('hash'),
+                existing_models_code[table_match.end():code_end])
+        return header_match.group('hash'), table_name_to_hash_and_code
+
+    _table_name_to_association_table_names = None
+
+    def get_related_table_names(self, table_name):
+        """
+        Return the names of the tables whose classes can have relationships with
+        the class for table_name: tables related by foreign keys and association
+        tables recognized by name.
+        """
+        if self._table_name_to_association_table_names is None:
+            # built before it is shared so threads never see it partly filled
+            table_name_to_association_table_names = defaultdict(set)
+            for other_table_name in self.fk_graph.get_table_names():
+                association_table_name_match = self._association_table_re.search(other_table_name)
+                if association_table_name_match:
+                    for related_table_name in association_table_name_match.groups():
+                        table_name_to_association_table_names[related_table_name].add(other_table_name)
+            self._table_name_to_association_table_names = dict(table_name_to_association_table_names)
+
+        related_table_names = set(self.fk_graph.get_neighbors(table_name))
+        related_table_names.update(self._table_name_to_association_table_names.get(table_name, ()))
+        association_table_name_match = self._association_table_re.search(table_name)
+        if association_table_name_match:
+            related_table_names.update(
+                n for n in association_table_name_match.groups() if n in self.meta.tables)
+        related_table_names.discard(table_name)
+        return related_table_names
+
+    def get_table_neighborhood(self, table):
+        """
+        Return everything the generated code for table depends on: the table's own
+        definition and the foreign keys of every table that can contribute a
+        relationship to its class.
+        """
+        def describe_table(table_name):
+            return (
+                table_name,
+                [
+                    (c['name'], repr(c['type']), c.get('nullable'), c.get('default'))
+                    for c
+                    in self.catalog.get_columns(table_name)],
+                self.catalog.get_pk_constraint(table_name)['constrained_columns'],
+                [sorted(fk.items()) for fk in self.catalog.get_foreign_keys(table_name)],
+                [sorted(index.items()) for index in self.catalog.get_indexes(table_name)],
+                [sorted(uc.items()) for uc in self.catalog.get_unique_constraints(table_name)])
+
+        neighbor_table_names = self.get_related_table_names(table.name)
+
+        return (
+            describe_table(table.name),
+            [
+                (
+                    n,
+                    [sorted(fk.items()) for fk in self.fk_graph.get_foreign_keys(n)],
+                    # row counts can make a collection in either direction lazy
+                    self.loader_strategies.is_large_collection(table.name, n, self.row_counts),
+                    self.loader_strategies.is_large_collection(n, table.name, self.row_counts))
+                for n
+                in sorted(neighbor_table_names)])
+
+    def get_generation_settings(self):
+        """
+        Return the options other than the catalog that change the generated code.
+        Subclasses with options of their own should add them.
+        """
+        return {
+            'model_writer_class': '{}.{}'.format(type(self).__module__, type(self).__qualname__),
+            'loader_strategies': self.loader_strategies.as_dict(),
+            'row_classes': self.row_classes,
+            'lookup_methods': self.lookup_methods,
+            'name_translations': [
+                (pattern.pattern, pattern.flags, replacement)
+                for pattern, replacement
+                in self.get_name_translator().translations],
+            'type_translations': [
+                (pattern.pattern, pattern.flags, replacement)
+                for pattern, replacement
+                in self.get_type_translator().translations],
+            'templates': {
+                name: getattr(self, name)
+                for name
+                in dir(self)
+                if name.endswith('_template')}
+        }
+
+    def get_header_hash(self, header_code):
+        """
+        Return a hash of the header code and the generation settings, so
+        changing either generates every class again.
+        """
+        header_sha1 = hashlib.sha1(header_code.encode('utf-8'))
+        header_sha1.update(json.dumps(self.get_generation_settings(), sort_keys=True).encode('utf-8'))
+        return header_sha1.hexdigest()
+
+    def get_table_hash(self, table):
+        return hashlib.sha1(repr(self.get_table_neighborhood(table)).encode('utf-8')).hexdigest()
+
+    def get_incremental_models_code(self, output_fp):
+        header_code = self.get_header_code()
+        header_hash = self.get_header_hash(header_code)
+        existing_header_hash, table_name_to_hash_and_code = self.read_incremental_models(output_fp)
+        if existing_header_hash != header_hash:
+            # the imports or the settings have changed so generate every class
+            table_name_to_hash_and_code = {}
+
+        table_to_hash = {table: self.get_table_hash(table) for table in self.meta.sorted_tables}
+        changed_tables = [
+            table
+            for table, table_hash
+            in table_to_hash.items()
+            if table_name_to_hash_and_code.get(table.name, (None, None))[0] != table_hash]
+        logger.info('generating code for %d changed table(s)', len(changed_tables))
+        table_to_table_code = self.get_table_code(tables=changed_tables)
+
+        models_code = io.StringIO()
+        models_code.write('# orminator header={}\n'.format(header_hash))
+        models_code.write(header_code)
+        for table in sorted(table_to_hash, key=lambda t: t.name):
+            models_code.write('# orminator table={} hash={}\n'.format(table.name, table_to_hash[table]))
+            if table in table_to_table_code:
+                models_code.write(table_to_table_code[table].getvalue())
+                models_code.write('\n')
+            else:
+                models_code.write(table_name_to_hash_and_code[table.name][1])
+        return models_code.getvalue()
+
+    def get_module_name(self, table_name):
+        module_name = re.sub(r'\W', '_', table_name)
+        if keyword.iskeyword(module_name) or module_name in ('base', '__init__'):
+            module_name += '_'
+        return module_name
+
+    def get_module_tables(self, split='component'):
+        """
+        Return a dictionary of module name to the tables whose classes go in that
+        module. If split is 'table' each table has its own module. If split is
+        'component' tables connected by relationships share a module named for the
+        first table in the group.
+        """
+        if split == 'table':
+            return {
+                self.get_module_name(table.name): [table]
+                for table
+                in self.meta.sorted_tables}
+        elif split == 'component':
+            # union-find over related tables
+            table_name_to_parent = {table.name: table.name for table in self.meta.sorted_tables}
+
+            def find(table_name):
+                while table_name_to_parent[table_name] != table_name:
+                    table_name_to_parent[table_name] = table_name_to_parent[table_name_to_parent[table_name]]
+                    table_name = table_name_to_parent[table_name]
+                return table_name
+
+            for table_name in table_name_to_parent:
+                for related_table_name in self.get_related_table_names(table_name):
+                    if related_table_name in table_name_to_parent:
+                        root, related_root = sorted((find(table_name), find(related_table_name)))
+                        table_name_to_parent[related_root] = root
+
+            root_to_tables = defaultdict(list)
+            for table in sorted(self.meta.sorted_tables, key=lambda t: t.name):
+                root_to_tables[find(table.name)].append(table)
+            return {
+                self.get_module_name(tables[0].name): tables
+                for tables
+                in root_to_tables.values()}
+        else:
+            raise ValueError('split must be "table" or "component", not "{}"'.format(split))
+
+    package_init_template = """\
+\"\"\"
+Generated by orminator. Each class is imported from its module on first access,
+for example
+
+    import {package_name}
+    {package_name}.{example_class}
+\"\"\"
+import importlib
+
+_name_to_module_name = {{
+{name_to_module_name}
+}}
+
+__all__ = sorted(_name_to_module_name)
+
+
+def __getattr__(name):
+    try:
+        module_name = _name_to_module_name[name]
+    except KeyError:
+        raise AttributeError('module {{!r}} has no attribute {{!r}}'.format(__name__, name))
+    value = getattr(importlib.import_module('.' + module_name, __name__), name)
+    # the next access will not call __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return __all__
+
+
+def import_all():
+    \"\"\"Import every module, for example before calling Model.metadata.create_all().\"\"\"
+    for module_name in sorted(set(_name_to_module_name.values())):
+        importlib.import_module('.' + module_name, __name__)
+"""
+
+    package_base_template = """\
+
+import importlib
+import sys
+
+# the modules holding the classes that each module's relationships refer to
+_module_name_to_related_module_names = {{
+{module_name_to_related_module_names}
+}}
+
+
+@sa.event.listens_for(Model, 'before_configured')
+def _import_related_modules(*args):
+    \"\"\"
+    relationship() targets are class names resolved when the mappers are
+    configured, so import the modules of related classes then rather than
+    importing every module with the first class. Newer sqlalchemy versions
+    pass the registry being configured.
+    \"\"\"
+    imported_module_names = {{
+        module_name
+        for module_name
+        in _module_name_to_related_module_names
+        if '{{}}.{{}}'.format(__package__, module_name) in sys.modules}}
+    module_names = list(imported_module_names)
+    while len(module_names) > 0:
+        for related_module_name in _module_name_to_related_module_names[module_names.pop()]:
+            if related_module_name not in imported_module_names:
+                importlib.import_module('.' + related_module_name, __package__)
+                imported_module_names.add(related_module_name)
+                module_names.append(related_module_name)
+"""
+
+    def get_package_code(self, package_name, split='component'):
+        """
+        Return a dictionary of file name to code for a package with one module
+        per table or per group of related tables.
+        """
+        module_name_to_tables = self.get_module_tables(split=split)
+        table_to_table_code = self.get_table_code()
+        table_to_module_name = {
+            table: module_name
+            for module_name, tables
+            in module_name_to_tables.items()
+            for table in tables}
+
+        file_name_to_code = {}
+        module_name_to_related_module_names = {}
+        for module_name, tables in module_name_to_tables.items():
+            module_code = io.StringIO()
+            module_code.write('from .base import *  # noqa\n\n\n')
+            for table in tables:
+                module_code.write(table_to_table_code[table].getvalue())
+                module_code.write('\n')
+            file_name_to_code[module_name + '.py'] = module_code.getvalue()
+            module_name_to_related_module_names[module_name] = sorted({
+                table_to_module_name[self.meta.tables[related_table_name]]
+                for table in tables
+                for related_table_name in self.get_related_table_names(table.name)
+                if related_table_name in self.meta.tables} - {module_name})
+
+        file_name_to_code['base.py'] = self.get_header_code() + self.package_base_template.format(
+            module_name_to_related_module_names=',\n'.join(
+                "    '{}': [{}]".format(module_name, ', '.join("'{}'".format(m) for m in related_module_names))
+                for module_name, related_module_names
+                in sorted(module_name_to_related_module_names.items())))
+
+        name_to_module_name = {self.get_model_parent_class_name(): 'base'}
+        if self.row_classes:
+            name_to_module_name['ReadOnlyRow'] = 'base'
+        for table, module_name in table_to_module_name.items():
+            name_to_module_name[table.name.capitalize()] = module_name
+            if self.row_classes:
+                name_to_module_name[self.get_row_class_name(table)] = module_name
+                name_to_module_name[self.get_core_table_name(table)] = module_name
+        file_name_to_code['__init__.py'] = self.package_init_template.format(
+            package_name=package_name,
+            example_class=sorted(name_to_module_name)[0],
+            name_to_module_name=',\n'.join(
+                "    '{}': '{}'".format(name, module_name)
+                for name, module_name
+                in sorted(name_to_module_name.items())))
+        return file_name_to_code
+
+    def write_models_package(self, output_dir, split='component', check=False):
+        """
+        Write the generated classes as a package in output_dir, one module per
+        table (split='table') or per group of related tables (split='component').
+        Only files with new content are written. Return True if any file changed.
+
+        If check is True nothing is written and the return value is True if the
+        package is out of date.
+        """
+        package_name = os.path.basename(os.path.normpath(output_dir))
+        file_name_to_code = self.get_package_code(package_name, split=split)
+
+        stale = False
+        for file_name, code in sorted(file_name_to_code.items()):
+            file_path = os.path.join(output_dir, file_name)
+            if os.path.exists(file_path):
+                with open(file_path, 'rt') as existing_module:
+                    file_stale = existing_module.read() != code
+            else:
+                file_stale = True
+
+            if file_stale and not check:
+                os.makedirs(output_dir, exist_ok=True)
+                with open(file_path, 'wt') as module:
+                    module.write(code)
+                logger.info('wrote %s', file_path)
+            stale = stale or file_stale
+
+        return stale
+
+
+class MultiSchemaModelWriter():
+    """
+    Generate models for several schemas or databases in one run, one package
+    per schema. targets is a list of database URIs or (database URI, schema)
+    pairs, for example
+
+        MultiSchemaModelWriter([
+            'mysql+pymysql://imicrobe:<password>@localhost/imicrobe',
+            'mysql+pymysql://imicrobe:<password>@localhost/muscope2'])
+
+    MySQL and MariaDB databases on the same server are read as schemas over one
+    shared engine, other URIs have an engine each. Catalogs are read concurrently
+    with up to workers threads, and schemas whose tables have identical
+    definitions (according to their fingerprints) share one catalog. Each
+    package has its own MetaData, so foreign keys to tables in another schema
+    are left out (and logged).
+
+    A scope (TableScope) applies to every schema, roots missing from a schema
+    are ignored and schemas with no tables in scope are not written. Other
+    keyword arguments are passed to every ModelWriter.
+    """
+    def __init__(
+            self,
+            targets,
+            cache_dir=None,
+            workers=1,
+            scope=None,
+            model_writer_class=ModelWriter,
+            **model_writer_options):
+        self.workers = workers
+        self.scope = scope
+        self.targets = [self.get_target(target) for target in targets]
+
+        server_uri_to_targets = defaultdict(list)
+        for db_uri, schema, server_uri in self.targets:
+            server_uri_to_targets[server_uri].append((db_uri, schema))
+        # one engine for each server with a connection for each schema read at the same time
+        self.server_uri_to_engine = {
+            server_uri: engine_registry.get_engine(
+                server_targets[0][0],
+                pool_size=max(1, min(workers, len(server_targets))),
+                max_overflow=0)
+            for server_uri, server_targets
+            in server_uri_to_targets.items()}
+
+        catalogs = self.read_catalogs(cache_dir)
+
+        self.package_name_to_model_writer = {}
+        for (db_uri, schema, server_uri), catalog in zip(self.targets, catalogs):
+            if len(catalog.get_table_names()) == 0:
+                logger.info('no tables to generate for schema %s', schema or db_uri)
+                continue
+            model_writer = model_writer_class(
+                db_uri,
+                schema=schema,
+                engine=self.server_uri_to_engine[server_uri],
+                catalog=catalog,
+                **model_writer_options)
+            self.package_name_to_model_writer[self.get_package_name(model_writer, db_uri, schema)] = model_writer
+
+    @staticmethod
+    def get_target(target):
+        """Return (database URI, schema, server URI) for a URI or a (URI, schema) pair."""
+        if isinstance(target, str):
+            db_uri, schema = target, None
+        else:
+            db_uri, schema = target
+        url = sa.engine.url.make_url(db_uri)
+        if url.get_backend_name() in ('mysql', 'mariadb'):
+            if schema is None:
+                schema = url.database
+            server_uri = url.set(database=None).render_as_string(hide_password=False)
+        else:
+            server_uri = url.render_as_string(hide_password=False)
+        return db_uri, schema, server_uri
+
+    def get_package_name(self, model_writer, db_uri, schema):
+        if schema is None:
+            # for example the file name of an SQLite database
+            name = os.path.splitext(os.path.basename(sa.engine.url.make_url(db_uri).database or 'models'))[0]
+        else:
+            name = schema
+        return model_writer.get_module_name(name)
+
+    def read_catalogs(self, cache_dir):
+        """Return a CatalogSnapshot for each target, reading each distinct catalog once."""
+        def get_fingerprints_and_only(target):
+            _, schema, server_uri = target
+            engine = self.server_uri_to_engine[server_uri]
+            if self.scope is None:
+                only = None
+            else:
+                only = self.scope.get_table_names(engine, schema=schema, ignore_unknown_roots=True)
+            return get_table_fingerprints(engine, schema=schema), only
+
+        def read_catalog(i):
+            _, schema, server_uri = self.targets[i]
+            engine = self.server_uri_to_engine[server_uri]
+            if only[i] is not None and len(only[i]) == 0:
+                return CatalogSnapshot()
+            elif cache_dir is None:
+                return CatalogSnapshot.from_engine(engine, schema=schema, only=only[i])
+            else:
+                return ReflectionCache(cache_dir).get_catalog(
+                    engine, schema=schema, only=only[i], fingerprints=fingerprints[i])
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            fingerprints, only = zip(*executor.map(get_fingerprints_and_only, self.targets))
+
+            # targets with the same dialect, fingerprints and tables in scope have the same catalog
+            catalog_key_to_indices = defaultdict(list)
+            for i, (target, target_fingerprints) in enumerate(zip(self.targets, fingerprints)):
+                if target_fingerprints is None:
+                    catalog_key = i
+                else:
+                    catalog_key = (
+                        self.server_uri_to_engine[target[2]].dialect.name,
+                        tuple(sorted(target_fingerprints.items())),
+                        None if only[i] is None else tuple(only[i]))
+                catalog_key_to_indices[catalog_key].append(i)
+            first_indices = [indices[0] for indices in catalog_key_to_indices.values()]
+            logger.info(
+                'reading %d catalog(s) for %d schema(s)', len(first_indices), len(self.targets))
+            first_index_to_catalog = dict(zip(first_indices, executor.map(read_catalog, first_indices)))
 
-        with open(output_fp, 'wt') as test_models:
-            test_models.write(self.import_model_base())
-            test_models.write(self.get_additional_imports())
+        catalogs = [None] * len(self.targets)
+        for indices in catalog_key_to_indices.values():
+            for i in indices:
+                catalogs[i] = first_index_to_catalog[indices[0]]
+        return catalogs
 
-            test_models.write(self.get_additional_imports())
-            ##flask: test_models.write("from app import db\n\n")
-            for _, table_code in sorted(table_to_table_code.items(), key=lambda k_v: k_v[0].name):
-                test_models.write(table_code.getvalue())
-                test_models.write('\n')
+    def write_models_packages(self, output_dir, split='component', check=False):
+        """
+        Write one package for each schema to output_dir/<schema name>.
+        Return True if any package changed.
+        """
+        stale = False
+        for package_name, model_writer in sorted(self.package_name_to_model_writer.items()):
+            package_stale = model_writer.write_models_package(
+                os.path.join(output_dir, package_name), split=split, check=check)
+            stale = stale or package_stale
+        return stale
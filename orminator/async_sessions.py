@@ -0,0 +1,107 @@
+"""
+Asyncio counterparts of session_manager and session_manager_from_db_uri built on
+sqlalchemy's AsyncEngine and AsyncSession. They need the sqlalchemy[asyncio]
+extra and an async driver such as aiosqlite or aiomysql:
+
+    async with async_session_manager_from_db_uri('sqlite+aiosqlite:///imicrobe.db') as session:
+        sample = await session.get(models.Sample, 1)
+
+The session is committed when the block exits and rolled back if it raises, as
+with session_manager. Sessions do not expire objects on commit, so attributes
+can be read after the block without an implicit query. Relationships that are
+not loaded eagerly can not be loaded implicitly under asyncio; generate the
+models with write_models --async-safe so those relationships raise instead of
+failing with a greenlet error, and load them with query options such as
+selectinload().
+
+Async engines are shared through async_engine_registry the same way as
+engine_registry. Connections belong to the event loop that opened them, so
+call await async_engine_registry.dispose() before that loop closes.
+"""
+from contextlib import asynccontextmanager
+import os
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from orminator.engines import EngineRegistry, InstrumentedQueuePool
+
+try:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+except ImportError:
+    # sqlalchemy 1.4
+    async_sessionmaker = None
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    pass
+
+
+class AsyncEngineRegistry(EngineRegistry):
+    """An EngineRegistry of AsyncEngines, for example for 'sqlite+aiosqlite:///imicrobe.db'."""
+    instrumented_pool_class = InstrumentedAsyncAdaptedQueuePool
+
+    def create_engine(self, url, **options):
+        return create_async_engine(url, **options)
+
+    def create_session_class(self, engine):
+        if async_sessionmaker is None:
+            from sqlalchemy.orm import sessionmaker
+            return sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        else:
+            return async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def dispose(self):
+        """Close every pooled connection and forget every engine."""
+        with self.lock:
+            engines = list(self.key_to_engine.values())
+            self.key_to_engine.clear()
+            self.key_to_options.clear()
+            self.key_to_statistics.clear()
+            self.key_to_session_class.clear()
+        for engine in engines:
+            await engine.dispose()
+
+
+async_engine_registry = AsyncEngineRegistry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=async_engine_registry.after_fork)
+
+
+def get_async_engine(db_uri, **engine_options):
+    return async_engine_registry.get_engine(db_uri, **engine_options)
+
+
+@asynccontextmanager
+async def async_session_manager_from_db_uri(db_uri, echo=False, **engine_options):
+    """Provide a transactional scope around a series of awaited operations."""
+    if echo:
+        engine_options['echo'] = echo
+    session_class = async_engine_registry.get_session_class(db_uri, **engine_options)
+    session = session_class()
+    try:
+        yield session
+        await session.commit()
+    except:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+@asynccontextmanager
+async def async_session_manager(session_class):
+    """Provide a transactional scope around a series of awaited operations."""
+    if isinstance(session_class, str):
+        # session_class is a database URI
+        session_class = async_engine_registry.get_session_class(session_class)
+    session = session_class()
+    try:
+        yield session
+        await session.commit()
+    except:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
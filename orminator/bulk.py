@@ -0,0 +1,190 @@
+"""
+Load large numbers of rows through generated models without the unit of work.
+
+Rows are read from any iterable (including generators) and sent in batches of
+batch_size with one executemany or multi-row INSERT per batch, so memory use
+does not depend on the length of the input. For example
+
+    with session_manager(Session) as session:
+        bulk_insert(session, models.Sample, ({'file_': fp} for fp in sample_fps))
+        bulk_upsert(session, models.Sample_attr, sample_attr_rows, batch_size=5000)
+        bulk_link(session, models.Project.investigator_list, project_investigator_id_pairs)
+
+Rows can be dictionaries keyed by model attribute names (file_) or by column
+names (file), or model instances.
+"""
+import itertools
+
+import sqlalchemy as sa
+
+
+def get_batches(rows, batch_size):
+    """Yield lists of at most batch_size rows."""
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if len(batch) == 0:
+            return
+        yield batch
+
+
+def get_table(model):
+    """Return the Table for a mapped class or the Table itself."""
+    if isinstance(model, sa.Table):
+        return model
+    else:
+        return sa.inspect(model).local_table
+
+
+def get_row_converter(model):
+    """
+    Return a function converting a dictionary or model instance to a dictionary
+    keyed by column name.
+    """
+    if isinstance(model, sa.Table):
+        return dict
+
+    mapper = sa.inspect(model)
+    attribute_to_column_key = {
+        column_property.key: column_property.columns[0].key
+        for column_property
+        in mapper.column_attrs}
+
+    def convert(row):
+        if isinstance(row, dict):
+            return {attribute_to_column_key.get(k, k): v for k, v in row.items()}
+        else:
+            # leave out unset attributes so column defaults apply
+            row_state = sa.inspect(row)
+            return {
+                column_key: getattr(row, attribute)
+                for attribute, column_key
+                in attribute_to_column_key.items()
+                if attribute in row_state.dict and getattr(row, attribute) is not None}
+
+    return convert
+
+
+def get_connection(session):
+    """Use the session's connection so rows are part of the session's transaction."""
+    if isinstance(session, sa.orm.Session):
+        return session.connection()
+    else:
+        return session
+
+
+def _execute_batches(session, statement_factory, model, rows, batch_size):
+    connection = get_connection(session)
+    convert = get_row_converter(model)
+    row_count = 0
+    for batch in get_batches(rows, batch_size):
+        # executemany requires every row in a statement to have the same columns
+        keys_to_rows = {}
+        for row in batch:
+            row = convert(row)
+            keys_to_rows.setdefault(tuple(sorted(row)), []).append(row)
+        for keys, key_rows in keys_to_rows.items():
+            connection.execute(statement_factory(keys), key_rows)
+            row_count += len(key_rows)
+    return row_count
+
+
+def bulk_insert(session, model, rows, batch_size=1000):
+    """
+    Insert rows into the table for model (a mapped class or Table) in batches
+    of batch_size. Return the number of rows inserted.
+    """
+    table = get_table(model)
+    return _execute_batches(session, lambda keys: table.insert(), model, rows, batch_size)
+
+
+def get_upsert_statement_factory(dialect_name, table, conflict_columns=None, update_columns=None):
+    """
+    Return a function of the inserted column names returning an INSERT statement
+    that updates existing rows: ON DUPLICATE KEY UPDATE for MySQL and MariaDB,
+    ON CONFLICT DO UPDATE for SQLite and PostgreSQL.
+    """
+    if conflict_columns is None:
+        conflict_columns = [c.name for c in table.primary_key.columns]
+
+    def get_update_columns(keys):
+        if update_columns is None:
+            return [k for k in keys if k not in conflict_columns]
+        else:
+            return list(update_columns)
+
+    if dialect_name in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+
+        def statement_factory(keys):
+            statement = insert(table)
+            # MySQL needs at least one column to update
+            columns = get_update_columns(keys) or list(conflict_columns)
+            return statement.on_duplicate_key_update({c: statement.inserted[c] for c in columns})
+
+    elif dialect_name in ('sqlite', 'postgresql'):
+        if dialect_name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+
+        def statement_factory(keys):
+            statement = insert(table)
+            columns = get_update_columns(keys)
+            if len(columns) == 0:
+                return statement.on_conflict_do_nothing(index_elements=conflict_columns)
+            else:
+                return statement.on_conflict_do_update(
+                    index_elements=conflict_columns,
+                    set_={c: statement.excluded[c] for c in columns})
+
+    else:
+        raise NotImplementedError('upsert is not supported for dialect "{}"'.format(dialect_name))
+
+    return statement_factory
+
+
+def bulk_upsert(session, model, rows, batch_size=1000, conflict_columns=None, update_columns=None):
+    """
+    Insert rows or update the rows they conflict with. By default conflicts are
+    detected on the primary key and every other inserted column is updated.
+    Return the number of rows sent.
+    """
+    table = get_table(model)
+    statement_factory = get_upsert_statement_factory(
+        get_connection(session).dialect.name,
+        table,
+        conflict_columns=conflict_columns,
+        update_columns=update_columns)
+    return _execute_batches(session, statement_factory, model, rows, batch_size)
+
+
+def bulk_link(session, relationship, pairs, batch_size=1000):
+    """
+    Insert rows into the association table of a many-to-many relationship, for
+    example models.Project.investigator_list. pairs is an iterable of
+    (left primary key, right primary key) where a primary key is a value or a
+    tuple of values for composite keys. Return the number of rows inserted.
+    """
+    relationship_property = relationship.property
+    # column attributes have no secondary
+    secondary = getattr(relationship_property, 'secondary', None)
+    if secondary is None:
+        raise ValueError('{} is not a many-to-many relationship'.format(relationship))
+
+    # (parent column, association table column) pairs
+    left_pairs = relationship_property.synchronize_pairs
+    right_pairs = relationship_property.secondary_synchronize_pairs
+    left_pk_columns = list(relationship_property.parent.primary_key)
+    right_pk_columns = list(relationship_property.mapper.primary_key)
+
+    def get_association_row(pair):
+        row = {}
+        for pk_value, pk_columns, sync_pairs in zip(pair, (left_pk_columns, right_pk_columns), (left_pairs, right_pairs)):
+            pk_values = pk_value if isinstance(pk_value, tuple) else (pk_value, )
+            column_to_value = dict(zip(pk_columns, pk_values))
+            for parent_column, association_column in sync_pairs:
+                row[association_column.key] = column_to_value[parent_column]
+        return row
+
+    return bulk_insert(session, secondary, (get_association_row(pair) for pair in pairs), batch_size=batch_size)
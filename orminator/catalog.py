@@ -0,0 +1,519 @@
+"""
+A CatalogSnapshot is an in-memory copy of the columns, primary keys, foreign keys,
+indexes, unique constraints and column defaults for every table in a database. It is read in a
+constant number of round trips so the cost of generating models does not depend
+on the number of tables or on per-table network latency.
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import sqlalchemy as sa
+
+
+class CatalogSnapshot():
+    """
+    The get_* methods mirror sqlalchemy's Inspector so a CatalogSnapshot can be
+    used anywhere an Inspector was used before, for example:
+
+        catalog = CatalogSnapshot.from_engine(engine)
+        catalog.get_foreign_keys('sample_to_ontology')
+        [{'constrained_columns': ['ontology_id'],
+          'name': 'sample_to_ontology_ibfk_2',
+          'options': {},
+          'referred_columns': ['ontology_id'],
+          'referred_schema': None,
+          'referred_table': 'ontology'},
+         ...]
+    """
+    def __init__(self):
+        self.table_names = []
+        self.columns = {}
+        self.pk_constraints = {}
+        self.foreign_keys = {}
+        self.indexes = {}
+        self.unique_constraints = {}
+
+    @classmethod
+    def from_engine(cls, engine, schema=None, only=None, workers=1):
+        """
+        Read the catalog for all tables or, if only is given, for the named tables.
+        If workers is more than 1 the catalog queries run concurrently on that many
+        connections.
+        """
+        if cls.can_read_mysql_information_schema(engine.dialect):
+            return cls.from_mysql_information_schema(engine, schema=schema, only=only, workers=workers)
+        else:
+            return cls.from_inspector(engine, schema=schema, only=only, workers=workers)
+
+    @staticmethod
+    def can_read_mysql_information_schema(dialect):
+        """
+        The information_schema snapshot parses column definitions with the MySQL
+        dialect's private table definition parser. If a sqlalchemy release does
+        not have it the Inspector is used instead.
+        """
+        return dialect.name in ('mysql', 'mariadb') and hasattr(dialect, '_tabledef_parser')
+
+    def add_table(self, table_name, columns, pk_constraint, foreign_keys, indexes, unique_constraints=None):
+        self.table_names.append(table_name)
+        self.columns[table_name] = columns
+        self.pk_constraints[table_name] = pk_constraint
+        self.foreign_keys[table_name] = foreign_keys
+        self.indexes[table_name] = indexes
+        self.unique_constraints[table_name] = unique_constraints or []
+
+    def remove_table(self, table_name):
+        self.table_names.remove(table_name)
+        del self.columns[table_name]
+        del self.pk_constraints[table_name]
+        del self.foreign_keys[table_name]
+        del self.indexes[table_name]
+        del self.unique_constraints[table_name]
+
+    def update(self, other):
+        """
+        Replace or add the tables in other, for example after re-reading
+        the catalog for tables that have changed.
+        """
+        for table_name in other.table_names:
+            if table_name in self.columns:
+                self.remove_table(table_name)
+            self.add_table(
+                table_name,
+                columns=other.columns[table_name],
+                pk_constraint=other.pk_constraints[table_name],
+                foreign_keys=other.foreign_keys[table_name],
+                indexes=other.indexes[table_name],
+                unique_constraints=other.unique_constraints[table_name])
+        self.table_names.sort()
+
+    def get_subset(self, table_names):
+        """Return a snapshot of the named tables sharing this snapshot's data."""
+        table_names = set(table_names)
+        subset = type(self)()
+        for table_name in self.table_names:
+            if table_name in table_names:
+                subset.add_table(
+                    table_name,
+                    columns=self.columns[table_name],
+                    pk_constraint=self.pk_constraints[table_name],
+                    foreign_keys=self.foreign_keys[table_name],
+                    indexes=self.indexes[table_name],
+                    unique_constraints=self.unique_constraints[table_name])
+        return subset
+
+    def get_table_names(self, schema=None):
+        return list(self.table_names)
+
+    def get_columns(self, table_name, schema=None):
+        return self.columns[table_name]
+
+    def get_pk_constraint(self, table_name, schema=None):
+        return self.pk_constraints[table_name]
+
+    def get_foreign_keys(self, table_name, schema=None):
+        return self.foreign_keys[table_name]
+
+    def get_indexes(self, table_name, schema=None):
+        return self.indexes[table_name]
+
+    def get_unique_constraints(self, table_name, schema=None):
+        return self.unique_constraints[table_name]
+
+    @classmethod
+    def from_inspector(cls, engine, schema=None, only=None, workers=1):
+        """
+        Build a snapshot for any dialect using a single Inspector. Inspectors
+        cache their results so each table is queried at most once per kind
+        of catalog data. SQLAlchemy 2.0 added the get_multi_* methods which
+        let dialects that support it read all tables in one query.
+
+        With more than one worker the tables are split between the workers and
+        each worker reads its tables with its own connection and Inspector.
+        """
+        insp = sa.inspect(engine)
+        table_names = insp.get_table_names(schema=schema)
+        if only is not None:
+            only = set(only)
+            table_names = [t for t in table_names if t in only]
+        catalog = cls()
+        if workers > 1:
+            def read_tables(worker_table_names):
+                with engine.connect() as connection:
+                    return cls._read_tables(connection, worker_table_names, schema=schema)
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                worker_results = list(executor.map(
+                    read_tables,
+                    [table_names[i::workers] for i in range(workers)]))
+            catalog._add_table_results(table_names, worker_results)
+        elif hasattr(insp, 'get_multi_columns'):
+            filter_names = None if only is None else table_names
+            multi_columns = insp.get_multi_columns(schema=schema, filter_names=filter_names)
+            multi_pk_constraints = insp.get_multi_pk_constraint(schema=schema, filter_names=filter_names)
+            multi_foreign_keys = insp.get_multi_foreign_keys(schema=schema, filter_names=filter_names)
+            multi_indexes = insp.get_multi_indexes(schema=schema, filter_names=filter_names)
+            multi_unique_constraints = insp.get_multi_unique_constraints(schema=schema, filter_names=filter_names)
+            for table_name in table_names:
+                key = (schema, table_name)
+                catalog.add_table(
+                    table_name,
+                    columns=multi_columns[key],
+                    pk_constraint=multi_pk_constraints[key],
+                    foreign_keys=multi_foreign_keys[key],
+                    indexes=multi_indexes[key],
+                    unique_constraints=multi_unique_constraints[key])
+        else:
+            for table_name in table_names:
+                catalog.add_table(
+                    table_name,
+                    columns=insp.get_columns(table_name, schema=schema),
+                    pk_constraint=insp.get_pk_constraint(table_name, schema=schema),
+                    foreign_keys=insp.get_foreign_keys(table_name, schema=schema),
+                    indexes=insp.get_indexes(table_name, schema=schema),
+                    unique_constraints=insp.get_unique_constraints(table_name, schema=schema))
+
+        catalog._remove_referred_schema(schema)
+        return catalog
+
+    @staticmethod
+    def _read_tables(connection, table_names, schema=None):
+        """Return a list of the catalog data for each table read with connection's Inspector."""
+        insp = sa.inspect(connection)
+        return [
+            (
+                table_name,
+                insp.get_columns(table_name, schema=schema),
+                insp.get_pk_constraint(table_name, schema=schema),
+                insp.get_foreign_keys(table_name, schema=schema),
+                insp.get_indexes(table_name, schema=schema),
+                insp.get_unique_constraints(table_name, schema=schema)
+            )
+            for table_name
+            in table_names]
+
+    def _add_table_results(self, table_names, worker_results):
+        table_name_to_result = {
+            result[0]: result
+            for worker_result in worker_results
+            for result in worker_result}
+        # add the tables in the same order as a single worker would
+        for table_name in table_names:
+            _, columns, pk_constraint, foreign_keys, indexes, unique_constraints = table_name_to_result[table_name]
+            self.add_table(
+                table_name,
+                columns=columns,
+                pk_constraint=pk_constraint,
+                foreign_keys=foreign_keys,
+                indexes=indexes,
+                unique_constraints=unique_constraints)
+
+    def _remove_referred_schema(self, schema):
+        if schema is not None:
+            # referred_schema is None for foreign keys within the schema
+            # as it is for the MySQL information_schema snapshot
+            for table_name, foreign_keys in self.foreign_keys.items():
+                self.foreign_keys[table_name] = [
+                    dict(fk_constraint, referred_schema=None)
+                    if fk_constraint['referred_schema'] == schema else fk_constraint
+                    for fk_constraint
+                    in foreign_keys]
+
+    @classmethod
+    async def from_async_engine(cls, async_engine, schema=None, only=None, workers=1):
+        """
+        Read the catalog through an AsyncEngine. For MySQL and MariaDB the
+        information_schema queries, and for other dialects the tables split
+        between workers connections, are read concurrently on the event loop.
+        """
+        import asyncio
+
+        if cls.can_read_mysql_information_schema(async_engine.dialect):
+            parameters, queries = cls._get_mysql_queries(schema=schema, only=only)
+
+            async def execute(query):
+                async with async_engine.connect() as connection:
+                    return (await connection.execute(query, parameters)).fetchall()
+
+            if workers > 1:
+                tables, columns, statistics, foreign_keys = await asyncio.gather(*map(execute, queries))
+            else:
+                async with async_engine.connect() as connection:
+                    tables, columns, statistics, foreign_keys = [
+                        (await connection.execute(query, parameters)).fetchall() for query in queries]
+            return cls.from_mysql_rows(async_engine.dialect, tables, columns, statistics, foreign_keys)
+
+        async with async_engine.connect() as connection:
+            if workers <= 1:
+                return await connection.run_sync(lambda c: cls.from_inspector(c, schema=schema, only=only))
+            table_names = await connection.run_sync(lambda c: sa.inspect(c).get_table_names(schema=schema))
+        if only is not None:
+            only = set(only)
+            table_names = [t for t in table_names if t in only]
+
+        async def read_tables(worker_table_names):
+            async with async_engine.connect() as connection:
+                return await connection.run_sync(cls._read_tables, worker_table_names, schema)
+
+        worker_results = await asyncio.gather(*(
+            read_tables(table_names[i::workers]) for i in range(workers)))
+        catalog = cls()
+        catalog._add_table_results(table_names, worker_results)
+        catalog._remove_referred_schema(schema)
+        return catalog
+
+    # if no schema is given use the database named in the connection URI
+    _mysql_tables_query = """\
+SELECT t.TABLE_NAME, t.TABLE_COLLATION, ccsa.CHARACTER_SET_NAME
+FROM information_schema.TABLES t
+LEFT JOIN information_schema.COLLATION_CHARACTER_SET_APPLICABILITY ccsa
+  ON ccsa.COLLATION_NAME = t.TABLE_COLLATION
+WHERE t.TABLE_SCHEMA = COALESCE(:schema, DATABASE()) AND t.TABLE_TYPE = 'BASE TABLE'{table_filter}
+ORDER BY t.TABLE_NAME"""
+
+    _mysql_columns_query = """\
+SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_DEFAULT, EXTRA,
+  CHARACTER_SET_NAME, COLLATION_NAME, COLUMN_COMMENT
+FROM information_schema.COLUMNS
+WHERE TABLE_SCHEMA = COALESCE(:schema, DATABASE()){table_filter}
+ORDER BY TABLE_NAME, ORDINAL_POSITION"""
+
+    _mysql_statistics_query = """\
+SELECT TABLE_NAME, INDEX_NAME, NON_UNIQUE, COLUMN_NAME
+FROM information_schema.STATISTICS
+WHERE TABLE_SCHEMA = COALESCE(:schema, DATABASE()){table_filter}
+ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX"""
+
+    _mysql_foreign_keys_query = """\
+SELECT kcu.TABLE_SCHEMA, kcu.TABLE_NAME, kcu.CONSTRAINT_NAME, kcu.COLUMN_NAME,
+  kcu.REFERENCED_TABLE_SCHEMA, kcu.REFERENCED_TABLE_NAME, kcu.REFERENCED_COLUMN_NAME,
+  rc.UPDATE_RULE, rc.DELETE_RULE
+FROM information_schema.KEY_COLUMN_USAGE kcu
+JOIN information_schema.REFERENTIAL_CONSTRAINTS rc
+  ON rc.CONSTRAINT_SCHEMA = kcu.CONSTRAINT_SCHEMA
+  AND rc.CONSTRAINT_NAME = kcu.CONSTRAINT_NAME
+  AND rc.TABLE_NAME = kcu.TABLE_NAME
+WHERE kcu.TABLE_SCHEMA = COALESCE(:schema, DATABASE())
+  AND kcu.REFERENCED_TABLE_NAME IS NOT NULL{table_filter}
+ORDER BY kcu.TABLE_NAME, kcu.CONSTRAINT_NAME, kcu.ORDINAL_POSITION"""
+
+    @staticmethod
+    def _mysql_query(query, table_name_column, only):
+        if only is None:
+            return sa.text(query.format(table_filter=''))
+        else:
+            return sa.text(
+                query.format(table_filter='\n  AND {} IN :only'.format(table_name_column))
+            ).bindparams(sa.bindparam('only', expanding=True))
+
+    @classmethod
+    def _get_mysql_queries(cls, schema=None, only=None):
+        """Return the parameters and the tables, columns, statistics and foreign keys queries."""
+        parameters = {'schema': schema}
+        if only is not None:
+            parameters['only'] = list(only)
+        queries = (
+            cls._mysql_query(cls._mysql_tables_query, 't.TABLE_NAME', only),
+            cls._mysql_query(cls._mysql_columns_query, 'TABLE_NAME', only),
+            cls._mysql_query(cls._mysql_statistics_query, 'TABLE_NAME', only),
+            cls._mysql_query(cls._mysql_foreign_keys_query, 'kcu.TABLE_NAME', only))
+        return parameters, queries
+
+    @classmethod
+    def from_mysql_information_schema(cls, engine, schema=None, only=None, workers=1):
+        """
+        Build a snapshot for MySQL and MariaDB with four information_schema
+        queries regardless of the number of tables. With more than one worker
+        the queries run concurrently.
+        """
+        parameters, queries = cls._get_mysql_queries(schema=schema, only=only)
+        def execute(query):
+            with engine.connect() as connection:
+                return connection.execute(query, parameters).fetchall()
+
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=min(workers, len(queries))) as executor:
+                tables, columns, statistics, foreign_keys = executor.map(execute, queries)
+        else:
+            with engine.connect() as connection:
+                tables, columns, statistics, foreign_keys = (
+                    connection.execute(query, parameters).fetchall() for query in queries)
+        return cls.from_mysql_rows(engine.dialect, tables, columns, statistics, foreign_keys)
+
+    @classmethod
+    def from_mysql_rows(cls, dialect, tables, columns, statistics, foreign_keys):
+        """
+        Assemble a snapshot from the rows returned by the information_schema queries.
+        Column definitions are re-formatted as SHOW CREATE TABLE lines and handed to
+        the MySQL dialect's own parser so the column types are exactly the types
+        sqlalchemy reflection would produce.
+        """
+        table_to_column_rows = defaultdict(list)
+        for row in columns:
+            table_to_column_rows[row[0]].append(row)
+
+        table_to_pk_columns = defaultdict(list)
+        table_to_index_name_to_index = defaultdict(dict)
+        for table_name, index_name, non_unique, column_name in statistics:
+            if index_name == 'PRIMARY':
+                table_to_pk_columns[table_name].append(column_name)
+            else:
+                index_name_to_index = table_to_index_name_to_index[table_name]
+                if index_name not in index_name_to_index:
+                    index_name_to_index[index_name] = {
+                        'name': index_name,
+                        'column_names': [],
+                        'unique': not int(non_unique)}
+                index_name_to_index[index_name]['column_names'].append(column_name)
+
+        # MySQL unique constraints are unique indexes, reflection reports
+        # them as both and marks the index as a duplicate of the constraint
+        table_to_unique_constraints = defaultdict(list)
+        for table_name, index_name_to_index in table_to_index_name_to_index.items():
+            for index in index_name_to_index.values():
+                if index['unique']:
+                    index['duplicates_constraint'] = index['name']
+                    table_to_unique_constraints[table_name].append({
+                        'name': index['name'],
+                        'column_names': index['column_names']})
+
+        # foreign key constraints are ordered by name as in SHOW CREATE TABLE
+        table_to_fk_name_to_fk = defaultdict(dict)
+        for (table_schema, table_name, constraint_name, column_name,
+             referred_schema, referred_table, referred_column,
+             update_rule, delete_rule) in foreign_keys:
+            fk_name_to_fk = table_to_fk_name_to_fk[table_name]
+            if constraint_name not in fk_name_to_fk:
+                options = {}
+                for option, rule in (('onupdate', update_rule), ('ondelete', delete_rule)):
+                    # RESTRICT and NO ACTION are not shown by SHOW CREATE TABLE
+                    if rule not in ('RESTRICT', 'NO ACTION', None):
+                        options[option] = rule
+                fk_name_to_fk[constraint_name] = {
+                    'constrained_columns': [],
+                    'name': constraint_name,
+                    'options': options,
+                    'referred_columns': [],
+                    'referred_schema': None if referred_schema == table_schema else referred_schema,
+                    'referred_table': referred_table}
+            fk_name_to_fk[constraint_name]['constrained_columns'].append(column_name)
+            fk_name_to_fk[constraint_name]['referred_columns'].append(referred_column)
+
+        catalog = cls()
+        for table_name, table_collation, table_charset in tables:
+            catalog.add_table(
+                table_name,
+                columns=cls._parse_mysql_columns(
+                    dialect,
+                    table_name,
+                    table_charset,
+                    table_collation,
+                    table_to_column_rows[table_name]),
+                pk_constraint={
+                    'constrained_columns': table_to_pk_columns[table_name],
+                    'name': None},
+                foreign_keys=list(table_to_fk_name_to_fk[table_name].values()),
+                indexes=list(table_to_index_name_to_index[table_name].values()),
+                unique_constraints=table_to_unique_constraints[table_name])
+        return catalog
+
+    @staticmethod
+    def _parse_mysql_columns(dialect, table_name, table_charset, table_collation, column_rows):
+        preparer = dialect.identifier_preparer
+        is_mariadb = getattr(dialect, 'is_mariadb', False)
+        lines = ['CREATE TABLE {} ('.format(preparer.quote_identifier(table_name))]
+        for (_, name, column_type, is_nullable, default, extra,
+             charset, collation, comment) in column_rows:
+            line = [' ', preparer.quote_identifier(name), column_type]
+            # SHOW CREATE TABLE only shows a character set or collation
+            # when it is different from the table's
+            if charset is not None and charset != table_charset:
+                line.append('CHARACTER SET {}'.format(charset))
+            if collation is not None and collation != table_collation:
+                line.append('COLLATE {}'.format(collation))
+            if is_nullable == 'NO':
+                line.append('NOT NULL')
+            if default is None:
+                pass
+            elif is_mariadb or default == 'NULL':
+                # MariaDB quotes literal defaults in information_schema
+                line.append('DEFAULT {}'.format(default))
+            elif default.upper().startswith('CURRENT_TIMESTAMP') or 'DEFAULT_GENERATED' in extra:
+                line.append('DEFAULT {}'.format(default))
+            else:
+                line.append("DEFAULT '{}'".format(default.replace("'", "''")))
+            if 'auto_increment' in extra:
+                line.append('AUTO_INCREMENT')
+            if comment:
+                line.append("COMMENT '{}'".format(comment.replace("'", "''")))
+            lines.append(' '.join(line) + ',')
+        lines.append(') ')
+        state = dialect._tabledef_parser.parse('\n'.join(lines), table_charset)
+        return state.columns
+
+    def to_metadata(self, meta=None):
+        """
+        Build sqlalchemy Table objects from the snapshot without going back to
+        the database. Foreign keys to tables outside the snapshot are left out.
+        """
+        if meta is None:
+            meta = sa.MetaData()
+
+        for table_name in self.table_names:
+            table_items = []
+            for column_data in self.columns[table_name]:
+                if column_data.get('default') is None:
+                    server_default = None
+                else:
+                    server_default = sa.DefaultClause(sa.text(column_data['default']))
+                table_items.append(
+                    sa.Column(
+                        column_data['name'],
+                        column_data['type'],
+                        nullable=column_data.get('nullable', True),
+                        server_default=server_default,
+                        autoincrement=column_data.get('autoincrement', 'auto')))
+
+            pk_constraint = self.pk_constraints[table_name]
+            if pk_constraint['constrained_columns']:
+                table_items.append(
+                    sa.PrimaryKeyConstraint(
+                        *pk_constraint['constrained_columns'],
+                        name=pk_constraint.get('name')))
+
+            for fk_constraint in self.foreign_keys[table_name]:
+                if fk_constraint['referred_schema'] is not None:
+                    pass
+                elif fk_constraint['referred_table'] not in self.columns:
+                    pass
+                else:
+                    table_items.append(
+                        sa.ForeignKeyConstraint(
+                            fk_constraint['constrained_columns'],
+                            ['{}.{}'.format(fk_constraint['referred_table'], c)
+                             for c in fk_constraint['referred_columns']],
+                            name=fk_constraint.get('name'),
+                            **fk_constraint.get('options', {})))
+
+            for unique_constraint in self.unique_constraints[table_name]:
+                table_items.append(
+                    sa.UniqueConstraint(
+                        *unique_constraint['column_names'],
+                        name=unique_constraint.get('name')))
+
+            table = sa.Table(table_name, meta, *table_items)
+
+            for index in self.indexes[table_name]:
+                if index['name'] is None or None in index['column_names']:
+                    # skip unnamed and expression indexes
+                    pass
+                elif 'duplicates_constraint' in index:
+                    # already added as a UniqueConstraint
+                    pass
+                else:
+                    sa.Index(
+                        index['name'],
+                        *[table.c[c] for c in index['column_names']],
+                        unique=bool(index['unique']))
+
+        return meta
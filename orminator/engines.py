@@ -0,0 +1,206 @@
+"""
+A process-wide registry of engines keyed by database URI and engine options so
+every session_manager for the same database shares one engine and one
+connection pool instead of creating (and leaking) a new pool each time.
+"""
+import os
+import threading
+import time
+
+import sqlalchemy as sa
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+
+# these options are only accepted by QueuePool and its subclasses
+_queue_pool_options = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_use_lifo')
+
+
+class PoolStatistics():
+    """
+    Counts of pool activity for one engine. A wait is a checkout that found
+    no idle connection and no room to open another one.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections_opened = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def count(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def record_wait(self, seconds):
+        with self.lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'connections_opened': self.connections_opened,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'checked_out': self.checkouts - self.checkins,
+                'waits': self.waits,
+                'wait_seconds': self.wait_seconds
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    A QueuePool that records how often and for how long checkouts wait for a connection.
+    """
+    statistics = None
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.statistics = self.statistics
+        return pool
+
+    def _do_get(self):
+        # QueuePool keeps max_overflow privately, -1 means no limit
+        max_overflow = getattr(self, '_max_overflow', -1)
+        if self.statistics is None or self.checkedin() > 0 or max_overflow < 0 or self.overflow() < max_overflow:
+            return super()._do_get()
+        else:
+            t0 = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                self.statistics.record_wait(time.perf_counter() - t0)
+
+
+class EngineRegistry():
+    """
+    Engines are created on first use and shared by every caller asking for the
+    same URI and options. Options given to the constructor are defaults for
+    every engine, for example
+
+        registry = EngineRegistry(pool_size=10, max_overflow=5, pool_recycle=3600, pool_pre_ping=True)
+        engine = registry.get_engine('mysql+pymysql://imicrobe:<password>@localhost/imicrobe')
+
+    Pool options that do not apply to a dialect's pool class (pool_size and
+    max_overflow for SQLite :memory: databases) are ignored.
+
+    Pools inherited by a child process are disposed of in the child without
+    closing the parent's connections.
+    """
+    def __init__(self, **engine_options):
+        self.engine_options = engine_options
+        self.lock = threading.RLock()
+        self.pid = os.getpid()
+        self.key_to_engine = {}
+        self.key_to_options = {}
+        self.key_to_statistics = {}
+        self.key_to_session_class = {}
+
+    def get_engine(self, db_uri, **engine_options):
+        key, options = self._get_key_and_options(db_uri, engine_options)
+        with self.lock:
+            self._check_pid()
+            if key not in self.key_to_engine:
+                self.key_to_options[key] = dict(options)
+                self.key_to_engine[key], self.key_to_statistics[key] = self._create_engine(db_uri, options)
+            return self.key_to_engine[key]
+
+    def get_session_class(self, db_uri, **engine_options):
+        """Return a sessionmaker bound to the shared engine for db_uri."""
+        key, _ = self._get_key_and_options(db_uri, engine_options)
+        engine = self.get_engine(db_uri, **engine_options)
+        with self.lock:
+            if key not in self.key_to_session_class:
+                self.key_to_session_class[key] = self.create_session_class(engine)
+            return self.key_to_session_class[key]
+
+    def get_statistics(self):
+        """
+        Return a list of (database URI without password, engine options, pool
+        statistics) for each engine. Engines for the same URI with different
+        options are listed separately.
+        """
+        with self.lock:
+            return [
+                (repr(self.key_to_engine[key].url), dict(self.key_to_options[key]), statistics.as_dict())
+                for key, statistics
+                in self.key_to_statistics.items()]
+
+    def dispose(self):
+        """Close every pooled connection and forget every engine."""
+        with self.lock:
+            for engine in self.key_to_engine.values():
+                engine.dispose()
+            self.key_to_engine.clear()
+            self.key_to_options.clear()
+            self.key_to_statistics.clear()
+            self.key_to_session_class.clear()
+
+    def _get_key_and_options(self, db_uri, engine_options):
+        options = dict(self.engine_options)
+        options.update(engine_options)
+        key = (str(db_uri), tuple(sorted((k, repr(v)) for k, v in options.items())))
+        return key, options
+
+    # used in place of QueuePool to record waits for connections
+    instrumented_pool_class = InstrumentedQueuePool
+
+    def create_engine(self, url, **options):
+        return sa.create_engine(url, **options)
+
+    def create_session_class(self, engine):
+        return sessionmaker(bind=engine)
+
+    def _create_engine(self, db_uri, options):
+        url = sa.engine.url.make_url(db_uri)
+        pool_class = options.get('poolclass', url.get_dialect().get_pool_class(url))
+        if issubclass(pool_class, QueuePool):
+            if 'poolclass' not in options:
+                options['poolclass'] = self.instrumented_pool_class
+        else:
+            options = {k: v for k, v in options.items() if k not in _queue_pool_options}
+
+        engine = self.create_engine(url, **options)
+        # pool events are dispatched by the sync engine of an AsyncEngine
+        sync_engine = getattr(engine, 'sync_engine', engine)
+
+        statistics = PoolStatistics()
+        if isinstance(sync_engine.pool, InstrumentedQueuePool):
+            sync_engine.pool.statistics = statistics
+        sa.event.listen(sync_engine, 'connect', lambda *args: statistics.count('connections_opened'))
+        sa.event.listen(sync_engine, 'checkout', lambda *args: statistics.count('checkouts'))
+        sa.event.listen(sync_engine, 'checkin', lambda *args: statistics.count('checkins'))
+        return engine, statistics
+
+    def _check_pid(self):
+        if os.getpid() != self.pid:
+            self.after_fork()
+
+    def after_fork(self):
+        """
+        Called in a child process. Connections in the inherited pools belong to
+        the parent so they are dropped without being closed.
+        """
+        # another thread in the parent may have held the lock when the
+        # process forked, only this thread exists in the child
+        self.lock = threading.RLock()
+        for engine in self.key_to_engine.values():
+            engine = getattr(engine, 'sync_engine', engine)
+            try:
+                engine.dispose(close=False)
+            except TypeError:
+                # sqlalchemy before 1.4.33 can not dispose without closing
+                engine.pool = engine.pool.recreate()
+        self.pid = os.getpid()
+
+
+engine_registry = EngineRegistry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=engine_registry.after_fork)
+
+
+def get_engine(db_uri, **engine_options):
+    return engine_registry.get_engine(db_uri, **engine_options)
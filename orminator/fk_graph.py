@@ -0,0 +1,84 @@
+"""
+A ForeignKeyGraph holds every foreign key constraint in a database as forward
+and reverse adjacency lists so questions like "does table A refer to table B?"
+are answered with dictionary lookups rather than catalog queries.
+"""
+from collections import defaultdict
+
+
+class ForeignKeyGraph():
+    """
+    Foreign key constraints are the dictionaries returned by
+    CatalogSnapshot.get_foreign_keys (or Inspector.get_foreign_keys).
+
+    forward:   table name -> foreign key constraints on that table
+    reverse:   referred table name -> (table name, foreign key constraint)
+               for every constraint referring to that table
+    edges:     (table name, referred table name) -> foreign key constraints
+    constraints: (table name, constraint name) -> foreign key constraint
+    """
+    def __init__(self):
+        self.forward = defaultdict(list)
+        self.reverse = defaultdict(list)
+        self.edges = defaultdict(list)
+        self.constraints = {}
+
+    @classmethod
+    def from_catalog(cls, catalog, skip_missing=False):
+        """
+        If skip_missing is True foreign keys referring to tables in other schemas
+        or to tables not in the catalog are left out, as CatalogSnapshot.to_metadata
+        leaves them out of the MetaData.
+        """
+        graph = cls()
+        table_names = catalog.get_table_names()
+        table_name_set = set(table_names)
+        for table_name in table_names:
+            # make sure tables without foreign keys are in the graph
+            graph.forward[table_name]
+            for fk_constraint in catalog.get_foreign_keys(table_name):
+                if skip_missing and (
+                        fk_constraint['referred_schema'] is not None
+                        or fk_constraint['referred_table'] not in table_name_set):
+                    pass
+                else:
+                    graph.add_foreign_key(table_name, fk_constraint)
+        return graph
+
+    def add_foreign_key(self, table_name, fk_constraint):
+        referred_table_name = fk_constraint['referred_table']
+        self.forward[table_name].append(fk_constraint)
+        self.reverse[referred_table_name].append((table_name, fk_constraint))
+        self.edges[(table_name, referred_table_name)].append(fk_constraint)
+        if fk_constraint.get('name') is not None:
+            self.constraints[(table_name, fk_constraint['name'])] = fk_constraint
+
+    def get_table_names(self):
+        return list(self.forward.keys())
+
+    def get_foreign_keys(self, table_name):
+        """Return the foreign key constraints on table_name."""
+        return self.forward.get(table_name, [])
+
+    def get_referring_foreign_keys(self, table_name):
+        """Return (table name, foreign key constraint) for each constraint referring to table_name."""
+        return self.reverse.get(table_name, [])
+
+    def get_foreign_keys_between(self, table_name, referred_table_name):
+        """Return the foreign key constraints on table_name referring to referred_table_name."""
+        return self.edges.get((table_name, referred_table_name), [])
+
+    def get_foreign_key(self, table_name, constraint_name):
+        return self.constraints.get((table_name, constraint_name))
+
+    def refers_to(self, table_name, referred_table_name):
+        return (table_name, referred_table_name) in self.edges
+
+    def refer_to_each_other(self, table_name_a, table_name_b):
+        return self.refers_to(table_name_a, table_name_b) and self.refers_to(table_name_b, table_name_a)
+
+    def get_neighbors(self, table_name):
+        """Return the names of tables table_name refers to or is referred to by."""
+        neighbors = {fk['referred_table'] for fk in self.get_foreign_keys(table_name)}
+        neighbors.update(t for t, _ in self.get_referring_foreign_keys(table_name))
+        return neighbors
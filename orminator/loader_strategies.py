@@ -0,0 +1,158 @@
+"""
+Choose the loader strategy (the lazy= argument) for each generated relationship.
+
+By default every relationship is loaded with "select" when its attribute is
+first read, so loading an object never loads its related objects as well. Eager
+strategies are chosen in a config: with "selectin" collections (one-to-many and
+many-to-many) and "joined" many-to-one references, traversing a list of objects
+costs one query per relationship rather than one query per object. Eager
+strategies follow relationships from object to object, so across a connected
+schema they can load far more rows than were asked for; max_eager_collection_size
+limits that for large collections. In strict mode every relationship uses
+"raise" so that any load not requested explicitly with a query option is an
+error.
+
+The strategies are chosen with a JSON file, for example
+
+    {
+        "one_to_many": "selectin",
+        "many_to_many": "selectin",
+        "many_to_one": "joined",
+        "strict": false,
+        "max_eager_collection_size": 1000,
+        "relationships": {
+            "project.sample_list": "select",
+            "sample.project": "raise"
+        }
+    }
+
+Keys in "relationships" are <table name>.<relationship attribute> and take
+precedence over everything else. If max_eager_collection_size is given and row
+counts are available a collection whose average size (rows in the many table
+divided by rows in the one table) is larger than max_eager_collection_size is
+loaded lazily with "select".
+
+If async_safe is true no relationship is loaded implicitly when its attribute is
+read, which is not possible under asyncio: "select" and "dynamic" become
+"raise_on_sql" so such relationships have to be loaded with query options.
+"""
+import json
+
+import sqlalchemy as sa
+
+
+loader_strategies = ('select', 'selectin', 'joined', 'subquery', 'immediate', 'raise', 'raise_on_sql', 'noload', 'dynamic')
+
+# strategies that emit SQL when an attribute is read rather than with the parent
+implicit_io_loader_strategies = ('select', 'dynamic')
+
+
+class LoaderStrategyConfig():
+    def __init__(
+            self,
+            one_to_many='select',
+            many_to_many='select',
+            many_to_one='select',
+            strict=False,
+            max_eager_collection_size=None,
+            relationships=None,
+            async_safe=False):
+        self.relation_kind_to_strategy = {
+            'one_to_many': one_to_many,
+            'many_to_many': many_to_many,
+            'many_to_one': many_to_one
+        }
+        self.strict = strict
+        self.max_eager_collection_size = max_eager_collection_size
+        self.relationships = dict(relationships or {})
+        self.async_safe = async_safe
+        for strategy in list(self.relation_kind_to_strategy.values()) + list(self.relationships.values()):
+            if strategy not in loader_strategies:
+                raise ValueError('unknown loader strategy "{}"'.format(strategy))
+
+    @classmethod
+    def from_file(cls, config_fp, **kwargs):
+        """Read a JSON config file, keyword arguments override the file."""
+        with open(config_fp, 'rt') as config_file:
+            config = json.load(config_file)
+        config.update(kwargs)
+        return cls(**config)
+
+    def as_dict(self):
+        """Return the configuration in the format read by from_file."""
+        config = dict(self.relation_kind_to_strategy)
+        config.update(
+            strict=self.strict,
+            max_eager_collection_size=self.max_eager_collection_size,
+            relationships=self.relationships,
+            async_safe=self.async_safe)
+        return config
+
+    def is_large_collection(self, one_table_name, many_table_name, row_counts):
+        """
+        Return True if a collection of many_table_name rows on the one_table_name
+        class is larger on average than max_eager_collection_size.
+        """
+        if (self.max_eager_collection_size is None
+                or row_counts is None
+                or one_table_name not in row_counts
+                or many_table_name not in row_counts):
+            return False
+        else:
+            average_collection_size = row_counts[many_table_name] / max(row_counts[one_table_name], 1)
+            return average_collection_size > self.max_eager_collection_size
+
+    def get_strategy(self, relation_kind, table_name, attribute_name, row_counts=None, one_table_name=None, many_table_name=None):
+        """
+        Return the loader strategy for relationship attribute_name on the class
+        for table_name. relation_kind is 'one_to_many', 'many_to_many' or
+        'many_to_one'. row_counts is a dictionary of table name to row count.
+        """
+        strategy = self._get_strategy(relation_kind, table_name, attribute_name, row_counts, one_table_name, many_table_name)
+        if self.async_safe and strategy in implicit_io_loader_strategies:
+            return 'raise_on_sql'
+        else:
+            return strategy
+
+    def _get_strategy(self, relation_kind, table_name, attribute_name, row_counts, one_table_name, many_table_name):
+        relationship_key = '{}.{}'.format(table_name, attribute_name)
+        if relationship_key in self.relationships:
+            return self.relationships[relationship_key]
+        elif self.strict:
+            return 'raise'
+
+        strategy = self.relation_kind_to_strategy[relation_kind]
+        if relation_kind != 'many_to_one' and self.is_large_collection(one_table_name, many_table_name, row_counts):
+            strategy = 'select'
+        return strategy
+
+
+_mysql_row_count_query = sa.text("""\
+SELECT TABLE_NAME, TABLE_ROWS
+FROM information_schema.TABLES
+WHERE TABLE_SCHEMA = COALESCE(:schema, DATABASE()) AND TABLE_TYPE = 'BASE TABLE'""")
+
+
+def get_table_row_counts(engine, schema=None):
+    """
+    Return a dictionary of table name to (estimated) row count using the database
+    statistics, or None if there are no statistics for this engine's dialect.
+    SQLite only has statistics for tables that have been ANALYZEd.
+    """
+    with engine.connect() as connection:
+        if engine.dialect.name in ('mysql', 'mariadb'):
+            return {
+                table_name: int(table_rows or 0)
+                for table_name, table_rows
+                in connection.execute(_mysql_row_count_query, {'schema': schema})}
+        elif engine.dialect.name == 'sqlite':
+            if connection.execute(
+                    sa.text("SELECT COUNT(*) FROM sqlite_master WHERE name = 'sqlite_stat1'")).scalar() == 0:
+                return None
+            # the first number in stat is the number of rows
+            return {
+                table_name: int(stat.split()[0])
+                for table_name, stat
+                in connection.execute(sa.text('SELECT tbl, stat FROM sqlite_stat1'))}
+        else:
+            return None
@@ -0,0 +1,174 @@
+"""
+Count and time the queries and the work done by ModelWriter in each phase:
+
+    reflect    reading the catalog (and row counts) from the database
+    pks        writing primary key columns
+    columns    writing the other columns
+    relations  finding and writing relationships
+    render     writing class headers, additional methods and the output
+
+Queries are counted with engine events so every round trip is seen, including
+the ones made by sqlalchemy's Inspector. Phases can be nested, the time spent
+in a nested phase is not counted in the enclosing phase.
+
+    profiler = Profiler()
+    model_writer = ModelWriter(db_uri, profiler=profiler)
+    model_writer.write_models('models.py')
+    print(profiler.get_report())
+    profiler.write_trace('trace.json')
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+import json
+import threading
+import time
+
+import sqlalchemy as sa
+
+
+class PhaseStatistics():
+    def __init__(self):
+        self.seconds = 0.0
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            'seconds': self.seconds,
+            'queries': self.queries,
+            'query_seconds': self.query_seconds
+        }
+
+
+class Profiler():
+    def __init__(self, max_statement_length=200):
+        self.max_statement_length = max_statement_length
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # queries made by threads that have not entered a phase, for example
+        # the worker threads reading the catalog, go to the last phase entered
+        self.last_phase = (None, None)
+        self.t0 = time.perf_counter()
+        self.phase_to_statistics = defaultdict(PhaseStatistics)
+        self.table_to_phase_to_statistics = defaultdict(lambda: defaultdict(PhaseStatistics))
+        self.queries = []
+
+    def instrument(self, engine):
+        """Count and time every query executed by engine."""
+        if sa.event.contains(engine, 'before_cursor_execute', self._before_cursor_execute):
+            return
+        sa.event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        sa.event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _get_stack(self):
+        try:
+            return self.local.stack
+        except AttributeError:
+            self.local.stack = []
+            return self.local.stack
+
+    def get_current_phase(self):
+        stack = self._get_stack()
+        if len(stack) == 0:
+            return self.last_phase
+        else:
+            return stack[-1]['phase'], stack[-1]['table_name']
+
+    @contextmanager
+    def phase(self, phase, table_name=None):
+        stack = self._get_stack()
+        now = time.perf_counter()
+        if len(stack) > 0:
+            # stop the clock for the enclosing phase
+            self._add_seconds(stack[-1], now - stack[-1]['t0'])
+        frame = {'phase': phase, 'table_name': table_name, 't0': now}
+        stack.append(frame)
+        self.last_phase = (phase, table_name)
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._add_seconds(frame, now - frame['t0'])
+            stack.pop()
+            if len(stack) > 0:
+                stack[-1]['t0'] = now
+
+    def _add_seconds(self, frame, seconds):
+        with self.lock:
+            self.phase_to_statistics[frame['phase']].seconds += seconds
+            if frame['table_name'] is not None:
+                self.table_to_phase_to_statistics[frame['table_name']][frame['phase']].seconds += seconds
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('orminator_query_t0', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info['orminator_query_t0'].pop()
+        phase, table_name = self.get_current_phase()
+        with self.lock:
+            phase_statistics = self.phase_to_statistics[phase]
+            phase_statistics.queries += 1
+            phase_statistics.query_seconds += seconds
+            if table_name is not None:
+                table_statistics = self.table_to_phase_to_statistics[table_name][phase]
+                table_statistics.queries += 1
+                table_statistics.query_seconds += seconds
+            self.queries.append({
+                'phase': phase,
+                'table': table_name,
+                'statement': ' '.join(statement.split())[:self.max_statement_length],
+                'seconds': seconds
+            })
+
+    def get_query_count(self):
+        with self.lock:
+            return len(self.queries)
+
+    def get_table_seconds(self):
+        """Return a list of (table name, seconds) with the slowest table first."""
+        with self.lock:
+            table_seconds = [
+                (table_name, sum(s.seconds for s in phase_to_statistics.values()))
+                for table_name, phase_to_statistics
+                in self.table_to_phase_to_statistics.items()]
+        return sorted(table_seconds, key=lambda t_s: (-t_s[1], t_s[0]))
+
+    def get_trace(self):
+        with self.lock:
+            return {
+                'total_seconds': time.perf_counter() - self.t0,
+                'query_count': len(self.queries),
+                'phases': {
+                    str(phase): statistics.as_dict()
+                    for phase, statistics
+                    in self.phase_to_statistics.items()},
+                'tables': {
+                    table_name: {
+                        phase: statistics.as_dict()
+                        for phase, statistics
+                        in phase_to_statistics.items()}
+                    for table_name, phase_to_statistics
+                    in self.table_to_phase_to_statistics.items()},
+                'queries': list(self.queries)
+            }
+
+    def write_trace(self, trace_fp):
+        with open(trace_fp, 'wt') as trace_file:
+            json.dump(self.get_trace(), trace_file, indent=2)
+
+    def get_report(self, slowest_table_count=10):
+        """Return a summary of each phase and the slowest tables as text."""
+        trace = self.get_trace()
+        lines = ['{:<12} {:>10} {:>8} {:>12}'.format('phase', 'seconds', 'queries', 'query secs')]
+        for phase, statistics in sorted(trace['phases'].items()):
+            lines.append('{:<12} {:>10.4f} {:>8} {:>12.4f}'.format(
+                phase, statistics['seconds'], statistics['queries'], statistics['query_seconds']))
+        lines.append('{:<12} {:>10.4f} {:>8}'.format('total', trace['total_seconds'], trace['query_count']))
+
+        table_seconds = self.get_table_seconds()[:slowest_table_count]
+        if len(table_seconds) > 0:
+            lines.append('')
+            lines.append('slowest tables:')
+            for table_name, seconds in table_seconds:
+                lines.append('  {:<40} {:>10.4f}'.format(table_name, seconds))
+        return '\n'.join(lines)
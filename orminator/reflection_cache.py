@@ -0,0 +1,201 @@
+"""
+An on-disk cache of CatalogSnapshots keyed by database URI. Each cached snapshot
+is stored with a cheap per-table fingerprint of the schema. When the fingerprints
+read from the database match the cached fingerprints the catalog is not read at
+all; when only some tables have changed only those tables are read again.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+
+import sqlalchemy as sa
+
+from orminator.catalog import CatalogSnapshot
+
+
+# one query returns a checksum of the column, index and foreign key
+# definitions of every table, the schema name is left out so tables with
+# the same definitions in different schemas have the same fingerprint
+_mysql_fingerprint_query = sa.text("""\
+SELECT t.TABLE_NAME,
+  (SELECT SUM(CRC32(CONCAT_WS('|', c.ORDINAL_POSITION, c.COLUMN_NAME, c.COLUMN_TYPE, c.IS_NULLABLE,
+                              COALESCE(c.COLUMN_DEFAULT, 'NULL'), c.EXTRA, COALESCE(c.COLLATION_NAME, ''),
+                              c.COLUMN_COMMENT)))
+   FROM information_schema.COLUMNS c
+   WHERE c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME),
+  (SELECT SUM(CRC32(CONCAT_WS('|', s.INDEX_NAME, s.SEQ_IN_INDEX, s.COLUMN_NAME, s.NON_UNIQUE)))
+   FROM information_schema.STATISTICS s
+   WHERE s.TABLE_SCHEMA = t.TABLE_SCHEMA AND s.TABLE_NAME = t.TABLE_NAME),
+  (SELECT SUM(CRC32(CONCAT_WS('|', k.CONSTRAINT_NAME, k.ORDINAL_POSITION, k.COLUMN_NAME,
+                              IF(k.REFERENCED_TABLE_SCHEMA = k.TABLE_SCHEMA, '', k.REFERENCED_TABLE_SCHEMA),
+                              k.REFERENCED_TABLE_NAME, k.REFERENCED_COLUMN_NAME)))
+   FROM information_schema.KEY_COLUMN_USAGE k
+   WHERE k.TABLE_SCHEMA = t.TABLE_SCHEMA AND k.TABLE_NAME = t.TABLE_NAME
+     AND k.REFERENCED_TABLE_NAME IS NOT NULL),
+  (SELECT SUM(CRC32(CONCAT_WS('|', r.CONSTRAINT_NAME, r.UPDATE_RULE, r.DELETE_RULE)))
+   FROM information_schema.REFERENTIAL_CONSTRAINTS r
+   WHERE r.CONSTRAINT_SCHEMA = t.TABLE_SCHEMA AND r.TABLE_NAME = t.TABLE_NAME)
+FROM information_schema.TABLES t
+WHERE t.TABLE_SCHEMA = COALESCE(:schema, DATABASE()) AND t.TABLE_TYPE = 'BASE TABLE'""")
+
+# SQLite keeps the DDL for every table and index in sqlite_master
+_sqlite_fingerprint_query = sa.text("""\
+SELECT tbl_name, type, name, sql
+FROM sqlite_master
+WHERE type IN ('table', 'index') AND name NOT LIKE 'sqlite_%'
+ORDER BY tbl_name, type DESC, name""")
+
+
+def get_table_fingerprints(engine, schema=None):
+    """
+    Return a dictionary of table name to a string that changes whenever the
+    table's definition changes, or None if there is no cheap way to fingerprint
+    tables with this engine's dialect.
+    """
+    if engine.dialect.name in ('mysql', 'mariadb'):
+        with engine.connect() as connection:
+            return {
+                row[0]: '|'.join(str(checksum) for checksum in row[1:])
+                for row
+                in connection.execute(_mysql_fingerprint_query, {'schema': schema})}
+    elif engine.dialect.name == 'sqlite' and schema is None:
+        table_to_ddl = {}
+        with engine.connect() as connection:
+            for table_name, type_, name, sql in connection.execute(_sqlite_fingerprint_query):
+                table_to_ddl.setdefault(table_name, []).append('{} {}: {}'.format(type_, name, sql))
+        return {
+            table_name: hashlib.sha1('\n'.join(ddl).encode('utf-8')).hexdigest()
+            for table_name, ddl
+            in table_to_ddl.items()}
+    else:
+        return None
+
+
+class ReflectionCache():
+    """
+    Snapshots are pickled to one file per database URI and schema in cache_dir.
+    """
+    # change this when the pickled format changes
+    format_version = 2
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def get_cache_fp(self, engine, schema=None):
+        # the password is not part of the cache key
+        cache_key = '{} {} {}'.format(repr(engine.url), schema, sa.__version__)
+        return os.path.join(
+            self.cache_dir,
+            'catalog_{}.pickle'.format(hashlib.sha1(cache_key.encode('utf-8')).hexdigest()))
+
+    def load(self, cache_fp):
+        try:
+            with open(cache_fp, 'rb') as cache_file:
+                cached = pickle.load(cache_file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        if cached.get('format_version') != self.format_version:
+            return None
+        else:
+            return cached['fingerprints'], cached['catalog']
+
+    def save(self, cache_fp, fingerprints, catalog):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # write to a temporary file and rename it so readers never see a partial file
+        fd, tmp_fp = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                pickle.dump(
+                    {
+                        'format_version': self.format_version,
+                        'fingerprints': fingerprints,
+                        'catalog': catalog
+                    },
+                    tmp_file,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_fp, cache_fp)
+        except:
+            os.remove(tmp_fp)
+            raise
+
+    def get_catalog(self, engine, schema=None, workers=1, only=None, fingerprints=None, read_catalog=None):
+        """
+        Return a CatalogSnapshot for engine reading as little of the catalog as possible.
+        If only is given the snapshot has only the named tables, the cache keeps
+        the tables read by earlier runs with other names. fingerprints can be
+        given if they have already been read with get_table_fingerprints.
+        read_catalog(only) reads the catalog of the named tables, by default
+        with CatalogSnapshot.from_engine.
+        """
+        if read_catalog is None:
+            def read_catalog(only):
+                return CatalogSnapshot.from_engine(engine, schema=schema, only=only, workers=workers)
+
+        if fingerprints is None:
+            fingerprints = get_table_fingerprints(engine, schema=schema)
+        if fingerprints is None:
+            # nothing to compare a cached snapshot with
+            return read_catalog(only)
+
+        if only is None:
+            wanted_fingerprints = fingerprints
+        else:
+            only = set(only)
+            wanted_fingerprints = {t: f for t, f in fingerprints.items() if t in only}
+
+        cache_fp = self.get_cache_fp(engine, schema=schema)
+        cached = self.load(cache_fp)
+        if cached is None:
+            catalog = read_catalog(only)
+            cached_fingerprints = wanted_fingerprints
+        else:
+            cached_fingerprints, catalog = cached
+            changed_table_names = sorted(
+                table_name
+                for table_name, fingerprint
+                in wanted_fingerprints.items()
+                if cached_fingerprints.get(table_name) != fingerprint)
+            removed_table_names = [
+                table_name
+                for table_name
+                in cached_fingerprints
+                if table_name not in fingerprints]
+
+            if len(changed_table_names) == 0 and len(removed_table_names) == 0:
+                return catalog if only is None else catalog.get_subset(only)
+
+            for table_name in removed_table_names:
+                if table_name in catalog.columns:
+                    catalog.remove_table(table_name)
+            if len(changed_table_names) > 0:
+                catalog.update(read_catalog(changed_table_names))
+            # tables outside only keep the fingerprints they were read with
+            cached_fingerprints = {
+                table_name: fingerprint
+                for table_name, fingerprint
+                in cached_fingerprints.items()
+                if table_name in fingerprints}
+            cached_fingerprints.update(wanted_fingerprints)
+
+        self.save(cache_fp, cached_fingerprints, catalog)
+        return catalog if only is None else catalog.get_subset(only)
+
+    async def get_catalog_from_async_engine(self, async_engine, schema=None, workers=1, only=None):
+        """
+        get_catalog for an AsyncEngine, the changed tables are read with up to
+        workers concurrent connections on the event loop.
+        """
+        from sqlalchemy.util import await_only, greenlet_spawn
+
+        def read_catalog(only):
+            return await_only(
+                CatalogSnapshot.from_async_engine(async_engine, schema=schema, only=only, workers=workers))
+
+        # the sync engine of an AsyncEngine can be used inside greenlet_spawn
+        return await greenlet_spawn(
+            self.get_catalog,
+            async_engine.sync_engine,
+            schema=schema,
+            only=only,
+            read_catalog=read_catalog)
@@ -0,0 +1,239 @@
+"""
+Send writes to a primary database and spread reads over replicas.
+
+    router = ReplicaRouter(
+        'mysql+pymysql://imicrobe:<password>@primary/imicrobe',
+        ['mysql+pymysql://imicrobe:<password>@replica1/imicrobe',
+         'mysql+pymysql://imicrobe:<password>@replica2/imicrobe'],
+        balancing='least_connections',
+        sticky_seconds=5.0)
+    router.start_health_checks(interval=10.0)
+
+    with session_manager(router.get_session_class()) as session:
+        samples = session.query(models.Sample).all()       # a replica
+        session.add(models.Sample(file_='x.fa'))            # flushed to the primary
+
+A RoutingSession sends flushes, INSERT, UPDATE and DELETE statements, SELECT
+... FOR UPDATE, text() statements and connections requested without a statement
+(session.connection()) to the primary. Once a session has used the primary the
+rest of its transaction stays there, so a transaction that writes reads its own
+changes. Other queries go to one replica per transaction, chosen round-robin or
+by the fewest connections in use.
+
+With sticky_seconds reads also go to the primary for that long after a commit
+that wrote, so a client reads its own writes while replicas catch up. Writes are
+remembered for each sticky_key, for example a user id given to
+get_session_class(sticky_key=...), or for every session if there is no key.
+
+A replica that fails a health check (SELECT 1) or drops a connection is ejected
+for eject_seconds. Reads go to the primary when every replica is ejected.
+"""
+from collections import defaultdict
+import itertools
+import logging
+import threading
+import time
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session, sessionmaker
+
+from orminator.engines import engine_registry
+
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaRouter():
+    def __init__(
+            self,
+            primary_uri,
+            replica_uris=(),
+            balancing='round_robin',
+            sticky_seconds=0.0,
+            eject_seconds=30.0,
+            registry=engine_registry,
+            **engine_options):
+        """
+        balancing is 'round_robin' or 'least_connections'. Engines come from
+        registry and are shared with session managers using the same URIs and
+        engine_options.
+        """
+        if balancing not in ('round_robin', 'least_connections'):
+            raise ValueError('balancing must be "round_robin" or "least_connections", not "{}"'.format(balancing))
+        self.balancing = balancing
+        self.sticky_seconds = sticky_seconds
+        self.eject_seconds = eject_seconds
+        self.primary = registry.get_engine(primary_uri, **engine_options)
+        self.replicas = [registry.get_engine(replica_uri, **engine_options) for replica_uri in replica_uris]
+
+        self.lock = threading.Lock()
+        self.round_robin = itertools.count()
+        self.engine_to_checked_out = defaultdict(int)
+        self.engine_to_ejected_until = {}
+        self.sticky_key_to_write_time = {}
+        self.health_check_thread = None
+        self.health_check_stop_event = threading.Event()
+
+        for replica in self.replicas:
+            self._instrument(replica)
+
+    def _instrument(self, replica):
+        def checkout(*args):
+            with self.lock:
+                self.engine_to_checked_out[replica] += 1
+
+        def checkin(*args):
+            with self.lock:
+                self.engine_to_checked_out[replica] -= 1
+
+        def handle_error(context):
+            if context.is_disconnect:
+                self.eject(replica)
+
+        sa.event.listen(replica, 'checkout', checkout)
+        sa.event.listen(replica, 'checkin', checkin)
+        sa.event.listen(replica, 'handle_error', handle_error)
+
+    def get_session_class(self, sticky_key=None, **session_options):
+        """Return a sessionmaker for RoutingSessions, session_options are passed to each session."""
+        return sessionmaker(class_=RoutingSession, router=self, sticky_key=sticky_key, **session_options)
+
+    def is_ejected(self, replica):
+        with self.lock:
+            return self.engine_to_ejected_until.get(replica, 0.0) > time.monotonic()
+
+    def eject(self, replica, seconds=None):
+        """Send no reads to replica for seconds (eject_seconds by default)."""
+        if seconds is None:
+            seconds = self.eject_seconds
+        with self.lock:
+            self.engine_to_ejected_until[replica] = time.monotonic() + seconds
+        logger.warning('ejected replica %r for %.1f seconds', replica.url, seconds)
+
+    def restore(self, replica):
+        with self.lock:
+            ejected = self.engine_to_ejected_until.pop(replica, None) is not None
+        if ejected:
+            logger.info('restored replica %r', replica.url)
+
+    def record_write(self, sticky_key=None):
+        """Remember a committed write so sticky_key reads from the primary for sticky_seconds."""
+        if self.sticky_seconds > 0:
+            with self.lock:
+                self.sticky_key_to_write_time[sticky_key] = time.monotonic()
+
+    def is_sticky(self, sticky_key=None):
+        with self.lock:
+            write_time = self.sticky_key_to_write_time.get(sticky_key)
+            if write_time is None:
+                return False
+            elif time.monotonic() - write_time < self.sticky_seconds:
+                return True
+            else:
+                del self.sticky_key_to_write_time[sticky_key]
+                return False
+
+    def get_read_engine(self, sticky_key=None):
+        """Return the engine for a read: a healthy replica, or the primary."""
+        if len(self.replicas) == 0 or self.is_sticky(sticky_key):
+            return self.primary
+
+        now = time.monotonic()
+        with self.lock:
+            replicas = [r for r in self.replicas if self.engine_to_ejected_until.get(r, 0.0) <= now]
+            if len(replicas) == 0:
+                return self.primary
+            # rotate the replicas so ties are broken round-robin
+            start = next(self.round_robin) % len(replicas)
+            replicas = replicas[start:] + replicas[:start]
+            if self.balancing == 'least_connections':
+                return min(replicas, key=lambda r: self.engine_to_checked_out[r])
+            else:
+                return replicas[0]
+
+    def check_health(self):
+        """
+        Run SELECT 1 on each replica, eject the replicas that fail and restore
+        the others. Return a dictionary of replica URL to True if healthy.
+        """
+        replica_url_to_health = {}
+        for replica in self.replicas:
+            try:
+                with replica.connect() as connection:
+                    connection.execute(sa.text('SELECT 1'))
+            except sa.exc.DBAPIError:
+                logger.exception('health check failed for replica %r', replica.url)
+                self.eject(replica)
+                replica_url_to_health[repr(replica.url)] = False
+            else:
+                self.restore(replica)
+                replica_url_to_health[repr(replica.url)] = True
+        return replica_url_to_health
+
+    def start_health_checks(self, interval=10.0):
+        """Check the health of the replicas now and every interval seconds in a thread."""
+        self.check_health()
+        self.health_check_stop_event.clear()
+        self.health_check_thread = threading.Thread(
+            target=self._run_health_checks,
+            args=(interval, ),
+            name='orminator-replica-health-checks',
+            daemon=True)
+        self.health_check_thread.start()
+
+    def stop_health_checks(self):
+        self.health_check_stop_event.set()
+        if self.health_check_thread is not None:
+            self.health_check_thread.join()
+            self.health_check_thread = None
+
+    def _run_health_checks(self, interval):
+        while not self.health_check_stop_event.wait(interval):
+            self.check_health()
+
+
+class RoutingSession(Session):
+    """A Session choosing the primary or a replica of a ReplicaRouter for each statement."""
+    def __init__(self, router, sticky_key=None, **kwargs):
+        super().__init__(**kwargs)
+        self.router = router
+        self.sticky_key = sticky_key
+        # the engine used for reads until the transaction ends
+        self._read_engine = None
+        self._use_primary = False
+        self._wrote = False
+        sa.event.listen(self, 'after_commit', self._after_commit)
+        sa.event.listen(self, 'after_transaction_end', self._after_transaction_end)
+
+    def is_write(self, clause):
+        if clause is None or self._flushing:
+            # session.connection() is used for writes, for example by bulk_insert
+            return True
+        elif isinstance(clause, (sa.sql.expression.UpdateBase, sa.sql.expression.TextClause)):
+            return True
+        else:
+            return getattr(clause, '_for_update_arg', None) is not None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._use_primary:
+            return self.router.primary
+        elif self.is_write(clause):
+            self._use_primary = True
+            self._wrote = True
+            return self.router.primary
+        else:
+            if self._read_engine is None:
+                self._read_engine = self.router.get_read_engine(self.sticky_key)
+            if self._read_engine is self.router.primary:
+                self._use_primary = True
+            return self._read_engine
+
+    def _after_commit(self, session):
+        if self._wrote:
+            self.router.record_write(self.sticky_key)
+
+    def _after_transaction_end(self, session, transaction):
+        if transaction.parent is None:
+            self._read_engine = None
+            self._use_primary = False
+            self._wrote = False
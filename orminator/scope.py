@@ -0,0 +1,159 @@
+"""
+Generate models for a slice of a large database. A TableScope starts from root
+tables and tables matching include patterns and follows foreign keys to a given
+depth, for example
+
+    scope = TableScope(roots=['sample'], exclude=['*_log'], depth=2, direction='out')
+    model_writer = ModelWriter(db_uri, scope=scope)
+
+Only the table names and the foreign key edges of the whole database are read,
+with one query for MySQL, MariaDB and SQLite, so the cost of the full catalog
+depends on the size of the slice rather than the size of the database.
+
+direction is 'out' to follow foreign keys to the tables they refer to, 'in' to
+follow them back to the tables referring to the tables in scope, or 'both'.
+depth=None follows foreign keys as far as they go. Patterns are shell-style
+wildcards as used by fnmatch. Excluded tables are never added and foreign keys
+are not followed through them.
+"""
+from collections import defaultdict
+import fnmatch
+import re
+
+import sqlalchemy as sa
+
+
+_mysql_foreign_key_edges_query = sa.text("""\
+SELECT t.TABLE_NAME, k.REFERENCED_TABLE_NAME
+FROM information_schema.TABLES t
+LEFT JOIN information_schema.KEY_COLUMN_USAGE k
+  ON k.TABLE_SCHEMA = t.TABLE_SCHEMA
+  AND k.TABLE_NAME = t.TABLE_NAME
+  AND k.REFERENCED_TABLE_SCHEMA = t.TABLE_SCHEMA
+  AND k.REFERENCED_TABLE_NAME IS NOT NULL
+WHERE t.TABLE_SCHEMA = COALESCE(:schema, DATABASE()) AND t.TABLE_TYPE = 'BASE TABLE'""")
+
+# pragma table-valued functions need SQLite 3.16
+_sqlite_foreign_key_edges_query = sa.text("""\
+SELECT m.name, p."table"
+FROM sqlite_master m
+LEFT JOIN pragma_foreign_key_list(m.name) p
+WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'""")
+
+
+def get_foreign_key_edges(engine, schema=None):
+    """
+    Return the names of all tables and a set of (table name, referred table name)
+    for every foreign key between tables in the same schema.
+    """
+    if engine.dialect.name in ('mysql', 'mariadb'):
+        with engine.connect() as connection:
+            rows = connection.execute(_mysql_foreign_key_edges_query, {'schema': schema}).fetchall()
+    elif engine.dialect.name == 'sqlite' and schema is None:
+        with engine.connect() as connection:
+            rows = connection.execute(_sqlite_foreign_key_edges_query).fetchall()
+    else:
+        insp = sa.inspect(engine)
+        rows = []
+        for table_name in insp.get_table_names(schema=schema):
+            rows.append((table_name, None))
+            for fk_constraint in insp.get_foreign_keys(table_name, schema=schema):
+                if fk_constraint['referred_schema'] in (None, schema):
+                    rows.append((table_name, fk_constraint['referred_table']))
+
+    table_names = sorted({table_name for table_name, _ in rows})
+    edges = {
+        (table_name, referred_table_name)
+        for table_name, referred_table_name
+        in rows
+        if referred_table_name is not None}
+    return table_names, edges
+
+
+class UnknownRootError(ValueError):
+    pass
+
+
+class TableScope():
+    # the same names ModelWriter recognizes as many-to-many association tables
+    _association_table_re = re.compile(r'(?P<left_table>.+)_to_(?P<right_table>.+)')
+
+    def __init__(self, roots=(), include=(), exclude=(), depth=None, direction='out', association_tables=True):
+        """
+        With no roots and no include patterns every table not excluded is in
+        scope. If association_tables is True tables named x_to_y are added when
+        x and y are both in scope.
+        """
+        if direction not in ('out', 'in', 'both'):
+            raise ValueError('direction must be "out", "in" or "both", not "{}"'.format(direction))
+        self.roots = list(roots)
+        self.include = list(include)
+        self.exclude = list(exclude)
+        self.depth = depth
+        self.direction = direction
+        self.association_tables = association_tables
+
+    def is_excluded(self, table_name):
+        return any(fnmatch.fnmatchcase(table_name, pattern) for pattern in self.exclude)
+
+    def select_table_names(self, table_names, edges, ignore_unknown_roots=False):
+        """
+        Return the sorted names of the tables in scope given the names of all
+        tables and the (table name, referred table name) foreign key edges.
+        Roots that are not in table_names are an error unless ignore_unknown_roots
+        is True, for example when the same scope is used for several schemas.
+        """
+        unknown_roots = [root for root in self.roots if root not in table_names]
+        if len(unknown_roots) > 0 and not ignore_unknown_roots:
+            raise UnknownRootError('unknown root table(s): {}'.format(', '.join(unknown_roots)))
+
+        if len(self.roots) == 0 and len(self.include) == 0:
+            return sorted(t for t in table_names if not self.is_excluded(t))
+
+        neighbors = defaultdict(set)
+        for table_name, referred_table_name in edges:
+            if self.direction in ('out', 'both'):
+                neighbors[table_name].add(referred_table_name)
+            if self.direction in ('in', 'both'):
+                neighbors[referred_table_name].add(table_name)
+
+        start_table_names = set(self.roots) - set(unknown_roots)
+        start_table_names.update(
+            table_name
+            for table_name in table_names
+            for pattern in self.include
+            if fnmatch.fnmatchcase(table_name, pattern))
+        selected = {t for t in start_table_names if not self.is_excluded(t)}
+
+        # breadth first so depth counts foreign keys from the nearest start table
+        frontier = set(selected)
+        level = 0
+        while len(frontier) > 0 and (self.depth is None or level < self.depth):
+            next_frontier = set()
+            for table_name in frontier:
+                for neighbor in neighbors[table_name]:
+                    if neighbor not in selected and not self.is_excluded(neighbor):
+                        selected.add(neighbor)
+                        next_frontier.add(neighbor)
+            frontier = next_frontier
+            level += 1
+
+        if self.association_tables:
+            table_to_referred_table_names = defaultdict(set)
+            for table_name, referred_table_name in edges:
+                table_to_referred_table_names[table_name].add(referred_table_name)
+            for table_name in table_names:
+                association_table_name_match = self._association_table_re.search(table_name)
+                if (association_table_name_match
+                        and association_table_name_match.group('left_table') in selected
+                        and association_table_name_match.group('right_table') in selected
+                        and table_to_referred_table_names[table_name] <= selected
+                        and not self.is_excluded(table_name)):
+                    selected.add(table_name)
+
+        return sorted(selected)
+
+    def get_table_names(self, engine, schema=None, ignore_unknown_roots=False):
+        """Return the sorted names of the tables in scope in engine's database."""
+        table_names, edges = get_foreign_key_edges(engine, schema=schema)
+        return self.select_table_names(table_names, edges, ignore_unknown_roots=ignore_unknown_roots)
@@ -0,0 +1,115 @@
+"""
+Iterate over large query results in constant memory.
+
+session.query(models.Sample).all() loads every row into the session's identity
+map at once. The functions here load rows in chunks instead, either from a
+server-side cursor (stream_results, stream_chunks) or by keyset pagination on
+the primary key (keyset_results, keyset_chunks), and expunge each chunk from
+the session once the caller has moved on to the next one. For example
+
+    with session_manager(Session) as session:
+        for sample in stream_results(session, session.query(models.Sample), chunk_size=5000):
+            print(sample.file_)
+
+        process_in_chunks(session, models.Sample, write_samples, chunk_size=5000)
+"""
+import itertools
+
+import sqlalchemy as sa
+
+
+def _expunge_chunk(session, chunk):
+    for obj in chunk:
+        if obj in session:
+            session.expunge(obj)
+
+
+def stream_chunks(session, query, chunk_size=1000, expunge=True):
+    """
+    Yield lists of at most chunk_size objects read from a server-side cursor.
+    query is a Query or a select() of a mapped class. Relationships loaded with
+    lazy="joined" collections can not be used with a server-side cursor.
+    """
+    if isinstance(query, sa.orm.Query):
+        results = query.execution_options(stream_results=True).yield_per(chunk_size)
+    else:
+        results = session.execute(
+            query,
+            execution_options={'stream_results': True, 'yield_per': chunk_size}).scalars()
+
+    results = iter(results)
+    while True:
+        chunk = list(itertools.islice(results, chunk_size))
+        if len(chunk) == 0:
+            return
+        yield chunk
+        if expunge:
+            _expunge_chunk(session, chunk)
+
+
+def stream_results(session, query, chunk_size=1000, expunge=True):
+    """Yield the objects from stream_chunks one at a time."""
+    for chunk in stream_chunks(session, query, chunk_size=chunk_size, expunge=expunge):
+        for obj in chunk:
+            yield obj
+
+
+def keyset_chunks(session, model, chunk_size=1000, criteria=(), expunge=True):
+    """
+    Yield lists of at most chunk_size instances of model ordered by primary key.
+    Each chunk is read with its own query starting after the last primary key of
+    the previous chunk, so no cursor is held open between chunks and each query
+    uses the primary key index. criteria are added to every query, for example
+
+        keyset_chunks(session, models.Sample, criteria=[models.Sample.project_id == 1])
+    """
+    pk_columns = list(sa.inspect(model).primary_key)
+    if len(pk_columns) == 1:
+        pk_expression = pk_columns[0]
+    else:
+        pk_expression = sa.tuple_(*pk_columns)
+
+    last_pk = None
+    while True:
+        query = session.query(model).filter(*criteria)
+        if last_pk is not None:
+            query = query.filter(pk_expression > last_pk)
+        chunk = query.order_by(*pk_columns).limit(chunk_size).all()
+        if len(chunk) == 0:
+            return
+
+        last_pk_values = sa.inspect(chunk[-1]).identity
+        if len(pk_columns) == 1:
+            last_pk = last_pk_values[0]
+        else:
+            last_pk = sa.tuple_(*[sa.literal(v) for v in last_pk_values])
+
+        yield chunk
+        if expunge:
+            _expunge_chunk(session, chunk)
+        if len(chunk) < chunk_size:
+            return
+
+
+def keyset_results(session, model, chunk_size=1000, criteria=(), expunge=True):
+    """Yield the objects from keyset_chunks one at a time."""
+    for chunk in keyset_chunks(session, model, chunk_size=chunk_size, criteria=criteria, expunge=expunge):
+        for obj in chunk:
+            yield obj
+
+
+def process_in_chunks(session, query_or_model, callback, chunk_size=1000, expunge=True):
+    """
+    Call callback with each chunk of results and return the number of objects.
+    A mapped class is read with keyset_chunks, anything else with stream_chunks.
+    """
+    if isinstance(query_or_model, type):
+        chunks = keyset_chunks(session, query_or_model, chunk_size=chunk_size, expunge=expunge)
+    else:
+        chunks = stream_chunks(session, query_or_model, chunk_size=chunk_size, expunge=expunge)
+
+    object_count = 0
+    for chunk in chunks:
+        callback(chunk)
+        object_count += len(chunk)
+    return object_count
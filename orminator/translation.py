@@ -0,0 +1,95 @@
+"""
+A Translator applies the first of an ordered list of (pattern, replacement) pairs
+that fully matches a string. The patterns are merged into one regular expression
+so each distinct string is matched once, and results are memoized. Patterns that
+can not be merged safely (with named groups or backreferences) are tried one at
+a time instead.
+"""
+import functools
+import re
+
+
+# flags that can be scoped to one alternative with (?flags:...)
+_inline_flags = (
+    (re.ASCII, 'a'),
+    (re.IGNORECASE, 'i'),
+    (re.MULTILINE, 'm'),
+    (re.DOTALL, 's'),
+    (re.VERBOSE, 'x'))
+
+# named groups, backreferences and conditional groups refer to group names
+# or numbers that change when the pattern is wrapped in a larger expression
+_group_reference_re = re.compile(r'\(\?P<|\(\?P=|\(\?\(|\\[1-9]|\\g<')
+
+
+def get_scoped_pattern(pattern):
+    """Return pattern's source with its flags applied to it alone, as (?flags:...)."""
+    flags = ''.join(letter for flag, letter in _inline_flags if pattern.flags & flag)
+    if flags == '':
+        return '(?:{})'.format(pattern.pattern)
+    elif pattern.flags & re.VERBOSE:
+        # a comment at the end of a verbose pattern would hide the ')'
+        return '(?{}:{}\n)'.format(flags, pattern.pattern)
+    else:
+        return '(?{}:{})'.format(flags, pattern.pattern)
+
+
+class Translator():
+    r"""
+    translations is a list of (compiled pattern, replacement) pairs in priority
+    order or a dictionary, in which case its insertion order is the priority
+    order. A string that no pattern fully matches is returned unchanged.
+
+        translator = Translator([
+            (re.compile(r'DOUBLE UNSIGNED'), r'sa.Float'),
+            (re.compile(r'VARCHAR\((\d+)\)'), r'sa.String(length=\1)')])
+        translator.translate('VARCHAR(32)')
+        'sa.String(length=32)'
+    """
+    def __init__(self, translations, cache_size=4096):
+        if isinstance(translations, dict):
+            translations = translations.items()
+        self.translations = [
+            (re.compile(pattern) if isinstance(pattern, str) else pattern, replacement)
+            for pattern, replacement
+            in translations]
+        self.pattern = self.get_combined_pattern()
+
+        self.translate = functools.lru_cache(maxsize=cache_size)(self._translate)
+
+    def get_combined_pattern(self):
+        """
+        Return one pattern matching any of the translation patterns, with each
+        pattern wrapped in a named group t<priority> so the matching alternative
+        tells us which translation to apply. Return None if the patterns can not
+        be combined.
+        """
+        if len(self.translations) == 0:
+            return None
+        elif any(_group_reference_re.search(pattern.pattern) for pattern, _ in self.translations):
+            return None
+        try:
+            return re.compile('|'.join(
+                '(?P<t{}>{})'.format(i, get_scoped_pattern(pattern))
+                for i, (pattern, _)
+                in enumerate(self.translations)))
+        except re.error:
+            return None
+
+    def _translate(self, s):
+        if self.pattern is None:
+            for pattern, replacement in self.translations:
+                if pattern.fullmatch(s):
+                    return pattern.sub(string=s, repl=replacement)
+            return s
+
+        m = self.pattern.fullmatch(s)
+        if m is None:
+            return s
+        else:
+            # the wrapping group closes last so it is the last matched group
+            pattern, replacement = self.translations[int(m.lastgroup[1:])]
+            return pattern.sub(string=s, repl=replacement)
+
+    def cache_info(self):
+        return self.translate.cache_info()
@@ -0,0 +1,196 @@
+"""
+Do the work of the first query before the first request arrives.
+
+Importing generated models builds the tables, but the relationships between
+classes are resolved and every attribute is instrumented the first time a
+mapped class is used, and each statement is compiled the first time it is run.
+With hundreds of tables this makes the first query in a fresh process slow.
+warm_up does this work up front, before forking worker processes or in a
+background thread while the process starts:
+
+    import models
+    from orminator.warmup import warm_up
+
+    warm_up(models, engine=engine, manifest_fp='models.json')
+
+The manifest is written with the models (write_models -m models.json). warm_up
+checks it against the imported module so a models file that does not match the
+manifest, or classes missing relationships or columns, fail at startup rather
+than on the first request that uses them.
+
+If an engine is given the primary key load (including lazy="joined"
+relationships) and the lazy="select" relationship loads of every class are run
+once against the database, with values matching no rows, and one row is read
+from tables with lazy="selectin" relationships, so the compiled SQL is in the
+engine's statement cache. The cache holds query_cache_size statements (500 by
+default), create_engine() needs a larger query_cache_size to keep every
+statement of a large schema. When warming up before a fork call
+engine.dispose(close=False) in each child process so the parent's connections
+are not shared.
+"""
+import hashlib
+import json
+import logging
+import threading
+
+import sqlalchemy as sa
+import sqlalchemy.orm
+
+from orminator import ModelWriter
+
+
+logger = logging.getLogger(__name__)
+
+
+def read_manifest(manifest_fp):
+    with open(manifest_fp, 'rt') as manifest_file:
+        manifest = json.load(manifest_file)
+    if manifest.get('format_version') != ModelWriter.manifest_format_version:
+        raise ValueError('{} has format version {}, expected {}'.format(
+            manifest_fp, manifest.get('format_version'), ModelWriter.manifest_format_version))
+    return manifest
+
+
+def configure_models(models):
+    """Configure the mappers of the classes in a generated models module."""
+    model_base = getattr(models, 'Model', None)
+    if hasattr(model_base, 'registry'):
+        # only the module's registry, other registries are left alone
+        model_base.registry.configure()
+    else:
+        # sqlalchemy before 1.4 has a single mapper registry
+        sa.orm.configure_mappers()
+
+
+def validate_models(models, manifest):
+    """
+    Raise ValueError if the models module was not generated with manifest or
+    if a class is missing a table, primary key, column or relationship the
+    manifest lists. The mappers must be configured.
+    """
+    errors = []
+    with open(models.__file__, 'rb') as models_file:
+        models_sha1 = hashlib.sha1(models_file.read()).hexdigest()
+    if models_sha1 != manifest['models_sha1']:
+        errors.append('{} does not match the manifest'.format(models.__file__))
+
+    for class_name, class_manifest in sorted(manifest['classes'].items()):
+        cls = getattr(models, class_name, None)
+        if cls is None:
+            errors.append('class {} is missing'.format(class_name))
+            continue
+        mapper = sa.inspect(cls)
+        if mapper.local_table.name != class_manifest['table']:
+            errors.append('class {} maps table "{}", expected "{}"'.format(
+                class_name, mapper.local_table.name, class_manifest['table']))
+        pk_attribute_names = [mapper.get_property_by_column(c).key for c in mapper.primary_key]
+        if pk_attribute_names != class_manifest['primary_key']:
+            errors.append('class {} has primary key {}, expected {}'.format(
+                class_name, pk_attribute_names, class_manifest['primary_key']))
+        for attribute_name in class_manifest['columns']:
+            if attribute_name not in mapper.column_attrs:
+                errors.append('class {} has no column {}'.format(class_name, attribute_name))
+        for attribute_name in class_manifest['relationships']:
+            if attribute_name not in mapper.relationships:
+                errors.append('class {} has no relationship {}'.format(class_name, attribute_name))
+
+    if len(errors) > 0:
+        raise ValueError('models do not match the manifest:\n  ' + '\n  '.join(errors))
+
+
+def get_mapped_classes(models, manifest=None):
+    """Return the classes listed in manifest, or every class mapped by the module's Model."""
+    if manifest is not None:
+        return [getattr(models, class_name) for class_name in sorted(manifest['classes'])]
+    else:
+        return sorted(
+            (mapper.class_ for mapper in models.Model.registry.mappers),
+            key=lambda cls: cls.__name__)
+
+
+def get_unmatched_value(column):
+    """
+    Return a value of the column's type that is unlikely to match a row, or
+    None if there is no safe choice. A value of the wrong type could make the
+    database convert the column and scan the whole table.
+    """
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return None
+    if python_type is int:
+        return -1
+    elif python_type is str:
+        return ''
+    else:
+        return None
+
+
+def prime_statements(models, engine, manifest=None):
+    """
+    Run the primary key load and the relationship loads of every class once
+    so the compiled statements are in engine's statement cache. Nothing is
+    written, the transaction is rolled back. Return the number of loads run.
+    """
+    load_count = 0
+    with sa.orm.Session(engine) as session:
+        for cls in get_mapped_classes(models, manifest):
+            mapper = sa.inspect(cls)
+            pk_values = [get_unmatched_value(c) for c in mapper.primary_key]
+            if None in pk_values:
+                logger.debug('not priming loads for %s', cls.__name__)
+                continue
+            # lazy="joined" relationships are part of this statement
+            session.get(cls, tuple(pk_values))
+            load_count += 1
+
+            # lazy="selectin" relationships are only loaded for the rows found
+            # so one row is read if there is one
+            if any(r.lazy == 'selectin' for r in mapper.relationships):
+                session.scalars(sa.select(cls).limit(1)).first()
+                load_count += 1
+
+            # a detached stand-in for a row lets each relationship emit its lazy
+            # load, every column has a value so no attribute is left expired and
+            # reading a many-to-one relationship does not refresh the missing row
+            stand_in = cls()
+            for column_property in mapper.column_attrs:
+                sa.orm.attributes.set_committed_value(
+                    stand_in, column_property.key, get_unmatched_value(column_property.columns[0]))
+            sa.orm.make_transient_to_detached(stand_in)
+            session.add(stand_in)
+            for relationship in mapper.relationships:
+                if relationship.lazy in ('select', True):
+                    getattr(stand_in, relationship.key)
+                    load_count += 1
+            session.expunge_all()
+        session.rollback()
+    return load_count
+
+
+def warm_up(models, engine=None, manifest_fp=None, background=False):
+    """
+    Configure the mappers of a generated models module, check it against the
+    manifest in manifest_fp and prime engine's statement cache. If background
+    is True this is done in a daemon thread, which is returned.
+    """
+    if background:
+        thread = threading.Thread(
+            target=warm_up,
+            args=(models, ),
+            kwargs={'engine': engine, 'manifest_fp': manifest_fp},
+            name='orminator-warm-up',
+            daemon=True)
+        thread.start()
+        return thread
+
+    configure_models(models)
+    if manifest_fp is None:
+        manifest = None
+    else:
+        manifest = read_manifest(manifest_fp)
+        validate_models(models, manifest)
+    if engine is not None:
+        load_count = prime_statements(models, engine, manifest=manifest)
+        logger.info('primed %d load(s)', load_count)
+    return None
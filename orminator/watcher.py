@@ -0,0 +1,198 @@
+"""
+Pick up schema changes in a long-running process without restarting it.
+
+A SchemaWatcher polls the table fingerprints used by the reflection cache (one
+query for MySQL, MariaDB and SQLite). When they change the models file is
+regenerated incrementally, so only the catalog of the changed tables is read and
+only their classes are written again, and the file is imported as a new module
+with its own declarative registry. The new mappers are configured before the
+new module replaces the old one, so a failed reload leaves the current models in
+place. Sessions already using the old classes are not affected: a reload can
+happen at any time on the watcher's thread, so the old mappers are kept until
+the caller disposes of them with dispose_replaced_models() at a point where no
+session uses them, for example between batches of work.
+
+    with SchemaWatcher(db_uri, 'models.py', module_name='models', interval=30) as watcher:
+        ...
+        with session_manager(Session) as session:
+            models = watcher.get_models()
+            session.query(models.Sample).all()
+
+Code should look up classes through get_models() (or sys.modules) for each unit
+of work rather than holding on to classes imported at startup.
+"""
+import importlib.util
+import logging
+import shutil
+import sys
+import tempfile
+import threading
+import weakref
+
+from orminator import ModelWriter
+from orminator.engines import engine_registry
+from orminator.reflection_cache import get_table_fingerprints
+from orminator.warmup import configure_models
+
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaWatcher():
+    def __init__(
+            self,
+            db_uri,
+            models_fp,
+            module_name='models',
+            interval=60.0,
+            schema=None,
+            cache_dir=None,
+            on_reload=None,
+            model_writer_class=ModelWriter,
+            **model_writer_options):
+        """
+        models_fp is the generated file, module_name is the name the module is
+        given in sys.modules. on_reload is called with the new module after
+        each reload. Other keyword arguments are passed to model_writer_class.
+        """
+        self.db_uri = db_uri
+        self.models_fp = models_fp
+        self.module_name = module_name
+        self.interval = interval
+        self.schema = schema
+        # the reflection cache is what limits a reload to the changed tables,
+        # a temporary cache_dir is removed by stop() or when the watcher is
+        # garbage collected
+        self.cache_dir = cache_dir
+        self.remove_cache_dir = None
+        if cache_dir is None:
+            self.make_temporary_cache_dir()
+        else:
+            pass
+        self.on_reload = on_reload
+        self.model_writer_class = model_writer_class
+        self.model_writer_options = model_writer_options
+
+        self.engine = engine_registry.get_engine(db_uri)
+        self.lock = threading.Lock()
+        self.fingerprints = None
+        self.models = None
+        # modules replaced by a reload, oldest first, kept until dispose_replaced_models()
+        self.replaced_models = []
+        self.reload_count = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def make_temporary_cache_dir(self):
+        self.cache_dir = tempfile.mkdtemp(prefix='orminator_watcher_')
+        self.remove_cache_dir = weakref.finalize(self, shutil.rmtree, self.cache_dir, ignore_errors=True)
+
+    def get_models(self):
+        """Return the most recently loaded models module."""
+        return self.models
+
+    def get_fingerprints(self):
+        fingerprints = get_table_fingerprints(self.engine, schema=self.schema)
+        if fingerprints is None:
+            raise ValueError(
+                'schema fingerprints are not available for dialect "{}"'.format(self.engine.dialect.name))
+        return fingerprints
+
+    def check(self):
+        """
+        Reload the models if the schema has changed since the last check, or if
+        no models have been loaded yet. Return True if the models were reloaded.
+        """
+        with self.lock:
+            fingerprints = self.get_fingerprints()
+            if self.models is not None and fingerprints == self.fingerprints:
+                return False
+
+            self.write_models()
+            models = self.load_models()
+            # publish the new module only once its mappers are configured
+            sys.modules[self.module_name] = models
+            if self.models is not None:
+                self.replaced_models.append(self.models)
+            self.models = models
+            self.fingerprints = fingerprints
+            self.reload_count += 1
+            logger.info('loaded models from %s (reload %d)', self.models_fp, self.reload_count)
+
+        if self.on_reload is not None:
+            self.on_reload(models)
+        return True
+
+    def dispose_replaced_models(self):
+        """
+        Dispose of the registries of the modules replaced by earlier reloads and
+        return how many there were. Objects of the old classes can not be used
+        afterwards, so call this only when no session uses them.
+        """
+        with self.lock:
+            replaced_models, self.replaced_models = self.replaced_models, []
+        for models in replaced_models:
+            dispose_models(models)
+        return len(replaced_models)
+
+    def write_models(self):
+        model_writer = self.model_writer_class(
+            self.db_uri,
+            engine=self.engine,
+            schema=self.schema,
+            cache_dir=self.cache_dir,
+            **self.model_writer_options)
+        model_writer.write_models(self.models_fp, incremental=True)
+
+    def load_models(self):
+        """Import models_fp as a new module and configure its mappers."""
+        spec = importlib.util.spec_from_file_location(self.module_name, self.models_fp)
+        models = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(models)
+
+        # only the new registry, mappers in use by other modules are left alone
+        configure_models(models)
+        return models
+
+    def start(self):
+        """Load the models now and then check for changes every interval seconds in a thread."""
+        if self.remove_cache_dir is not None and not self.remove_cache_dir.alive:
+            # restarted after stop() removed the temporary cache_dir
+            self.make_temporary_cache_dir()
+        self.check()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='orminator-schema-watcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop checking for changes and remove a temporary cache_dir."""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.remove_cache_dir is not None:
+            self.remove_cache_dir()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception('reloading models from %s failed, keeping the current models', self.models_fp)
+
+
+def dispose_models(models):
+    """Remove the mappers of the classes in a generated models module."""
+    model_base = getattr(models, 'Model', None)
+    if hasattr(model_base, 'registry'):
+        model_base.registry.dispose()
+    else:
+        # sqlalchemy before 1.4 has a single mapper registry shared with the new models
+        pass
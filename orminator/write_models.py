@@ -1,20 +1,204 @@
 import argparse
+import asyncio
+import logging
+import sys
 
-from orminator import ModelWriter
+import sqlalchemy as sa
 
+from orminator import ModelWriter, MultiSchemaModelWriter
+from orminator.loader_strategies import LoaderStrategyConfig
+from orminator.profiling import Profiler
+from orminator.scope import TableScope, UnknownRootError
 
-def get_args():
+
+def get_arg_parser():
     arg_parser = argparse.ArgumentParser()
     arg_parser.add_argument('-o', '--output-fp', required=True)
-    arg_parser.add_argument('-u', '--db-uri', required=True)
+    arg_parser.add_argument(
+        '-u', '--db-uri', required=True, action='append',
+        help='repeat to write one package for each database to the OUTPUT_FP directory')
+    arg_parser.add_argument(
+        '-s', '--schema', action='append', default=[],
+        help='read this schema on the --db-uri server instead of the database in the URI, '
+             'repeat to write one package for each schema to the OUTPUT_FP directory')
+    arg_parser.add_argument(
+        '-c', '--cache-dir', default=None,
+        help='cache the reflected schema in this directory between runs')
+    arg_parser.add_argument(
+        '-j', '--jobs', type=int, default=1,
+        help='read the schema with this many threads and database connections')
+    arg_parser.add_argument(
+        '-l', '--loader-config', default=None,
+        help='JSON file choosing the loader strategy (lazy=) for relationships')
+    arg_parser.add_argument(
+        '--strict-loading', action='store_true',
+        help='generate relationships with lazy="raise" unless configured otherwise')
+    arg_parser.add_argument(
+        '--async-safe', action='store_true',
+        help='generate lazy="raise_on_sql" instead of loader strategies that query '
+             'when an attribute is read, which can not be used under asyncio')
+    arg_parser.add_argument(
+        '-i', '--incremental', action='store_true',
+        help='generate only the classes for tables that changed since the last incremental run')
+    arg_parser.add_argument(
+        '-p', '--package', choices=('table', 'component'), default=None,
+        help='write a package to the OUTPUT_FP directory with one module per table '
+             'or per group of related tables, classes are imported on first access')
+    arg_parser.add_argument(
+        '-r', '--row-classes', action='store_true',
+        help='also write a Core Table and a read-only named tuple row class for each table')
+    arg_parser.add_argument(
+        '-m', '--manifest', default=None, metavar='MANIFEST_FP',
+        help='also write a JSON manifest of the classes for orminator.warmup to MANIFEST_FP')
+    arg_parser.add_argument(
+        '--lookup-methods', action='store_true',
+        help='also write get_by_<column> and get_many_by_<column> methods for indexed columns')
+    arg_parser.add_argument(
+        '--root', action='append', default=[], metavar='TABLE',
+        help='generate only this table and the tables related to it by foreign keys, can be repeated')
+    arg_parser.add_argument(
+        '--include', action='append', default=[], metavar='PATTERN',
+        help='also start from tables matching this wildcard pattern, can be repeated')
+    arg_parser.add_argument(
+        '--exclude', action='append', default=[], metavar='PATTERN',
+        help='never generate tables matching this wildcard pattern, can be repeated')
+    arg_parser.add_argument(
+        '--depth', type=int, default=None,
+        help='follow at most this many foreign keys from the --root and --include tables')
+    arg_parser.add_argument(
+        '--direction', choices=('out', 'in', 'both'), default='out',
+        help='follow foreign keys to the tables they refer to (out), '
+             'from the tables referring to them (in) or both')
+    arg_parser.add_argument(
+        '--profile', default=None, metavar='TRACE_FP',
+        help='count and time queries and code generation by phase, print a summary '
+             'and write a JSON trace to TRACE_FP')
+    arg_parser.add_argument(
+        '-v', '--verbose', action='count', default=0,
+        help='log progress, repeat for debugging output')
+    arg_parser.add_argument(
+        '--check', action='store_true',
+        help='do not write the output file, exit with status 1 if it is out of date')
+    return arg_parser
+
 
+def get_args(arg_parser):
     args = arg_parser.parse_args()
+    if args.package and args.incremental:
+        arg_parser.error('--incremental can not be used with --package')
+    if args.package and args.manifest:
+        arg_parser.error('--manifest can not be used with --package')
+    if len(args.db_uri) > 1 or len(args.schema) > 1:
+        if args.incremental:
+            arg_parser.error('--incremental can not be used with more than one database or schema')
+        if args.manifest:
+            arg_parser.error('--manifest can not be used with more than one database or schema')
+        if len(args.schema) > 0 and len(args.db_uri) > 1:
+            arg_parser.error('--schema can only be used with one --db-uri')
     return args
 
+async def get_async_model_writer(db_uri, **kwargs):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    async_engine = create_async_engine(db_uri)
+    try:
+        return await ModelWriter.from_async_engine(async_engine, **kwargs)
+    finally:
+        await async_engine.dispose()
+
+
 def main():
-    args = get_args()
+    arg_parser = get_arg_parser()
+    args = get_args(arg_parser)
+
+    if args.verbose >= 2:
+        logging.basicConfig(level=logging.DEBUG)
+    elif args.verbose == 1:
+        logging.basicConfig(level=logging.INFO)
+    else:
+        logging.basicConfig(level=logging.WARNING)
+
+    if args.root or args.include or args.exclude:
+        scope = TableScope(
+            roots=args.root,
+            include=args.include,
+            exclude=args.exclude,
+            depth=args.depth,
+            direction=args.direction)
+    else:
+        scope = None
+
+    if args.profile:
+        profiler = Profiler()
+    else:
+        profiler = None
+
+    if args.loader_config:
+        loader_strategies = LoaderStrategyConfig.from_file(args.loader_config)
+    else:
+        loader_strategies = LoaderStrategyConfig()
+    if args.strict_loading:
+        loader_strategies.strict = True
+    if args.async_safe:
+        loader_strategies.async_safe = True
+
+    model_writer_options = dict(
+        loader_strategies=loader_strategies,
+        row_classes=args.row_classes,
+        lookup_methods=args.lookup_methods,
+        profiler=profiler,
+        scope=scope)
+    if len(args.db_uri) > 1 or len(args.schema) > 1:
+        if len(args.schema) > 0:
+            targets = [(args.db_uri[0], schema) for schema in args.schema]
+        else:
+            targets = args.db_uri
+        multi_schema_model_writer = MultiSchemaModelWriter(
+            targets,
+            cache_dir=args.cache_dir,
+            workers=args.jobs,
+            **model_writer_options)
+        stale = multi_schema_model_writer.write_models_packages(
+            output_dir=args.output_fp,
+            split=args.package or 'component',
+            check=args.check)
+    else:
+        try:
+            if sa.engine.url.make_url(args.db_uri[0]).get_dialect().is_async:
+                # read the catalog concurrently with an async driver such as aiosqlite
+                model_writer = asyncio.run(get_async_model_writer(
+                    args.db_uri[0],
+                    cache_dir=args.cache_dir,
+                    workers=args.jobs,
+                    schema=args.schema[0] if args.schema else None,
+                    **model_writer_options))
+            else:
+                model_writer = ModelWriter(
+                    db_uri=args.db_uri[0],
+                    cache_dir=args.cache_dir,
+                    workers=args.jobs,
+                    schema=args.schema[0] if args.schema else None,
+                    **model_writer_options)
+        except UnknownRootError as e:
+            arg_parser.error('argument --root: {}'.format(e))
+        if args.package:
+            stale = model_writer.write_models_package(
+                output_dir=args.output_fp,
+                split=args.package,
+                check=args.check)
+        else:
+            stale = model_writer.write_models(
+                output_fp=args.output_fp,
+                incremental=args.incremental,
+                check=args.check,
+                manifest_fp=args.manifest)
+    if profiler is not None:
+        profiler.write_trace(args.profile)
+        print(profiler.get_report(), file=sys.stderr)
 
-    ModelWriter(db_uri=args.db_uri).write_models(output_fp=args.output_fp)
+    if args.check and stale:
+        print('{} is out of date'.format(args.output_fp))
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -79,6 +79,7 @@ setup(
     # for example:
     # $ pip install -e .[dev,test]
     extras_require={
+        'async': ['aiosqlite', 'greenlet'],
         'dev': [],
         'test': ['pytest'],
     },
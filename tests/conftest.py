@@ -0,0 +1,81 @@
+import importlib.util
+import re
+import sqlite3
+import sys
+
+import pytest
+
+from orminator import ModelWriter
+
+
+schema_sql = """\
+CREATE TABLE project (
+  project_id INTEGER PRIMARY KEY,
+  project_name VARCHAR(50));
+CREATE TABLE investigator (
+  investigator_id INTEGER PRIMARY KEY,
+  investigator_name VARCHAR(50));
+CREATE TABLE project_to_investigator (
+  project_to_investigator_id INTEGER PRIMARY KEY,
+  project_id INTEGER REFERENCES project(project_id),
+  investigator_id INTEGER REFERENCES investigator(investigator_id));
+CREATE TABLE sample (
+  sample_id INTEGER PRIMARY KEY,
+  project_id INTEGER REFERENCES project(project_id) ON DELETE CASCADE,
+  file VARCHAR(100),
+  type TEXT DEFAULT 'x');
+CREATE TABLE sample_attr (
+  sample_attr_id INTEGER PRIMARY KEY,
+  sample_id INTEGER REFERENCES sample(sample_id),
+  value TEXT);
+CREATE INDEX ix_sample_file ON sample(file);
+"""
+
+
+@pytest.fixture
+def db_fp(tmp_path):
+    """An SQLite database with projects, investigators, samples and sample attributes."""
+    db_fp = str(tmp_path / 'imicrobe.db')
+    connection = sqlite3.connect(db_fp)
+    connection.executescript(schema_sql)
+    connection.close()
+    return db_fp
+
+
+@pytest.fixture
+def db_uri(db_fp):
+    return 'sqlite:///' + db_fp
+
+
+
+class SQLiteModelWriter(ModelWriter):
+    """SQLite reports plain INTEGER types which ModelWriter does not translate."""
+    type_translations = {
+        **ModelWriter.type_translations,
+        re.compile(r'INTEGER'): r'sa.Integer'
+    }
+
+
+@pytest.fixture
+def model_writer_class():
+    """A ModelWriter generating code that imports for the test databases."""
+    return SQLiteModelWriter
+
+
+@pytest.fixture
+def import_models():
+    """Return a function importing a generated models file as a new module."""
+    module_names = []
+
+    def _import_models(models_fp):
+        module_name = 'orminator_test_models_{}'.format(len(module_names))
+        spec = importlib.util.spec_from_file_location(module_name, str(models_fp))
+        models = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = models
+        module_names.append(module_name)
+        spec.loader.exec_module(models)
+        return models
+
+    yield _import_models
+    for module_name in module_names:
+        sys.modules.pop(module_name).Model.registry.dispose()
@@ -0,0 +1,55 @@
+import asyncio
+import os
+import sqlite3
+
+import pytest
+
+from orminator import ModelWriter
+from orminator.catalog import CatalogSnapshot
+
+pytest.importorskip('aiosqlite')
+pytest.importorskip('greenlet')
+
+
+def get_models_code(model_writer, models_fp):
+    model_writer.write_models(str(models_fp))
+    return models_fp.read_text()
+
+
+async def get_async_model_writer(db_fp, **kwargs):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    async_engine = create_async_engine('sqlite+aiosqlite:///' + db_fp)
+    try:
+        return await ModelWriter.from_async_engine(async_engine, **kwargs)
+    finally:
+        await async_engine.dispose()
+
+
+def test_async_catalog_is_cached(db_fp, db_uri, tmp_path, monkeypatch):
+    read_table_names = []
+    from_async_engine = CatalogSnapshot.from_async_engine
+
+    async def recording_from_async_engine(async_engine, schema=None, only=None, workers=1):
+        read_table_names.append(only)
+        return await from_async_engine(async_engine, schema=schema, only=only, workers=workers)
+
+    monkeypatch.setattr(CatalogSnapshot, 'from_async_engine', recording_from_async_engine)
+
+    cache_dir = str(tmp_path / 'cache')
+    models_code = get_models_code(
+        asyncio.run(get_async_model_writer(db_fp, cache_dir=cache_dir, workers=2)),
+        tmp_path / 'async.py')
+    assert len(os.listdir(cache_dir)) == 1
+    assert models_code == get_models_code(ModelWriter(db_uri), tmp_path / 'sync.py')
+
+    connection = sqlite3.connect(db_fp)
+    connection.execute('ALTER TABLE sample_attr ADD COLUMN unit VARCHAR(10)')
+    connection.close()
+
+    models_code = get_models_code(
+        asyncio.run(get_async_model_writer(db_fp, cache_dir=cache_dir, workers=2)),
+        tmp_path / 'async.py')
+    assert 'unit' in models_code
+    assert read_table_names == [None, ['sample_attr']]
+    assert models_code == get_models_code(ModelWriter(db_uri), tmp_path / 'sync.py')
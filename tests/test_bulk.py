@@ -0,0 +1,108 @@
+import pytest
+import sqlalchemy as sa
+
+from orminator import bulk_insert, bulk_link, bulk_upsert
+
+
+Model = sa.orm.declarative_base()
+
+project_to_investigator = sa.Table(
+    'project_to_investigator',
+    Model.metadata,
+    sa.Column('project_id', sa.Integer, sa.ForeignKey('project.project_id'), primary_key=True),
+    sa.Column('investigator_id', sa.Integer, sa.ForeignKey('investigator.investigator_id'), primary_key=True))
+
+
+class Project(Model):
+    __tablename__ = 'project'
+
+    project_id = sa.Column('project_id', sa.Integer, primary_key=True)
+    project_name = sa.Column('project_name', sa.String(50))
+    investigator_list = sa.orm.relationship('Investigator', secondary=project_to_investigator)
+
+
+class Investigator(Model):
+    __tablename__ = 'investigator'
+
+    investigator_id = sa.Column('investigator_id', sa.Integer, primary_key=True)
+    investigator_name = sa.Column('investigator_name', sa.String(50))
+
+
+class Sample(Model):
+    __tablename__ = 'sample'
+
+    sample_id = sa.Column('sample_id', sa.Integer, primary_key=True)
+    file_ = sa.Column('file', sa.String(100))
+    type_ = sa.Column('type', sa.String(10), default='x')
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = sa.create_engine('sqlite:///' + str(tmp_path / 'bulk.db'))
+    Model.metadata.create_all(engine)
+    with sa.orm.Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def get_samples(session):
+    return [
+        (sample.sample_id, sample.file_, sample.type_)
+        for sample
+        in session.query(Sample).order_by(Sample.sample_id)]
+
+
+def test_bulk_insert_in_batches(session):
+    statements = []
+    sa.event.listen(
+        session.get_bind(), 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    rows = ({'sample_id': i, 'file_': 'sample_{}.fa'.format(i)} for i in range(25))
+    assert bulk_insert(session, Sample, rows, batch_size=10) == 25
+    assert len(statements) == 3
+    assert get_samples(session)[-1] == (24, 'sample_24.fa', 'x')
+
+
+def test_bulk_insert_column_names_and_instances(session):
+    rows = [{'sample_id': 1, 'file': 'a.fa'}, Sample(sample_id=2, file_='b.fa'), Sample(sample_id=3)]
+    assert bulk_insert(session, Sample, rows) == 3
+    assert get_samples(session) == [(1, 'a.fa', 'x'), (2, 'b.fa', 'x'), (3, None, 'x')]
+
+
+def test_bulk_upsert_inserts_and_updates(session):
+    bulk_insert(session, Sample, [{'sample_id': i, 'file_': 'old_{}.fa'.format(i)} for i in range(3)])
+    session.commit()
+
+    rows = [{'sample_id': i, 'file_': 'new_{}.fa'.format(i)} for i in range(1, 5)]
+    assert bulk_upsert(session, Sample, rows, batch_size=2) == 4
+    session.commit()
+    assert get_samples(session) == [
+        (0, 'old_0.fa', 'x'),
+        (1, 'new_1.fa', 'x'),
+        (2, 'new_2.fa', 'x'),
+        (3, 'new_3.fa', 'x'),
+        (4, 'new_4.fa', 'x')]
+
+
+def test_bulk_upsert_update_columns(session):
+    bulk_insert(session, Sample, [{'sample_id': 1, 'file_': 'a.fa', 'type_': 'y'}])
+
+    bulk_upsert(session, Sample, [{'sample_id': 1, 'file_': 'b.fa', 'type_': 'z'}], update_columns=['type'])
+    assert get_samples(session) == [(1, 'a.fa', 'z')]
+
+    # only the primary key given, nothing to update
+    bulk_upsert(session, Sample, [{'sample_id': 1}, {'sample_id': 2}])
+    assert get_samples(session) == [(1, 'a.fa', 'z'), (2, None, 'x')]
+
+
+def test_bulk_link(session):
+    bulk_insert(session, Project, [{'project_id': 1}, {'project_id': 2}])
+    bulk_insert(session, Investigator, [{'investigator_id': i} for i in range(1, 4)])
+
+    assert bulk_link(session, Project.investigator_list, [(1, 1), (1, 2), (2, 3)]) == 3
+    session.commit()
+    project = session.get(Project, 1)
+    assert sorted(i.investigator_id for i in project.investigator_list) == [1, 2]
+
+    with pytest.raises(ValueError):
+        bulk_link(session, Project.project_name, [(1, 1)])
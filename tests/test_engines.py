@@ -0,0 +1,78 @@
+import threading
+
+import sqlalchemy as sa
+
+from orminator import engine_registry, session_manager, session_manager_from_db_uri
+from orminator.engines import EngineRegistry
+
+
+def test_same_uri_and_options_share_an_engine(db_uri):
+    registry = EngineRegistry()
+    try:
+        engine = registry.get_engine(db_uri)
+        assert registry.get_engine(db_uri) is engine
+        assert registry.get_session_class(db_uri) is registry.get_session_class(db_uri)
+        assert registry.get_session_class(db_uri).kw['bind'] is engine
+
+        other_engine = registry.get_engine(db_uri, pool_size=2)
+        assert other_engine is not engine
+        assert registry.get_engine(db_uri, pool_size=2) is other_engine
+    finally:
+        registry.dispose()
+
+
+def test_default_options_are_part_of_the_key(db_uri):
+    registry = EngineRegistry(pool_size=3)
+    try:
+        assert registry.get_engine(db_uri) is registry.get_engine(db_uri, pool_size=3)
+        assert registry.get_engine(db_uri).pool.size() == 3
+    finally:
+        registry.dispose()
+
+
+def test_session_managers_share_an_engine(db_uri):
+    try:
+        with session_manager_from_db_uri(db_uri) as session:
+            engine = session.get_bind()
+        with session_manager(db_uri) as session:
+            assert session.get_bind() is engine
+        with session_manager_from_db_uri(db_uri, echo=True) as session:
+            assert session.get_bind() is not engine
+    finally:
+        engine_registry.dispose()
+
+
+def test_engines_are_shared_between_threads(db_uri):
+    registry = EngineRegistry()
+    engines = []
+
+    def get_engine():
+        engines.append(registry.get_engine(db_uri))
+
+    try:
+        threads = [threading.Thread(target=get_engine) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(set(map(id, engines))) == 1
+    finally:
+        registry.dispose()
+
+
+def test_statistics_for_each_engine(db_uri):
+    registry = EngineRegistry()
+    try:
+        for options in ({}, {'pool_size': 2}):
+            engine = registry.get_engine(db_uri, **options)
+            with engine.connect() as connection:
+                connection.execute(sa.text('SELECT 1'))
+
+        statistics = sorted(registry.get_statistics(), key=lambda s: len(s[1]))
+        assert [options for _, options, _ in statistics] == [{}, {'pool_size': 2}]
+        for url, _, pool_statistics in statistics:
+            assert url == repr(sa.engine.url.make_url(db_uri))
+            assert pool_statistics['checkouts'] == 1
+            assert pool_statistics['checked_out'] == 0
+    finally:
+        registry.dispose()
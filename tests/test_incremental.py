@@ -0,0 +1,53 @@
+import sqlite3
+
+from orminator import ModelWriter
+from orminator.loader_strategies import LoaderStrategyConfig
+
+
+def strip_incremental_comments(models_code):
+    return ''.join(
+        line
+        for line
+        in models_code.splitlines(keepends=True)
+        if not line.startswith('# orminator '))
+
+
+def read(fp):
+    with open(fp, 'rt') as f:
+        return f.read()
+
+
+def test_incremental_output_matches_full_output(db_uri, tmp_path):
+    full_fp = str(tmp_path / 'full.py')
+    incremental_fp = str(tmp_path / 'incremental.py')
+    ModelWriter(db_uri).write_models(full_fp)
+    ModelWriter(db_uri).write_models(incremental_fp, incremental=True)
+
+    assert strip_incremental_comments(read(incremental_fp)) == read(full_fp)
+
+
+def test_incremental_output_matches_full_output_after_a_change(db_fp, db_uri, tmp_path):
+    full_fp = str(tmp_path / 'full.py')
+    incremental_fp = str(tmp_path / 'incremental.py')
+    ModelWriter(db_uri).write_models(incremental_fp, incremental=True)
+
+    connection = sqlite3.connect(db_fp)
+    connection.execute('ALTER TABLE sample_attr ADD COLUMN unit VARCHAR(10)')
+    connection.close()
+
+    assert ModelWriter(db_uri).write_models(incremental_fp, incremental=True, check=True)
+    assert ModelWriter(db_uri).write_models(incremental_fp, incremental=True)
+    ModelWriter(db_uri).write_models(full_fp)
+    assert strip_incremental_comments(read(incremental_fp)) == read(full_fp)
+    assert not ModelWriter(db_uri).write_models(incremental_fp, incremental=True, check=True)
+
+
+def test_changed_settings_generate_every_class(db_uri, tmp_path):
+    incremental_fp = str(tmp_path / 'incremental.py')
+    ModelWriter(db_uri).write_models(incremental_fp, incremental=True)
+    assert 'lazy="raise"' not in read(incremental_fp)
+
+    strict_model_writer = ModelWriter(db_uri, loader_strategies=LoaderStrategyConfig(strict=True))
+    assert strict_model_writer.write_models(incremental_fp, incremental=True, check=True)
+    assert strict_model_writer.write_models(incremental_fp, incremental=True)
+    assert read(incremental_fp).count('lazy="raise"') == 6
@@ -0,0 +1,145 @@
+import sqlite3
+
+import pytest
+import sqlalchemy as sa
+
+from orminator.loader_strategies import LoaderStrategyConfig
+
+
+project_count = 3
+samples_per_project = 2
+attrs_per_sample = 2
+
+
+def add_projects(db_fp, first_project_id, project_count):
+    """Add project_count projects with an investigator, samples and sample attributes each."""
+    connection = sqlite3.connect(db_fp)
+    for p in range(first_project_id, first_project_id + project_count):
+        connection.execute('INSERT INTO project VALUES (?, ?)', (p, 'project {}'.format(p)))
+        connection.execute('INSERT INTO investigator VALUES (?, ?)', (p, 'investigator {}'.format(p)))
+        connection.execute('INSERT INTO project_to_investigator VALUES (?, ?, ?)', (p, p, p))
+        for s in range(samples_per_project):
+            sample_id = p * samples_per_project + s
+            connection.execute(
+                'INSERT INTO sample (sample_id, project_id, file) VALUES (?, ?, ?)',
+                (sample_id, p, 'sample_{}.fa'.format(s)))
+            for a in range(attrs_per_sample):
+                connection.execute(
+                    'INSERT INTO sample_attr VALUES (?, ?, ?)',
+                    (sample_id * attrs_per_sample + a, sample_id, 'attr {}'.format(a)))
+    connection.commit()
+    connection.close()
+
+
+@pytest.fixture
+def engine(db_fp, db_uri):
+    add_projects(db_fp, 0, project_count)
+    engine = sa.create_engine(db_uri)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def get_models(db_uri, model_writer_class, import_models, tmp_path):
+    def _get_models(loader_strategies):
+        models_fp = str(tmp_path / 'models_{}.py'.format(id(loader_strategies)))
+        model_writer_class(db_uri, loader_strategies=loader_strategies).write_models(models_fp)
+        return import_models(models_fp)
+    return _get_models
+
+
+def traverse(session, models):
+    lines = []
+    for project in session.query(models.Project).all():
+        lines.append(project.project_name)
+        lines.extend(i.investigator_name for i in project.investigator_list)
+        for sample in project.sample_list:
+            lines.append(sample.file_)
+            lines.extend(a.value for a in sample.sample_attr_list)
+    return lines
+
+
+def count_statements(engine, f):
+    """Return the result of f(session) and the number of SQL statements it emitted."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sa.event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        with sa.orm.Session(bind=engine) as session:
+            result = f(session)
+    finally:
+        sa.event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return result, len(statements)
+
+
+def test_default_loads_relationships_when_read(engine, get_models):
+    models = get_models(LoaderStrategyConfig())
+
+    lines, statement_count = count_statements(engine, lambda session: traverse(session, models))
+    assert len(lines) == project_count * (2 + samples_per_project * (1 + attrs_per_sample))
+    # the projects, then the investigators and samples of each project
+    # and the attributes of each sample
+    assert statement_count == 1 + project_count * (2 + samples_per_project)
+
+
+def test_default_get_loads_one_row(engine, get_models):
+    models = get_models(LoaderStrategyConfig())
+
+    identity_map_size, statement_count = count_statements(
+        engine, lambda session: (session.get(models.Project, 1), len(session.identity_map))[1])
+    assert identity_map_size == 1
+    assert statement_count == 1
+
+
+def test_eager_strategies_do_not_query_for_each_object(engine, get_models, db_fp):
+    models = get_models(LoaderStrategyConfig(one_to_many='selectin', many_to_many='selectin', many_to_one='joined'))
+
+    lines, statement_count = count_statements(engine, lambda session: traverse(session, models))
+    assert len(lines) == project_count * (2 + samples_per_project * (1 + attrs_per_sample))
+    assert statement_count == 6
+
+    # the number of statements does not depend on the number of objects
+    add_projects(db_fp, project_count, 10 * project_count)
+    lines, statement_count = count_statements(engine, lambda session: traverse(session, models))
+    assert len(lines) == 11 * project_count * (2 + samples_per_project * (1 + attrs_per_sample))
+    assert statement_count == 6
+
+
+def test_max_eager_collection_size(engine, get_models, db_fp):
+    connection = sqlite3.connect(db_fp)
+    connection.execute('ANALYZE')
+    connection.close()
+    models = get_models(LoaderStrategyConfig(
+        one_to_many='selectin',
+        many_to_many='selectin',
+        many_to_one='joined',
+        max_eager_collection_size=1))
+
+    # samples and sample attributes average 2 per parent so they are loaded lazily
+    assert models.Project.sample_list.property.lazy == 'select'
+    assert models.Sample.sample_attr_list.property.lazy == 'select'
+    assert models.Project.investigator_list.property.lazy == 'selectin'
+
+    # the projects and their investigators, then the samples of each project
+    # and the attributes of each sample
+    _, statement_count = count_statements(engine, lambda session: traverse(session, models))
+    assert statement_count == 2 + project_count * (1 + samples_per_project)
+
+
+def test_strict_loading_raises(engine, get_models):
+    models = get_models(LoaderStrategyConfig(strict=True))
+
+    with pytest.raises(sa.exc.InvalidRequestError):
+        count_statements(engine, lambda session: traverse(session, models))
+
+    def traverse_with_options(session):
+        projects = session.query(models.Project).options(
+            sa.orm.selectinload(models.Project.sample_list).selectinload(models.Sample.sample_attr_list)).all()
+        return [a.value for project in projects for sample in project.sample_list for a in sample.sample_attr_list]
+
+    values, statement_count = count_statements(engine, traverse_with_options)
+    assert len(values) == project_count * samples_per_project * attrs_per_sample
+    assert statement_count == 3
@@ -0,0 +1,37 @@
+import sqlite3
+
+import sqlalchemy as sa
+
+
+def test_lookup_methods_are_not_written_by_default(db_uri, model_writer_class, tmp_path):
+    models_fp = str(tmp_path / 'models.py')
+    model_writer_class(db_uri).write_models(models_fp)
+    with open(models_fp, 'rt') as models_file:
+        models_code = models_file.read()
+    assert 'get_by_' not in models_code
+    assert 'def lookup(' not in models_code
+
+
+def test_lookup_methods(db_fp, db_uri, model_writer_class, import_models, tmp_path):
+    connection = sqlite3.connect(db_fp)
+    connection.executemany(
+        'INSERT INTO sample (sample_id, file) VALUES (?, ?)',
+        [(i, 'sample_{}.fa'.format(i % 3)) for i in range(10)])
+    connection.commit()
+    connection.close()
+
+    models_fp = str(tmp_path / 'models.py')
+    model_writer_class(db_uri, lookup_methods=True).write_models(models_fp)
+    models = import_models(models_fp)
+
+    engine = sa.create_engine(db_uri)
+    with sa.orm.Session(engine) as session:
+        # the primary key is unique
+        assert models.Sample.get_by_sample_id(session, 4).sample_id == 4
+        assert models.Sample.get_by_sample_id(session, 100) is None
+        # file has a non-unique index
+        assert sorted(s.sample_id for s in models.Sample.get_by_file(session, 'sample_1.fa')) == [1, 4, 7]
+        samples = models.Sample.get_many_by_sample_id(session, range(0, 10, 2), batch_size=2)
+        assert sorted(s.sample_id for s in samples) == [0, 2, 4, 6, 8]
+        assert not hasattr(models.Sample, 'get_by_type')
+    engine.dispose()
@@ -0,0 +1,29 @@
+import sqlalchemy as sa
+
+from orminator import MultiSchemaModelWriter
+from orminator.catalog import CatalogSnapshot
+
+
+def test_foreign_keys_to_another_schema_are_left_out(db_uri, model_writer_class, tmp_path, monkeypatch):
+    imicrobe_catalog = CatalogSnapshot.from_engine(sa.create_engine(db_uri))
+    imicrobe_catalog.foreign_keys['sample'].append({
+        'name': 'sample_cruise_fk',
+        'constrained_columns': ['type'],
+        'referred_schema': 'muscope2',
+        'referred_table': 'project',
+        'referred_columns': ['project_id'],
+        'options': {}})
+    muscope2_catalog = CatalogSnapshot.from_engine(sa.create_engine(db_uri)).get_subset(['project'])
+    # SQLite has no foreign keys between databases
+    monkeypatch.setattr(
+        MultiSchemaModelWriter,
+        'read_catalogs',
+        lambda self, cache_dir: [imicrobe_catalog, muscope2_catalog])
+
+    MultiSchemaModelWriter(
+        [(db_uri, 'imicrobe'), (db_uri, 'muscope2')],
+        model_writer_class=model_writer_class).write_models_packages(str(tmp_path / 'models'))
+
+    models_code = ''.join(fp.read_text() for fp in (tmp_path / 'models').glob('**/*.py'))
+    assert 'muscope2.project' not in models_code
+    assert "'project.project_id'" in models_code
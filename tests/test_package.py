@@ -0,0 +1,59 @@
+import sys
+
+import pytest
+import sqlalchemy as sa
+
+
+@pytest.fixture
+def import_package(tmp_path):
+    """Import packages written to tmp_path and forget them afterwards."""
+    sys.path.insert(0, str(tmp_path))
+    package_names = []
+
+    def _import_package(package_name):
+        package_names.append(package_name)
+        return __import__(package_name)
+
+    yield _import_package
+    sys.path.remove(str(tmp_path))
+    for package_name in package_names:
+        registry = sys.modules[package_name + '.base'].Model.registry
+        for module_name in [m for m in sys.modules if m == package_name or m.startswith(package_name + '.')]:
+            del sys.modules[module_name]
+        registry.dispose()
+
+
+def get_imported_module_names(package_name):
+    return sorted(m.split('.')[1] for m in sys.modules if m.startswith(package_name + '.'))
+
+
+@pytest.mark.parametrize('split', ['table', 'component'])
+def test_package_matches_tables(split, db_uri, model_writer_class, tmp_path, import_package):
+    package_name = 'models_{}'.format(split)
+    model_writer_class(db_uri).write_models_package(str(tmp_path / package_name), split=split)
+    models = import_package(package_name)
+
+    assert sorted(models.__all__) == [
+        'Investigator', 'Model', 'Project', 'Project_to_investigator', 'Sample', 'Sample_attr']
+    assert models.Sample.__tablename__ == 'sample'
+
+
+def test_classes_are_imported_on_first_access(db_uri, model_writer_class, tmp_path, import_package):
+    model_writer_class(db_uri).write_models_package(str(tmp_path / 'models_lazy'), split='table')
+    models = import_package('models_lazy')
+    assert get_imported_module_names('models_lazy') == []
+
+    Sample_attr = models.Sample_attr
+    assert get_imported_module_names('models_lazy') == ['base', 'sample_attr']
+
+    # configuring the mappers imports the classes relationships refer to
+    sa.orm.configure_mappers()
+    assert Sample_attr.sample.property.mapper.class_.__name__ == 'Sample'
+    assert get_imported_module_names('models_lazy') == [
+        'base', 'investigator', 'project', 'project_to_investigator', 'sample', 'sample_attr']
+
+
+def test_package_is_not_rewritten(db_uri, model_writer_class, tmp_path):
+    model_writer = model_writer_class(db_uri)
+    assert model_writer.write_models_package(str(tmp_path / 'models_check'), split='table')
+    assert not model_writer.write_models_package(str(tmp_path / 'models_check'), split='table', check=True)
@@ -0,0 +1,155 @@
+import pytest
+import sqlalchemy as sa
+
+from orminator import ReplicaRouter
+from orminator.engines import EngineRegistry
+
+
+Model = sa.orm.declarative_base()
+
+
+class Sample(Model):
+    __tablename__ = 'sample'
+
+    sample_id = sa.Column('sample_id', sa.Integer, primary_key=True)
+    file_ = sa.Column('file', sa.String(100))
+
+
+@pytest.fixture
+def db_uris(tmp_path):
+    """The primary and two replicas, each with one sample named after the database."""
+    db_uris = {}
+    for name in ('primary', 'replica1', 'replica2'):
+        db_uris[name] = 'sqlite:///' + str(tmp_path / '{}.db'.format(name))
+        engine = sa.create_engine(db_uris[name])
+        Model.metadata.create_all(engine)
+        with sa.orm.Session(engine) as session:
+            session.add(Sample(sample_id=1, file_=name))
+            session.commit()
+        engine.dispose()
+    return db_uris
+
+
+@pytest.fixture
+def registry():
+    registry = EngineRegistry()
+    yield registry
+    registry.dispose()
+
+
+def get_router(db_uris, registry, **kwargs):
+    return ReplicaRouter(db_uris['primary'], [db_uris['replica1'], db_uris['replica2']], registry=registry, **kwargs)
+
+
+def read_database_name(session):
+    return session.execute(sa.select(Sample.file_).where(Sample.sample_id == 1)).scalar_one()
+
+
+def test_reads_go_to_the_replicas_round_robin(db_uris, registry):
+    Session = get_router(db_uris, registry).get_session_class()
+    database_names = []
+    for _ in range(4):
+        with Session() as session:
+            # one replica for the whole transaction
+            database_names.append(read_database_name(session))
+            assert read_database_name(session) == database_names[-1]
+
+    assert database_names == ['replica1', 'replica2', 'replica1', 'replica2']
+
+
+def test_transaction_stays_on_the_primary_after_a_flush(db_uris, registry):
+    Session = get_router(db_uris, registry).get_session_class()
+    with Session() as session:
+        session.add(Sample(sample_id=2, file_='new'))
+        session.flush()
+        assert read_database_name(session) == 'primary'
+        assert session.get(Sample, 2).file_ == 'new'
+        session.commit()
+
+        # a new transaction reads from a replica again
+        assert read_database_name(session) == 'replica1'
+
+    with sa.create_engine(db_uris['primary']).connect() as connection:
+        assert connection.execute(sa.text('SELECT count(*) FROM sample')).scalar() == 2
+
+
+@pytest.mark.parametrize(
+    'get_statement',
+    [
+        lambda: sa.select(Sample.file_).where(Sample.sample_id == 1).with_for_update(),
+        lambda: sa.text('SELECT file FROM sample WHERE sample_id = 1'),
+    ])
+def test_locking_and_text_statements_go_to_the_primary(db_uris, registry, get_statement):
+    Session = get_router(db_uris, registry).get_session_class()
+    with Session() as session:
+        assert session.execute(get_statement()).scalar_one() == 'primary'
+        assert read_database_name(session) == 'primary'
+
+
+def test_updates_go_to_the_primary(db_uris, registry):
+    Session = get_router(db_uris, registry).get_session_class()
+    with Session() as session:
+        session.execute(sa.update(Sample).where(Sample.sample_id == 1).values(file_='updated'))
+        assert read_database_name(session) == 'updated'
+        session.commit()
+
+    with Session() as session:
+        assert read_database_name(session) == 'replica1'
+
+
+def test_sticky_reads_after_a_write(db_uris, registry):
+    router = get_router(db_uris, registry, sticky_seconds=60.0)
+    with router.get_session_class(sticky_key='user 1')() as session:
+        session.add(Sample(sample_id=2, file_='new'))
+        session.commit()
+
+    with router.get_session_class(sticky_key='user 1')() as session:
+        assert read_database_name(session) == 'primary'
+    with router.get_session_class(sticky_key='user 2')() as session:
+        assert read_database_name(session) == 'replica1'
+
+
+def test_reads_without_writes_are_not_sticky(db_uris, registry):
+    router = get_router(db_uris, registry, sticky_seconds=60.0)
+    with router.get_session_class()() as session:
+        read_database_name(session)
+        session.commit()
+
+    with router.get_session_class()() as session:
+        assert read_database_name(session) == 'replica2'
+
+
+def test_ejected_replicas_get_no_reads(db_uris, registry):
+    router = get_router(db_uris, registry)
+    Session = router.get_session_class()
+    router.eject(router.replicas[0])
+    for _ in range(2):
+        with Session() as session:
+            assert read_database_name(session) == 'replica2'
+
+    router.eject(router.replicas[1])
+    with Session() as session:
+        assert read_database_name(session) == 'primary'
+
+    router.restore(router.replicas[0])
+    with Session() as session:
+        assert read_database_name(session) == 'replica1'
+
+
+def test_failed_health_check_ejects_the_replica(db_uris, registry, tmp_path):
+    missing_replica_uri = 'sqlite:///' + str(tmp_path / 'missing' / 'replica.db')
+    router = ReplicaRouter(db_uris['primary'], [db_uris['replica1'], missing_replica_uri], registry=registry)
+
+    replica_url_to_health = router.check_health()
+    assert list(replica_url_to_health.values()) == [True, False]
+    assert not router.is_ejected(router.replicas[0])
+    assert router.is_ejected(router.replicas[1])
+
+
+def test_least_connections(db_uris, registry):
+    router = get_router(db_uris, registry, balancing='least_connections')
+    Session = router.get_session_class()
+    with router.replicas[0].connect():
+        for _ in range(2):
+            with Session() as session:
+                assert read_database_name(session) == 'replica2'
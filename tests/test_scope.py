@@ -0,0 +1,136 @@
+import pytest
+import sqlalchemy as sa
+
+from orminator import write_models
+from orminator.scope import TableScope, UnknownRootError, get_foreign_key_edges
+
+
+table_names = [
+    'cruise',
+    'investigator',
+    'project',
+    'project_to_investigator',
+    'project_to_tag',
+    'sample',
+    'sample_attr',
+    'sample_attr_type',
+    'sample_log',
+    'ship',
+    'tag',
+    'user',
+]
+
+edges = {
+    ('cruise', 'ship'),
+    ('project_to_investigator', 'project'),
+    ('project_to_investigator', 'investigator'),
+    ('project_to_tag', 'project'),
+    ('project_to_tag', 'tag'),
+    ('project_to_tag', 'user'),
+    ('sample', 'cruise'),
+    ('sample', 'project'),
+    ('sample_attr', 'sample'),
+    ('sample_attr', 'sample_attr_type'),
+    ('sample_log', 'sample'),
+}
+
+
+def select(**kwargs):
+    return TableScope(**kwargs).select_table_names(table_names, edges)
+
+
+def test_no_roots_selects_every_table_not_excluded():
+    assert select() == table_names
+    assert select(exclude=['*_log', 'project_to_*']) == [
+        'cruise', 'investigator', 'project', 'sample', 'sample_attr', 'sample_attr_type', 'ship', 'tag', 'user']
+
+
+@pytest.mark.parametrize(
+    'depth, expected_table_names',
+    [
+        (None, ['cruise', 'project', 'sample', 'ship']),
+        (0, ['sample']),
+        (1, ['cruise', 'project', 'sample']),
+        (2, ['cruise', 'project', 'sample', 'ship']),
+    ])
+def test_depth(depth, expected_table_names):
+    assert select(roots=['sample'], depth=depth) == expected_table_names
+
+
+def test_direction_in():
+    assert select(roots=['sample'], direction='in') == ['sample', 'sample_attr', 'sample_log']
+
+
+def test_direction_both():
+    assert select(roots=['sample'], direction='both', depth=1) == [
+        'cruise', 'project', 'sample', 'sample_attr', 'sample_log']
+    assert select(roots=['sample_attr_type'], direction='both', depth=2) == [
+        'sample', 'sample_attr', 'sample_attr_type']
+
+
+def test_depth_counts_from_the_nearest_start_table():
+    assert select(roots=['sample', 'ship'], direction='in', depth=1) == [
+        'cruise', 'sample', 'sample_attr', 'sample_log', 'ship']
+
+
+def test_excluded_tables_block_traversal():
+    assert select(roots=['sample_attr'], exclude=['sample']) == ['sample_attr', 'sample_attr_type']
+    assert select(roots=['sample_log'], exclude=['*_log']) == []
+
+
+def test_include_patterns():
+    assert select(include=['sample*'], depth=0) == ['sample', 'sample_attr', 'sample_attr_type', 'sample_log']
+    assert select(include=['sample_attr*'], exclude=['*_type'], depth=1) == ['sample', 'sample_attr']
+
+
+def test_association_tables_need_both_sides_and_every_referred_table():
+    assert select(roots=['project', 'investigator'], depth=0) == [
+        'investigator', 'project', 'project_to_investigator']
+    # project_to_tag also refers to user
+    assert select(roots=['project', 'tag'], depth=0) == ['project', 'tag']
+    assert select(roots=['project', 'tag', 'user'], depth=0) == ['project', 'project_to_tag', 'tag', 'user']
+
+
+def test_association_tables_can_be_left_out():
+    assert select(roots=['project', 'investigator'], depth=0, association_tables=False) == [
+        'investigator', 'project']
+    assert select(roots=['project', 'investigator'], depth=0, exclude=['*_to_*']) == [
+        'investigator', 'project']
+
+
+def test_invalid_direction():
+    with pytest.raises(ValueError):
+        TableScope(roots=['sample'], direction='up')
+
+
+def test_unknown_root_raises():
+    with pytest.raises(UnknownRootError):
+        TableScope(roots=['nosuch']).select_table_names(['project', 'sample'], [])
+
+
+def test_unknown_roots_can_be_ignored():
+    scope = TableScope(roots=['sample', 'nosuch'], depth=0)
+    assert scope.select_table_names(table_names, edges, ignore_unknown_roots=True) == ['sample']
+
+
+@pytest.mark.parametrize('schema', [None, 'main'])
+def test_get_foreign_key_edges(db_uri, schema):
+    # schema=None reads pragma_foreign_key_list, a schema uses the Inspector
+    assert get_foreign_key_edges(sa.create_engine(db_uri), schema=schema) == (
+        ['investigator', 'project', 'project_to_investigator', 'sample', 'sample_attr'],
+        {
+            ('project_to_investigator', 'investigator'),
+            ('project_to_investigator', 'project'),
+            ('sample', 'project'),
+            ('sample_attr', 'sample'),
+        })
+
+
+def test_unknown_root_is_a_usage_error(db_uri, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr('sys.argv', [
+        'write_models.py', '-o', str(tmp_path / 'models.py'), '-u', db_uri, '--root', 'nosuch'])
+    with pytest.raises(SystemExit) as e:
+        write_models.main()
+    assert e.value.code == 2
+    assert 'unknown root table(s): nosuch' in capsys.readouterr().err
+    assert not (tmp_path / 'models.py').exists()
@@ -0,0 +1,102 @@
+import pytest
+import sqlalchemy as sa
+
+from orminator import keyset_chunks, keyset_results, process_in_chunks, stream_chunks, stream_results
+
+
+Model = sa.orm.declarative_base()
+
+
+class Sample(Model):
+    __tablename__ = 'sample'
+
+    sample_id = sa.Column('sample_id', sa.Integer, primary_key=True)
+    project_id = sa.Column('project_id', sa.Integer)
+
+
+class Sample_attr(Model):
+    __tablename__ = 'sample_attr'
+
+    # a composite primary key
+    sample_id = sa.Column('sample_id', sa.Integer, primary_key=True)
+    attr_name = sa.Column('attr_name', sa.String(20), primary_key=True)
+    value = sa.Column('value', sa.Text)
+
+
+sample_count = 25
+attr_names = ['depth', 'latitude', 'longitude', 'temperature']
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = sa.create_engine('sqlite:///' + str(tmp_path / 'streaming.db'))
+    Model.metadata.create_all(engine)
+    with engine.begin() as connection:
+        # inserted out of order so the results are sorted by the queries
+        connection.execute(
+            Sample.__table__.insert(),
+            [{'sample_id': i, 'project_id': i % 3} for i in reversed(range(sample_count))])
+        connection.execute(
+            Sample_attr.__table__.insert(),
+            [
+                {'sample_id': i, 'attr_name': attr_name, 'value': '{}'.format(i)}
+                for attr_name in reversed(attr_names)
+                for i in range(sample_count)])
+    with sa.orm.Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 25, 100])
+def test_keyset_chunks(session, chunk_size):
+    chunks = list(keyset_chunks(session, Sample, chunk_size=chunk_size))
+    assert [len(chunk) for chunk in chunks[:-1]] == [chunk_size] * (len(chunks) - 1)
+    assert [s.sample_id for chunk in chunks for s in chunk] == list(range(sample_count))
+    # every chunk was expunged once the next one was read
+    assert len(session.identity_map) == 0
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 4, 10, 1000])
+def test_keyset_results_with_a_composite_primary_key(session, chunk_size):
+    keys = [(a.sample_id, a.attr_name) for a in keyset_results(session, Sample_attr, chunk_size=chunk_size)]
+    assert keys == sorted((i, attr_name) for i in range(sample_count) for attr_name in attr_names)
+
+
+def test_keyset_results_with_criteria(session):
+    samples = keyset_results(session, Sample, chunk_size=2, criteria=[Sample.project_id == 1])
+    assert [s.sample_id for s in samples] == [i for i in range(sample_count) if i % 3 == 1]
+
+    attrs = keyset_results(session, Sample_attr, chunk_size=3, criteria=[Sample_attr.attr_name == 'depth'])
+    assert [a.sample_id for a in attrs] == list(range(sample_count))
+
+
+def test_keyset_chunks_one_query_per_chunk(session):
+    statements = []
+    sa.event.listen(session.get_bind(), 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    assert len(list(keyset_chunks(session, Sample, chunk_size=10))) == 3
+    # the last chunk is short so no query is needed to find the end
+    assert len(statements) == 3
+
+    del statements[:]
+    assert len(list(keyset_chunks(session, Sample, chunk_size=5))) == 5
+    assert len(statements) == 6
+
+
+def test_stream_results(session):
+    chunks = list(stream_chunks(session, sa.select(Sample).order_by(Sample.sample_id), chunk_size=10))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    assert len(session.identity_map) == 0
+
+    samples = stream_results(session, session.query(Sample).order_by(Sample.sample_id), chunk_size=10)
+    assert [s.sample_id for s in samples] == list(range(sample_count))
+
+
+def test_process_in_chunks(session):
+    chunk_sizes = []
+    assert process_in_chunks(session, Sample_attr, lambda chunk: chunk_sizes.append(len(chunk)), chunk_size=40) == 100
+    assert chunk_sizes == [40, 40, 20]
+
+    chunk_sizes = []
+    query = session.query(Sample).filter(Sample.project_id == 0)
+    assert process_in_chunks(session, query, lambda chunk: chunk_sizes.append(len(chunk)), chunk_size=4) == 9
+    assert chunk_sizes == [4, 4, 1]
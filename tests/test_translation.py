@@ -0,0 +1,61 @@
+import re
+
+from orminator import ModelWriter
+from orminator.translation import Translator
+
+
+def test_first_full_match_wins():
+    translator = Translator([
+        (re.compile(r'DOUBLE UNSIGNED'), r'sa.Float'),
+        (re.compile(r'DOUBLE'), r'sa.Float()'),
+        (re.compile(r'VARCHAR\((\d+)\)'), r'sa.String(length=\1)')])
+    assert translator.translate('DOUBLE') == 'sa.Float()'
+    assert translator.translate('DOUBLE UNSIGNED') == 'sa.Float'
+    assert translator.translate('VARCHAR(32)') == 'sa.String(length=32)'
+    assert translator.translate('VARCHAR(32) BINARY') == 'VARCHAR(32) BINARY'
+
+
+def test_pattern_flags_are_kept():
+    translator = Translator([
+        (re.compile(r'varchar\((\d+)\)', re.IGNORECASE), r'sa.String(length=\1)'),
+        (re.compile(r'''
+            text  # any text type
+            ''', re.VERBOSE), r'sa.Text'),
+        (re.compile(r'blob'), r'sa.LargeBinary')])
+    assert translator.pattern is not None
+    assert translator.translate('VARCHAR(32)') == 'sa.String(length=32)'
+    assert translator.translate('text') == 'sa.Text'
+    # flags do not leak into the other patterns
+    assert translator.translate('BLOB') == 'BLOB'
+
+
+def test_patterns_with_group_references_are_tried_one_at_a_time():
+    translator = Translator([
+        (re.compile(r'(?P<name>\w+)_(?P=name)'), r'\g<name>'),
+        (re.compile(r'(\w)\1'), r'double_\1'),
+        (re.compile(r'(?P<name>\w+)_id'), r'\g<name>_key')])
+    assert translator.pattern is None
+    assert translator.translate('sample_sample') == 'sample'
+    assert translator.translate('xx') == 'double_x'
+    assert translator.translate('sample_id') == 'sample_key'
+    assert translator.translate('sample') == 'sample'
+
+
+def test_model_writer_subclass_translations():
+    class CaseInsensitiveModelWriter(ModelWriter):
+        name_translations = {
+            **ModelWriter.name_translations,
+            re.compile(r'id', re.IGNORECASE): 'id_'}
+
+    model_writer = CaseInsensitiveModelWriter.__new__(CaseInsensitiveModelWriter)
+    assert model_writer.translate_column_name_to_py('ID') == 'id_'
+    assert model_writer.translate_column_name_to_py('file') == 'file_'
+    assert model_writer.translate_column_name_to_py('files') == 'files'
+
+
+def test_dictionary_insertion_order_is_the_priority_order():
+    translator = Translator({
+        re.compile(r'DOUBLE'): r'sa.Float()',
+        re.compile(r'DOUBLE|FLOAT'): r'sa.Float'})
+    assert translator.translate('DOUBLE') == 'sa.Float()'
+    assert translator.translate('FLOAT') == 'sa.Float'
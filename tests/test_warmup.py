@@ -0,0 +1,168 @@
+import hashlib
+import json
+import sqlite3
+
+import pytest
+import sqlalchemy as sa
+
+from orminator.loader_strategies import LoaderStrategyConfig
+from orminator.warmup import prime_statements, read_manifest, validate_models, warm_up
+
+
+def write_models(model_writer_class, db_uri, tmp_path, **kwargs):
+    models_fp = tmp_path / 'models.py'
+    manifest_fp = tmp_path / 'models.json'
+    model_writer_class(db_uri, **kwargs).write_models(str(models_fp), manifest_fp=str(manifest_fp))
+    return models_fp, manifest_fp
+
+
+def add_rows(db_fp):
+    connection = sqlite3.connect(db_fp)
+    connection.executescript("""\
+INSERT INTO project VALUES (1, 'project 1');
+INSERT INTO investigator VALUES (1, 'investigator 1');
+INSERT INTO project_to_investigator VALUES (1, 1, 1);
+INSERT INTO sample VALUES (1, 1, 'sample.fa', 'x');
+INSERT INTO sample_attr VALUES (1, 1, 'value 1');
+""")
+    connection.commit()
+    connection.close()
+
+
+def get_row_counts(engine):
+    with engine.connect() as connection:
+        return [
+            connection.execute(sa.text('SELECT count(*) FROM {}'.format(table_name))).scalar()
+            for table_name
+            in ('project', 'investigator', 'project_to_investigator', 'sample', 'sample_attr')]
+
+
+def record_cache_hits(engine):
+    cache_hits = []
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        cache_hits.append(context.cache_hit == sa.engine.default.CACHE_HIT)
+
+    sa.event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    return cache_hits
+
+
+def test_write_manifest(db_uri, model_writer_class, tmp_path):
+    models_fp, manifest_fp = write_models(model_writer_class, db_uri, tmp_path)
+
+    manifest = read_manifest(str(manifest_fp))
+    assert manifest['models_sha1'] == hashlib.sha1(models_fp.read_bytes()).hexdigest()
+    assert sorted(manifest['classes']) == ['Investigator', 'Project', 'Project_to_investigator', 'Sample', 'Sample_attr']
+    assert manifest['classes']['Sample'] == {
+        'table': 'sample',
+        'primary_key': ['sample_id'],
+        'columns': ['sample_id', 'project_id', 'file_', 'type_'],
+        'relationships': ['project', 'sample_attr_list']}
+    assert manifest['classes']['Project']['relationships'] == ['investigator_list', 'sample_list']
+
+    model_writer = model_writer_class(db_uri)
+    assert not model_writer.write_models(str(models_fp), manifest_fp=str(manifest_fp), check=True)
+
+
+def test_read_manifest_rejects_other_format_versions(tmp_path):
+    manifest_fp = tmp_path / 'models.json'
+    manifest_fp.write_text(json.dumps({'format_version': 0, 'models_sha1': '', 'classes': {}}))
+    with pytest.raises(ValueError):
+        read_manifest(str(manifest_fp))
+
+
+def test_validate_models(db_uri, model_writer_class, import_models, tmp_path):
+    models_fp, manifest_fp = write_models(model_writer_class, db_uri, tmp_path)
+    models = import_models(models_fp)
+    sa.orm.configure_mappers()
+    manifest = read_manifest(str(manifest_fp))
+    validate_models(models, manifest)
+
+    manifest['classes']['Sample']['columns'].append('unit')
+    manifest['classes']['Sample']['relationships'].append('cruise')
+    manifest['classes']['Sample']['primary_key'] = ['sample_id', 'project_id']
+    manifest['classes']['Cruise'] = {'table': 'cruise', 'primary_key': [], 'columns': [], 'relationships': []}
+    with pytest.raises(ValueError) as e:
+        validate_models(models, manifest)
+    for error in (
+            'class Cruise is missing',
+            "class Sample has primary key ['sample_id'], expected ['sample_id', 'project_id']",
+            'class Sample has no column unit',
+            'class Sample has no relationship cruise'):
+        assert error in str(e.value)
+    assert 'does not match the manifest' not in str(e.value)
+
+
+def test_validate_models_checks_the_models_file(db_uri, model_writer_class, import_models, tmp_path):
+    models_fp, manifest_fp = write_models(model_writer_class, db_uri, tmp_path)
+    models = import_models(models_fp)
+    sa.orm.configure_mappers()
+    with open(str(models_fp), 'at') as models_file:
+        models_file.write('# edited\n')
+
+    with pytest.raises(ValueError) as e:
+        validate_models(models, read_manifest(str(manifest_fp)))
+    assert '{} does not match the manifest'.format(models.__file__) in str(e.value)
+
+
+@pytest.mark.parametrize(
+    'loader_strategies',
+    [
+        LoaderStrategyConfig(),
+        LoaderStrategyConfig(one_to_many='selectin', many_to_many='selectin', many_to_one='joined'),
+    ])
+def test_warm_up_primes_the_statement_cache(db_fp, db_uri, model_writer_class, import_models, tmp_path, loader_strategies):
+    add_rows(db_fp)
+    models_fp, manifest_fp = write_models(model_writer_class, db_uri, tmp_path, loader_strategies=loader_strategies)
+    models = import_models(models_fp)
+    engine = sa.create_engine(db_uri)
+    row_counts = get_row_counts(engine)
+
+    assert warm_up(models, engine=engine, manifest_fp=str(manifest_fp)) is None
+    assert get_row_counts(engine) == row_counts
+
+    # the first request only runs statements compiled by warm_up
+    cache_hits = record_cache_hits(engine)
+    with sa.orm.Session(engine) as session:
+        sample = session.get(models.Sample, 1)
+        assert sample.project.project_name == 'project 1'
+        assert [a.value for a in sample.sample_attr_list] == ['value 1']
+        assert [i.investigator_name for i in sample.project.investigator_list] == ['investigator 1']
+    assert len(cache_hits) > 0
+    assert all(cache_hits)
+    engine.dispose()
+
+
+def test_prime_statements_runs_every_lazy_load(db_uri, model_writer_class, import_models, tmp_path):
+    models_fp, _ = write_models(model_writer_class, db_uri, tmp_path)
+    models = import_models(models_fp)
+    sa.orm.configure_mappers()
+    engine = sa.create_engine(db_uri)
+
+    # one primary key load for each class and one load for each relationship,
+    # many-to-one backrefs included
+    relationship_keys = sorted(
+        '{}.{}'.format(mapper.class_.__name__, relationship.key)
+        for mapper in models.Model.registry.mappers
+        for relationship in mapper.relationships)
+    assert relationship_keys == [
+        'Investigator.project_list',
+        'Project.investigator_list',
+        'Project.sample_list',
+        'Sample.project',
+        'Sample.sample_attr_list',
+        'Sample_attr.sample']
+    assert prime_statements(models, engine) == 5 + 6
+    engine.dispose()
+
+
+def test_warm_up_in_the_background(db_uri, model_writer_class, import_models, tmp_path):
+    models_fp, manifest_fp = write_models(model_writer_class, db_uri, tmp_path)
+    models = import_models(models_fp)
+    engine = sa.create_engine(db_uri)
+
+    thread = warm_up(models, engine=engine, manifest_fp=str(manifest_fp), background=True)
+    thread.join()
+    assert len(models.Model.registry.mappers) == 5
+    assert all(mapper.configured for mapper in models.Model.registry.mappers)
+    engine.dispose()
@@ -0,0 +1,105 @@
+import os
+import sqlite3
+import sys
+
+import sqlalchemy as sa
+
+from orminator.watcher import SchemaWatcher
+
+
+def alter_sample_attr(db_fp):
+    connection = sqlite3.connect(db_fp)
+    connection.execute('ALTER TABLE sample_attr ADD COLUMN unit VARCHAR(10)')
+    connection.close()
+
+
+def test_reload_keeps_the_old_models_until_they_are_disposed_of(db_fp, db_uri, model_writer_class, tmp_path):
+    watcher = SchemaWatcher(
+        db_uri,
+        str(tmp_path / 'models.py'),
+        module_name='orminator_test_watched_models',
+        model_writer_class=model_writer_class)
+    try:
+        assert watcher.check()
+        assert not watcher.check()
+        old_models = watcher.get_models()
+
+        alter_sample_attr(db_fp)
+        assert watcher.check()
+        models = watcher.get_models()
+        assert sys.modules['orminator_test_watched_models'] is models
+        assert hasattr(models.Sample_attr, 'unit')
+        assert watcher.replaced_models == [old_models]
+        assert len(old_models.Model.registry.mappers) == 5
+
+        assert watcher.dispose_replaced_models() == 1
+        assert len(old_models.Model.registry.mappers) == 0
+        assert watcher.replaced_models == []
+        assert len(models.Model.registry.mappers) == 5
+    finally:
+        watcher.stop()
+        sys.modules.pop('orminator_test_watched_models').Model.registry.dispose()
+
+
+def test_session_using_the_old_models_across_a_reload(db_fp, db_uri, model_writer_class, tmp_path):
+    watcher = SchemaWatcher(
+        db_uri,
+        str(tmp_path / 'models.py'),
+        module_name='orminator_test_watched_models',
+        model_writer_class=model_writer_class)
+    engine = sa.create_engine(db_uri)
+    try:
+        watcher.check()
+        old_models = watcher.get_models()
+        with sa.orm.Session(engine) as session:
+            session.add(old_models.Project(project_id=1, project_name='before'))
+            session.commit()
+            project = session.query(old_models.Project).one()
+
+            # the watcher thread can reload at any time
+            alter_sample_attr(db_fp)
+            assert watcher.check()
+
+            assert session.query(old_models.Project).one() is project
+            project.project_name = 'after'
+            session.add(old_models.Project(project_id=2, project_name='new'))
+            session.add(old_models.Sample(sample_id=1, project_id=1))
+            session.commit()
+            assert [s.sample_id for s in project.sample_list] == [1]
+
+        with sa.orm.Session(engine) as session:
+            models = watcher.get_models()
+            assert [p.project_name for p in session.query(models.Project).order_by(models.Project.project_id)] == [
+                'after', 'new']
+    finally:
+        engine.dispose()
+        watcher.stop()
+        watcher.dispose_replaced_models()
+        sys.modules.pop('orminator_test_watched_models').Model.registry.dispose()
+
+
+def test_stop_removes_the_temporary_cache_dir(db_uri, model_writer_class, tmp_path):
+    with SchemaWatcher(
+            db_uri,
+            str(tmp_path / 'models.py'),
+            module_name='orminator_test_watched_models',
+            interval=3600,
+            model_writer_class=model_writer_class) as watcher:
+        cache_dir = watcher.cache_dir
+        assert len(os.listdir(cache_dir)) > 0
+    assert not os.path.exists(cache_dir)
+    sys.modules.pop('orminator_test_watched_models').Model.registry.dispose()
+
+
+def test_stop_keeps_a_given_cache_dir(db_uri, model_writer_class, tmp_path):
+    cache_dir = tmp_path / 'cache'
+    with SchemaWatcher(
+            db_uri,
+            str(tmp_path / 'models.py'),
+            module_name='orminator_test_watched_models',
+            interval=3600,
+            cache_dir=str(cache_dir),
+            model_writer_class=model_writer_class):
+        pass
+    assert len(os.listdir(cache_dir)) > 0
+    sys.modules.pop('orminator_test_watched_models').Model.registry.dispose()